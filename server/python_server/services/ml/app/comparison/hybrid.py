@@ -10,6 +10,16 @@ Changes from v1:
 - P2: Requires minimum N good pairs (not just 1 outlier)
 - P3: Perceptual hash pre-filter for obvious mismatches
 
+Every image is wrapped in an ImageContext once per request, so decode,
+white balance, CLAHE and GrabCut run at most once per image no matter
+how many stages or pairs consume it.
+
+Reference features (FEATURE_VERSION 2) carry every channel: traditional
+vectors, ResNet50 embeddings, OCR text, pHash/dHash bits, SIFT keypoints
+and descriptors, and SSIM thumbnails. With a complete set, verify() needs
+no original images at all; any missing or stale channel is recomputed
+from the originals instead.
+
 Pipeline:
   1. Quality gate → reject bad images early
   2. pHash pre-filter → reject obvious mismatches cheaply
@@ -19,23 +29,71 @@ Pipeline:
   6. Deep learning (ResNet50) features
   7. OCR serial number check
   8. Hybrid weighted score with trimmed-mean aggregation → decision
+
+With ML_ENABLE_CASCADE, steps 3-7 run cheapest-first instead, and after
+each one the final score is bounded using the channel weights (unscored
+channels count as 0..100, a pending OCR check as 0..+10). Once the bounds
+lie entirely above threshold_verified or entirely below
+threshold_manual_review, the remaining channels are skipped and listed in
+skipped_channels.
 """
 
 import logging
+from collections.abc import Callable, Hashable
+from typing import Any
 
 import numpy as np
 
 from ..config import settings
-from ..features.deep import DeepFeatureExtractor
-from ..features.phash import is_obvious_mismatch, phash_similarity
+from ..features.bundle import FEATURE_VERSION
+from ..features.deep import DeepFeatureExtractor, l2_normalize
+from ..features.matcher_index import get_reference_index_cache
+from ..features.phash import compute_dhash, compute_phash, similarity_matrix
 from ..features.sift import SIFTFeatureExtractor
 from ..features.traditional import TraditionalFeatureExtractor
-from ..utils.ocr import extract_text, match_serial_numbers
+from ..utils.context import ImageContext
+from ..utils.ocr import (
+    extract_reference_text,
+    extract_text,
+    find_serial_numbers,
+    match_serial_numbers,
+    text_score,
+)
 from ..utils.quality import check_quality
 from .similarity import SimilarityCalculator
+from .stages import Stage, get_stage_executor
 
 logger = logging.getLogger(__name__)
 
+# Scoring channels in the original pipeline order, and cheapest-first for the cascade.
+# SSIM and ResNet50 work on the plain preprocessed image; traditional and SIFT share
+# the GrabCut segmentation (the dominant cost); Tesseract runs last.
+PIPELINE_ORDER = ("traditional", "sift", "ssim", "deep", "ocr")
+CASCADE_ORDER = ("ssim", "deep", "traditional", "sift", "ocr")
+
+# Settings that change a reference channel's stored values. A channel extracted
+# under other values (or before they were recorded) is stale and recomputed.
+_PREPROCESS_SETTINGS = ("decode_working_size", "white_balance_method", "white_balance_sample_step")
+_SEGMENT_SETTINGS = ("grabcut_proxy_size", "grabcut_refine_band", "grabcut_refine_iterations")
+REFERENCE_SETTINGS = {
+    "traditional": _PREPROCESS_SETTINGS + _SEGMENT_SETTINGS + (
+        "orb_features_count", "color_hist_bins", "lbp_points", "lbp_radius", "lbp_max_side"
+    ),
+    "sift": _PREPROCESS_SETTINGS + _SEGMENT_SETTINGS + ("sift_rootsift", "sift_max_side"),
+    "phash": ("decode_working_size",),
+    "dhash": ("decode_working_size",),
+    "ssim": _PREPROCESS_SETTINGS,
+    "deep": ("decode_working_size",),
+}
+
+STEP_LABELS = {
+    "traditional": (3, "Traditional CV comparison"),
+    "sift": (4, "SIFT keypoint matching + RANSAC"),
+    "ssim": (5, "SSIM structural similarity"),
+    "deep": (6, "Deep learning comparison"),
+    "ocr": (7, "OCR serial number check"),
+}
+
 
 class HybridVerifier:
     """
@@ -55,43 +113,125 @@ class HybridVerifier:
         self.deep = DeepFeatureExtractor()
         self.similarity = SimilarityCalculator()
 
-    def extract_reference_features(self, image_sources: list[str | bytes | np.ndarray]) -> dict:
+    def extract_reference_features(self, image_sources: list[str | bytes | np.ndarray | ImageContext]) -> dict:
         """
         Extract and store features from owner's uploaded reference images.
 
         Called once when the item listing is created.
         """
+        image_sources = [ImageContext.wrap(src) for src in image_sources]
+
         traditional_features = self.traditional.extract_batch(image_sources)
 
         deep_features = []
         if settings.enable_deep_learning:
-            deep_features = self.deep.extract_batch(image_sources)
+            deep_features = self.deep.extract_matrix(image_sources)
 
         ocr_texts = []
         if settings.enable_ocr:
             for src in image_sources:
-                ocr_texts.append(extract_text(src))
+                ocr_texts.append(extract_reference_text(src))
 
         return {
             "traditional": traditional_features,
-            "deep": [f.tolist() for f in deep_features],
+            "deep": deep_features,
             "ocr_texts": ocr_texts,
             "image_count": len(image_sources),
+            "phash": [compute_phash(src) for src in image_sources],
+            "dhash": [compute_dhash(src) for src in image_sources],
+            "sift": [
+                self.sift.reference_detection(src, settings.sift_reference_max_keypoints)
+                for src in image_sources
+            ],
+            "sift_rootsift": settings.sift_rootsift,
+            "ssim": [src.ssim_gray() for src in image_sources],
+            "feature_version": FEATURE_VERSION,
+            "extraction": {
+                key: getattr(settings, key) for keys in REFERENCE_SETTINGS.values() for key in keys
+            },
         }
 
+    def _reference_channel(self, reference_features: dict | None, name: str) -> list | None:
+        """
+        A precomputed reference channel, or None if it is absent or stale.
+
+        Stale means any setting in REFERENCE_SETTINGS[name] differs from the
+        value recorded under "extraction" when the features were extracted.
+        Features without that record predate the reduced decode, proxy
+        GrabCut and bounded LBP, so only their OCR text is still usable.
+        """
+        if not reference_features:
+            return None
+        if reference_features.get("feature_version", 1) > FEATURE_VERSION:
+            return None
+        channel = reference_features.get(name)
+        if channel is None or len(channel) == 0:
+            return None
+        recorded = reference_features.get("extraction") or {}
+        if any(recorded.get(key) != getattr(settings, key) for key in REFERENCE_SETTINGS.get(name, ())):
+            return None
+        return channel
+
+    @staticmethod
+    def _reference_index(reference_key: Hashable | None, name: str, build: Callable[[], Any]) -> Any:
+        """
+        A matcher index over a reference channel.
+
+        Stored items (reference_key set) share their indexes across requests
+        through features.matcher_index.ReferenceIndexCache; features sent
+        with a request get an index that is dropped with the request.
+        """
+        if reference_key is None:
+            return build()
+        return get_reference_index_cache().get(reference_key, name, build)
+
+    def missing_reference_channels(self, reference_features: dict | None) -> list[str]:
+        """Channels verify() would have to recompute from original images."""
+        required = ["traditional", "phash", "sift", "ssim"]
+        if settings.enable_deep_learning:
+            required.append("deep")
+        missing = [name for name in required if self._reference_channel(reference_features, name) is None]
+        if settings.enable_ocr and not (reference_features and "ocr_texts" in reference_features):
+            missing.append("ocr_texts")
+        return missing
+
     def verify(
         self,
-        original_sources: list[str | bytes | np.ndarray],
-        kiosk_sources: list[str | bytes | np.ndarray],
+        original_sources: list[str | bytes | np.ndarray | ImageContext],
+        kiosk_sources: list[str | bytes | np.ndarray | ImageContext],
         attempt_number: int = 1,
         reference_features: dict | None = None,
+        reference_key: Hashable | None = None,
     ) -> dict:
         """
         Full hybrid verification with all improvements.
 
+        Args:
+            original_sources: Owner reference images. May be empty when
+                reference_features has every channel (see missing_reference_channels).
+            reference_features: Stored output of extract_reference_features.
+            reference_key: Stable identity of reference_features, e.g. the
+                FeatureStore row; matcher indexes are cached under it across requests.
+
         Returns:
             Complete verification result with decision and diagnostics.
+
+        Raises:
+            ValueError: If no original images are given and reference_features
+                is incomplete.
         """
+        if not original_sources:
+            missing = self.missing_reference_channels(reference_features)
+            if missing:
+                raise ValueError(
+                    "Original images are required: reference features are missing or stale: "
+                    + ", ".join(missing)
+                )
+
+        # One context per image: every stage below shares its decoded/preprocessed views
+        original_sources = [ImageContext.wrap(src) for src in original_sources]
+        kiosk_sources = [ImageContext.wrap(src) for src in kiosk_sources]
+
         # --- Step 1: Quality gate ---
         logger.info("Step 1: Image quality check")
         quality_issues = []
@@ -126,17 +266,20 @@ class HybridVerifier:
 
         # --- Step 2: Perceptual hash pre-filter ---
         logger.info("Step 2: Perceptual hash pre-filter")
-        phash_scores = []
-        obvious_mismatch_count = 0
-        for orig in original_sources:
-            for kiosk in kiosk_sources:
-                score = phash_similarity(orig, kiosk)
-                phash_scores.append(score)
-                if is_obvious_mismatch(orig, kiosk, settings.phash_obvious_mismatch_threshold):
-                    obvious_mismatch_count += 1
-
-        total_pairs = len(original_sources) * len(kiosk_sources)
-        if total_pairs > 0 and obvious_mismatch_count == total_pairs:
+        # Packed uint64 hashes, one per image; one XOR + popcount grid for every pair
+        orig_hashes = self._reference_channel(reference_features, "phash")
+        if orig_hashes is None:
+            orig_hashes = [compute_phash(src) for src in original_sources]
+        kiosk_hashes = [compute_phash(src) for src in kiosk_sources]
+
+        if len(orig_hashes) and kiosk_hashes:
+            phash_matrix = similarity_matrix(np.stack(orig_hashes), np.stack(kiosk_hashes))
+        else:
+            phash_matrix = np.zeros((len(orig_hashes), len(kiosk_hashes)))
+        phash_scores = phash_matrix.ravel().tolist()
+
+        # The obvious-mismatch decision reuses the same distance grid
+        if phash_matrix.size > 0 and bool((phash_matrix < settings.phash_obvious_mismatch_threshold).all()):
             # ALL pairs are obvious mismatches — skip expensive pipeline
             return {
                 "verified": False,
@@ -156,100 +299,57 @@ class HybridVerifier:
 
         phash_best = max(phash_scores) if phash_scores else 0.0
 
-        # --- Step 3: Traditional CV ---
-        logger.info("Step 3: Traditional CV comparison")
-        if reference_features and "traditional" in reference_features:
-            orig_traditional = reference_features["traditional"]
-        else:
-            orig_traditional = self.traditional.extract_batch(original_sources)
-
-        kiosk_traditional = self.traditional.extract_batch(kiosk_sources)
-
-        traditional_scores = []
-        for kiosk_feat in kiosk_traditional:
-            for orig_feat in orig_traditional:
-                result = self.similarity.compare_traditional(orig_feat, kiosk_feat)
-                traditional_scores.append(result["overall_confidence"])
-
-        traditional_agg = self._aggregate_scores(traditional_scores)
-
-        # --- Step 4: SIFT with RANSAC ---
-        logger.info("Step 4: SIFT keypoint matching + RANSAC")
-        sift_result = self.sift.match_multi(original_sources, kiosk_sources)
-        # Use inlier ratio (geometrically verified) instead of raw match ratio
-        sift_best_inlier = sift_result.get("best_inlier_ratio", 0.0)
-        sift_best_match = sift_result["best_ratio"]
-        # Blend: 70% inlier ratio (more reliable) + 30% match ratio
-        sift_score = sift_best_inlier * 0.7 + sift_best_match * 0.3
-
-        # --- Step 5: SSIM ---
-        logger.info("Step 5: SSIM structural similarity")
-        ssim_scores = []
-        for orig in original_sources:
-            for kiosk in kiosk_sources:
-                ssim = self.similarity.compare_ssim(orig, kiosk)
-                ssim_scores.append(ssim)
-        ssim_agg = self._aggregate_scores(ssim_scores)
-
-        # --- Step 6: Deep Learning ---
-        deep_agg = 0.0
-        if settings.enable_deep_learning:
-            logger.info("Step 6: Deep learning comparison")
-            if reference_features and "deep" in reference_features and reference_features["deep"]:
-                orig_deep = [np.array(f) for f in reference_features["deep"]]
-            else:
-                orig_deep = self.deep.extract_batch(original_sources)
-
-            kiosk_deep = self.deep.extract_batch(kiosk_sources)
-
-            deep_scores = []
-            for kf in kiosk_deep:
-                for of_ in orig_deep:
-                    score = self.similarity.compare_deep(of_, kf)
-                    deep_scores.append(score)
-
-            deep_agg = self._aggregate_scores(deep_scores)
-
-        # --- Step 7: OCR ---
-        ocr_match = False
-        ocr_details = None
-        if settings.enable_ocr:
-            logger.info("Step 7: OCR serial number check")
-            orig_texts = (
-                reference_features.get("ocr_texts", [])
-                if reference_features
-                else [extract_text(s) for s in original_sources]
+        # --- Steps 3-7: scoring channels ---
+        cascade = settings.enable_cascade
+        order = [name for name in (CASCADE_ORDER if cascade else PIPELINE_ORDER) if self._channel_enabled(name)]
+        weights = self._channel_weights()
+        known_scores = {"phash": phash_best}
+        results: dict[str, dict] = {}
+        bounds = self._score_bounds(weights, known_scores, ocr_match=None)
+        stop: tuple[str, str] | None = None  # (direction, reason)
+        skipped: list[dict] = []
+        stage_report: dict = {}
+
+        sequential = cascade or settings.stage_workers <= 0
+        if not sequential:
+            # Independent channels (and per-image preprocessing) overlap on the stage pool
+            results, skipped, stage_report = self._run_channels_concurrently(
+                order, original_sources, kiosk_sources, reference_features, reference_key
             )
-            kiosk_texts = [extract_text(s) for s in kiosk_sources]
-            ocr_match, ocr_details = match_serial_numbers(orig_texts, kiosk_texts)
+            known_scores.update({name: r["score"] for name, r in results.items() if name != "ocr"})
+            ocr_state = results["ocr"]["match"] if "ocr" in results else None
+            bounds = self._score_bounds(weights, known_scores, ocr_state)
+
+        for index, name in enumerate(order if sequential else ()):
+            logger.info("Step %s: %s", STEP_LABELS[name][0], STEP_LABELS[name][1])
+            results[name] = self._run_channel(
+                name, original_sources, kiosk_sources, reference_features, reference_key
+            )
+            if name != "ocr":
+                known_scores[name] = results[name]["score"]
+
+            ocr_state = results["ocr"]["match"] if "ocr" in results else None
+            bounds = self._score_bounds(weights, known_scores, ocr_state)
+            if cascade and index < len(order) - 1:
+                stop = self._cascade_stop(bounds, results)
+                if stop is not None:
+                    skipped = [{"channel": rest, "reason": stop[1]} for rest in order[index + 1 :]]
+                    logger.info("Cascade stopped after %s: %s", name, stop[1])
+                    break
+
+        traditional = results.get("traditional", {"score": 0.0, "scores": []})
+        sift = results.get("sift", {})
+        ocr = results.get("ocr", {"match": False, "details": None})
+        traditional_scores = traditional["scores"]
 
         # --- Step 8: Hybrid score ---
-        if settings.enable_deep_learning:
-            final_score = (
-                traditional_agg * settings.weight_traditional
-                + deep_agg * settings.weight_deep_learning
-                + sift_score * settings.weight_sift
-                + ssim_agg * settings.weight_ssim_hybrid
-                + phash_best * settings.weight_phash_hybrid
-            )
+        if stop is None:
+            final_score = sum(known_scores[name] * weights[name] for name in weights if name in known_scores)
+            # OCR bonus
+            if ocr["match"]:
+                final_score = min(100.0, final_score + 10.0)
         else:
-            # Without deep learning, redistribute weight
-            total_w = (
-                settings.weight_traditional
-                + settings.weight_sift
-                + settings.weight_ssim_hybrid
-                + settings.weight_phash_hybrid
-            )
-            final_score = (
-                traditional_agg * (settings.weight_traditional / total_w)
-                + sift_score * (settings.weight_sift / total_w)
-                + ssim_agg * (settings.weight_ssim_hybrid / total_w)
-                + phash_best * (settings.weight_phash_hybrid / total_w)
-            )
-
-        # OCR bonus
-        if ocr_match:
-            final_score = min(100.0, final_score + 10.0)
+            final_score = self._estimate_score(weights, known_scores, ocr["match"], bounds)
 
         # P2: Check minimum good pairs — don't trust a single outlier
         good_pair_count = sum(1 for s in traditional_scores if s >= settings.threshold_manual_review)
@@ -273,25 +373,363 @@ class HybridVerifier:
             "attempt_number": attempt_number,
             "method_scores": {
                 "traditional_best": round(max(traditional_scores) if traditional_scores else 0.0, 2),
-                "traditional_aggregated": round(traditional_agg, 2),
-                "sift_best_match": round(sift_best_match, 2),
-                "sift_best_inlier": round(sift_best_inlier, 2),
-                "sift_combined": round(sift_score, 2),
-                "ssim_aggregated": round(ssim_agg, 2),
-                "deep_learning_aggregated": round(deep_agg, 2),
+                "traditional_aggregated": round(traditional["score"], 2),
+                "sift_best_match": round(sift.get("best_match", 0.0), 2),
+                "sift_best_inlier": round(sift.get("best_inlier", 0.0), 2),
+                "sift_combined": round(sift.get("score", 0.0), 2),
+                "ssim_aggregated": round(results.get("ssim", {}).get("score", 0.0), 2),
+                "deep_learning_aggregated": round(results.get("deep", {}).get("score", 0.0), 2),
                 "phash_best": round(phash_best, 2),
             },
             "ocr": {
-                "match": ocr_match,
-                "details": ocr_details,
+                "match": ocr["match"],
+                "details": ocr["details"],
+                "skipped": ocr.get("skipped", False),
             },
             "quality_issues": quality_issues,
             "good_pair_count": good_pair_count,
             "all_traditional_scores": [round(s, 2) for s in traditional_scores],
-            "sift_all_ratios": sift_result.get("all_ratios", []),
+            "sift_all_ratios": sift.get("all_ratios", []),
+            "skipped_channels": skipped,
+            "diagnostics": {
+                "reference_channels_recomputed": (
+                    self.missing_reference_channels(reference_features) if original_sources else []
+                ),
+                "sift": {
+                    "detections_computed": sift.get("detections_computed", 0),
+                    "detections_reused": sift.get("detections_reused", 0),
+                    "keypoints_reference": sift.get("keypoints_reference", []),
+                    "keypoints_kiosk": sift.get("keypoints_kiosk", []),
+                    "detect_ms": sift.get("detect_ms", 0.0),
+                    "match_ms": sift.get("match_ms", 0.0),
+                },
+                "stages": stage_report,
+                "segmentation": {
+                    "original": [ctx.segmentation_method for ctx in original_sources],
+                    "kiosk": [ctx.segmentation_method for ctx in kiosk_sources],
+                },
+                "cascade": {
+                    "enabled": cascade,
+                    "order": order,
+                    "stopped_after": list(results)[-1] if stop is not None else None,
+                    # Confidence extrapolated from the scored channels (see _estimate_score)
+                    "confidence_estimated": stop is not None,
+                    "score_bounds": [round(bounds[0], 2), round(bounds[1], 2)],
+                },
+            },
         }
 
-    def _aggregate_scores(self, scores: list[float]) -> float:
+    # ── Channels ─────────────────────────────────────────────────────────────
+
+    def _channel_enabled(self, name: str) -> bool:
+        if name == "deep":
+            return settings.enable_deep_learning
+        if name == "ocr":
+            return settings.enable_ocr
+        return True
+
+    def _channel_weights(self) -> dict[str, float]:
+        """Weight of each scored channel in the final score (OCR is a bonus, not weighted)."""
+        if settings.enable_deep_learning:
+            return {
+                "traditional": settings.weight_traditional,
+                "deep": settings.weight_deep_learning,
+                "sift": settings.weight_sift,
+                "ssim": settings.weight_ssim_hybrid,
+                "phash": settings.weight_phash_hybrid,
+            }
+        # Without deep learning, redistribute weight
+        total_w = (
+            settings.weight_traditional
+            + settings.weight_sift
+            + settings.weight_ssim_hybrid
+            + settings.weight_phash_hybrid
+        )
+        return {
+            "traditional": settings.weight_traditional / total_w,
+            "sift": settings.weight_sift / total_w,
+            "ssim": settings.weight_ssim_hybrid / total_w,
+            "phash": settings.weight_phash_hybrid / total_w,
+        }
+
+    def _score_bounds(
+        self, weights: dict[str, float], known_scores: dict[str, float], ocr_match: bool | None
+    ) -> tuple[float, float]:
+        """
+        Lower/upper bound on the final score given the channels scored so far.
+
+        Unscored channels may contribute anywhere between 0 and 100 x weight;
+        a pending OCR check may still add its +10 bonus.
+        """
+        known = sum(known_scores[name] * w for name, w in weights.items() if name in known_scores)
+        unknown = sum(100.0 * w for name, w in weights.items() if name not in known_scores)
+        lower, upper = known, known + unknown
+        if settings.enable_ocr:
+            if ocr_match is None:
+                upper += 10.0
+            elif ocr_match:
+                lower += 10.0
+                upper += 10.0
+        return min(100.0, lower), min(100.0, upper)
+
+    def _estimate_score(
+        self,
+        weights: dict[str, float],
+        known_scores: dict[str, float],
+        ocr_match: bool,
+        bounds: tuple[float, float],
+    ) -> float:
+        """
+        Final score of a cascade that stopped early, on the same scale as a full run.
+
+        Unscored channels are assumed to score the weighted mean of the
+        scored ones, so the estimate is comparable with the confidence of a
+        full run instead of being a bound. It is clamped to the bounds, where
+        every value gives the same decision.
+        """
+        scored_weight = sum(w for name, w in weights.items() if name in known_scores)
+        known = sum(known_scores[name] * w for name, w in weights.items() if name in known_scores)
+        estimate = known / scored_weight * sum(weights.values()) if scored_weight > 0 else 0.0
+        if ocr_match:
+            estimate += 10.0
+        return min(max(min(100.0, estimate), bounds[0]), bounds[1])
+
+    def _cascade_stop(self, bounds: tuple[float, float], results: dict[str, dict]) -> tuple[str, str] | None:
+        """
+        Decide whether the remaining channels can still change the decision.
+
+        Stops when even the upper bound is below threshold_manual_review, or
+        the lower bound is at least threshold_verified and the min-good-pairs
+        demotion is already ruled out (which needs the traditional channel).
+        """
+        lower, upper = bounds
+        if upper < settings.threshold_manual_review:
+            return "below", (
+                f"score upper bound {upper:.2f} < threshold_manual_review {settings.threshold_manual_review}"
+            )
+        if lower >= settings.threshold_verified and "traditional" in results:
+            good_pairs = sum(1 for s in results["traditional"]["scores"] if s >= settings.threshold_manual_review)
+            if good_pairs >= settings.min_good_pairs:
+                return "above", (
+                    f"score lower bound {lower:.2f} >= threshold_verified {settings.threshold_verified}"
+                )
+        return None
+
+    def _run_channel(
+        self,
+        name: str,
+        original_sources: list[ImageContext],
+        kiosk_sources: list[ImageContext],
+        reference_features: dict | None,
+        reference_key: Hashable | None = None,
+    ) -> dict:
+        channel = getattr(self, f"_channel_{name}")
+        return channel(original_sources, kiosk_sources, reference_features, reference_key)
+
+    def _run_channels_concurrently(
+        self,
+        channels: list[str],
+        original_sources: list[ImageContext],
+        kiosk_sources: list[ImageContext],
+        reference_features: dict | None,
+        reference_key: Hashable | None = None,
+    ) -> tuple[dict[str, dict], list[dict], dict]:
+        """
+        Run the channels as a stage graph on the process-wide stage pool.
+
+        Per-image stages warm the shared ImageContext views (decode ->
+        white balance/CLAHE -> GrabCut) in parallel across images; each
+        channel waits only for the views it consumes. Channels that time out
+        are reported as skipped; any other stage error is re-raised.
+
+        Returns:
+            (channel results in pipeline order, skipped channels, per-stage report)
+        """
+        # Views each channel reads; originals only when the channel is not precomputed
+        needs = {
+            "traditional": "segment",
+            "sift": "segment",
+            "ssim": "preprocess",
+            "deep": "decode",
+            "ocr": "decode",
+        }
+        images: dict[str, ImageContext] = {f"k{i}": ctx for i, ctx in enumerate(kiosk_sources)}
+        channel_images: dict[str, list[str]] = {}
+        for name in channels:
+            keys = [f"k{i}" for i in range(len(kiosk_sources))]
+            uses_reference = (
+                bool(reference_features) and "ocr_texts" in reference_features
+                if name == "ocr"
+                else self._reference_channel(reference_features, name) is not None
+            )
+            if not uses_reference:
+                keys += [f"o{i}" for i in range(len(original_sources))]
+                images.update({f"o{i}": ctx for i, ctx in enumerate(original_sources)})
+            channel_images[name] = keys
+
+        # Deepest view needed per image
+        depth = {"decode": 0, "preprocess": 1, "segment": 2}
+        image_depth: dict[str, int] = {}
+        for name, keys in channel_images.items():
+            for key in keys:
+                image_depth[key] = max(image_depth.get(key, 0), depth[needs[name]])
+
+        stages = []
+        for key, ctx in images.items():
+            if key not in image_depth:
+                continue
+            stages.append(Stage(f"decode[{key}]", lambda ctx=ctx: ctx.bgr.shape))
+            if image_depth[key] >= 1:
+                stages.append(
+                    Stage(f"preprocess[{key}]", lambda _, ctx=ctx: ctx.preprocessed().shape, (f"decode[{key}]",))
+                )
+            if image_depth[key] >= 2:
+                stages.append(
+                    Stage(f"segment[{key}]", lambda _, ctx=ctx: ctx.item().shape, (f"preprocess[{key}]",))
+                )
+
+        for name in channels:
+            requires = tuple(f"{needs[name]}[{key}]" for key in channel_images[name])
+            stages.append(
+                Stage(
+                    name,
+                    lambda *_, name=name: self._run_channel(
+                        name, original_sources, kiosk_sources, reference_features, reference_key
+                    ),
+                    requires,
+                )
+            )
+
+        logger.info("Steps 3-7: %s on the stage pool (%d stages)", ", ".join(channels), len(stages))
+        stage_results = get_stage_executor().run(stages)
+
+        for result in stage_results.values():
+            if result.status == "failed":
+                raise result.exception
+
+        results: dict[str, dict] = {}
+        skipped: list[dict] = []
+        for name in channels:
+            result = stage_results[name]
+            if result.ok:
+                results[name] = result.value
+            else:
+                skipped.append({"channel": name, "reason": f"{result.status}: {result.error}"})
+
+        report = {name: result.to_dict() for name, result in stage_results.items()}
+        return results, skipped, report
+
+    def _channel_traditional(
+        self, original_sources, kiosk_sources, reference_features, reference_key=None
+    ) -> dict:
+        """Step 3: traditional CV (color, spatial pyramid, shape, texture, HOG, ORB)."""
+        orig_traditional = self._reference_channel(reference_features, "traditional")
+        orb_index = None
+        if orig_traditional is None:
+            orig_traditional = self.traditional.extract_batch(original_sources)
+        else:
+            orb_index = self._reference_index(
+                reference_key, "orb", lambda: self.similarity.build_orb_index(orig_traditional)
+            )
+
+        kiosk_traditional = self.traditional.extract_batch(kiosk_sources)
+
+        # (reference x kiosk) matrix, flattened kiosk-major like the original pair loop
+        traditional_matrix = self.similarity.compare_traditional_matrix(
+            orig_traditional, kiosk_traditional, orb_index
+        )
+        return {
+            "score": self._aggregate_scores(traditional_matrix["overall_confidence"]),
+            "scores": traditional_matrix["overall_confidence"].T.ravel().tolist(),
+        }
+
+    def _channel_sift(
+        self, original_sources, kiosk_sources, reference_features, reference_key=None
+    ) -> dict:
+        """Step 4: SIFT keypoint matching + RANSAC geometric verification."""
+        original_detections = self._reference_channel(reference_features, "sift")
+        reference_index = None
+        if original_detections is not None:
+            reference_index = self._reference_index(
+                reference_key,
+                "sift",
+                lambda: self.sift.build_reference_index([d["descriptors"] for d in original_detections]),
+            )
+        sift_result = self.sift.match_multi(
+            original_sources,
+            kiosk_sources,
+            original_detections=original_detections,
+            reference_index=reference_index,
+        )
+        # Use inlier ratio (geometrically verified) instead of raw match ratio
+        best_inlier = sift_result.get("best_inlier_ratio", 0.0)
+        best_match = sift_result["best_ratio"]
+        return {
+            # Blend: 70% inlier ratio (more reliable) + 30% match ratio
+            "score": best_inlier * 0.7 + best_match * 0.3,
+            "best_inlier": best_inlier,
+            "best_match": best_match,
+            "all_ratios": sift_result.get("all_ratios", []),
+            "detections_computed": sift_result.get("detections_computed", 0),
+            "detections_reused": sift_result.get("detections_reused", 0),
+            "keypoints_reference": sift_result.get("keypoints_reference", []),
+            "keypoints_kiosk": sift_result.get("keypoints_kiosk", []),
+            "detect_ms": sift_result.get("detect_ms", 0.0),
+            "match_ms": sift_result.get("match_ms", 0.0),
+        }
+
+    def _channel_ssim(
+        self, original_sources, kiosk_sources, reference_features, reference_key=None
+    ) -> dict:
+        """Step 5: SSIM structural similarity."""
+        orig_ssim = self._reference_channel(reference_features, "ssim")
+        if orig_ssim is None:
+            scores = self.similarity.compare_ssim_matrix(original_sources, kiosk_sources)
+        else:
+            scores = self.similarity.compare_ssim_thumbnail_matrix(orig_ssim, kiosk_sources)
+        return {"score": self._aggregate_scores(scores)}
+
+    def _channel_deep(
+        self, original_sources, kiosk_sources, reference_features, reference_key=None
+    ) -> dict:
+        """Step 6: deep learning (ResNet50) embeddings."""
+        orig_deep = self._reference_channel(reference_features, "deep")
+        if orig_deep is not None:
+            orig_deep = l2_normalize(orig_deep)
+        else:
+            orig_deep = self.deep.extract_matrix(original_sources)
+
+        kiosk_deep = self.deep.extract_matrix(kiosk_sources)
+        return {"score": self._aggregate_scores(self.similarity.compare_deep_matrix(orig_deep, kiosk_deep))}
+
+    def _channel_ocr(
+        self, original_sources, kiosk_sources, reference_features, reference_key=None
+    ) -> dict:
+        """Step 7: OCR serial number check."""
+        orig_texts = (
+            reference_features.get("ocr_texts", [])
+            if reference_features
+            else [extract_reference_text(s) for s in original_sources]
+        )
+
+        # Text-presence pre-check: OCR a kiosk image only if it looks like it has text,
+        # or if the reference has serials that a missed detection would cost us. Those
+        # low-score frames are recognized in full, since their text regions were not found.
+        reference_has_serials = any(find_serial_numbers(t) for t in orig_texts)
+        text_scores = [text_score(s) for s in kiosk_sources]
+        has_text = [s >= settings.ocr_text_score_threshold for s in text_scores]
+        run_ocr = [reference_has_serials or found for found in has_text]
+        kiosk_texts = [
+            extract_text(s, full_frame=not found) if run else ""
+            for s, run, found in zip(kiosk_sources, run_ocr, has_text)
+        ]
+
+        ocr_match, ocr_details = match_serial_numbers(orig_texts, kiosk_texts)
+        ocr_details["kiosk_text_scores"] = [round(s, 2) for s in text_scores]
+        ocr_details["kiosk_ocr_run"] = run_ocr
+        return {"match": ocr_match, "details": ocr_details, "skipped": not any(run_ocr)}
+
+    def _aggregate_scores(self, scores: list[float] | np.ndarray) -> float:
         """
         P2: Smart score aggregation.
 
@@ -299,25 +737,28 @@ class HybridVerifier:
         - "trimmed_mean": Drop lowest and highest, average the rest.
         - "median": Middle value, robust to outliers.
         - "max": Original behavior (kept as fallback).
+
+        Accepts a flat list or a reference x kiosk score matrix (order-independent).
         """
-        if not scores:
+        scores = np.asarray(scores, dtype=np.float64).ravel()
+        if scores.size == 0:
             return 0.0
 
         method = settings.score_aggregation
 
-        if len(scores) <= 2 or method == "max":
-            return float(max(scores))
+        if scores.size <= 2 or method == "max":
+            return float(scores.max())
 
         if method == "median":
             return float(np.median(scores))
 
         # trimmed_mean: drop bottom 20% and top 10%, average rest
-        sorted_scores = sorted(scores)
-        n = len(sorted_scores)
+        sorted_scores = np.sort(scores)
+        n = sorted_scores.size
         low_cut = max(1, int(n * 0.2))
         high_cut = max(low_cut + 1, n - max(1, int(n * 0.1)))
         trimmed = sorted_scores[low_cut:high_cut]
-        return float(np.mean(trimmed)) if trimmed else float(max(scores))
+        return float(np.mean(trimmed)) if trimmed.size else float(scores.max())
 
     def _make_decision(self, confidence: float, attempt_number: int) -> tuple[str, str]:
         """
@@ -15,7 +15,19 @@ from scipy.spatial.distance import cosine
 from scipy.stats import pearsonr
 
 from ..config import settings
-from ..utils.image import load_image, preprocess
+from ..features.matcher_index import ReferenceMatcherIndex
+from ..utils.context import ImageContext
+
+
+_TRADITIONAL_KEYS = (
+    "color_similarity",
+    "spatial_similarity",
+    "shape_similarity",
+    "texture_similarity",
+    "hog_similarity",
+    "orb_similarity",
+    "overall_confidence",
+)
 
 
 class SimilarityCalculator:
@@ -68,14 +80,84 @@ class SimilarityCalculator:
             "overall_confidence": round(overall * 100, 2),
         }
 
+    def compare_traditional_matrix(
+        self, refs: list[dict], kiosks: list[dict], orb_index: ReferenceMatcherIndex | None = None
+    ) -> dict[str, np.ndarray]:
+        """
+        Compare every reference feature set with every kiosk feature set at once.
+
+        Each feature family is stacked into a 2-D array and the N x M cosine,
+        Pearson and Hu-distance matrices come from one broadcast each. ORB
+        descriptors are matched against one index over all references (one
+        query per kiosk image, see orb_similarity_matrix). Entries equal
+        compare_traditional(refs[i], kiosks[j]) up to rounding, except ORB,
+        whose ratio test runs kiosk-to-reference instead of per pair.
+
+        Args:
+            orb_index: Prebuilt index over refs' ORB descriptors (see build_orb_index).
+
+        Returns:
+            The same keys as compare_traditional, each an (N, M) array of
+            percentages rounded to 2 decimals (row = reference, column = kiosk).
+        """
+        n, m = len(refs), len(kiosks)
+        if n == 0 or m == 0:
+            empty = np.zeros((n, m))
+            return {key: empty.copy() for key in _TRADITIONAL_KEYS}
+
+        def stack(feats: list[dict], name: str) -> np.ndarray:
+            return np.stack([np.asarray(f[name], dtype=np.float64).ravel() for f in feats])
+
+        color_sim = _cosine_matrix(stack(refs, "color"), stack(kiosks, "color"))
+        spatial_sim = _cosine_matrix(stack(refs, "color_spatial"), stack(kiosks, "color_spatial"))
+        hog_sim = _cosine_matrix(stack(refs, "hog"), stack(kiosks, "hog"))
+        texture_sim = _correlation_matrix(stack(refs, "texture"), stack(kiosks, "texture"))
+
+        shape_a, shape_b = stack(refs, "shape"), stack(kiosks, "shape")
+        shape_sim = 1.0 / (1.0 + np.abs(shape_a[:, None, :] - shape_b[None, :, :]).sum(axis=2))
+
+        orb_sim = self.orb_similarity_matrix(refs, kiosks, orb_index)
+
+        overall = (
+            color_sim * self.weight_color
+            + spatial_sim * self.weight_spatial
+            + shape_sim * self.weight_shape
+            + texture_sim * self.weight_texture
+            + hog_sim * self.weight_hog
+            + orb_sim * self.weight_orb
+        )
+
+        return {
+            "color_similarity": np.round(color_sim * 100, 2),
+            "spatial_similarity": np.round(spatial_sim * 100, 2),
+            "shape_similarity": np.round(shape_sim * 100, 2),
+            "texture_similarity": np.round(texture_sim * 100, 2),
+            "hog_similarity": np.round(hog_sim * 100, 2),
+            "orb_similarity": np.round(orb_sim * 100, 2),
+            "overall_confidence": np.round(overall * 100, 2),
+        }
+
     def compare_deep(self, features_a: np.ndarray, features_b: np.ndarray) -> float:
         """Compare two deep feature vectors (ResNet50 2048-d)."""
         return round(self._cosine_similarity(features_a, features_b) * 100, 2)
 
+    def compare_deep_matrix(self, refs: np.ndarray, kiosks: np.ndarray) -> np.ndarray:
+        """
+        Compare every reference embedding with every kiosk embedding.
+
+        Args:
+            refs, kiosks: L2-normalized (N, D) / (M, D) float32 matrices
+                (see features.deep.l2_normalize).
+
+        Returns:
+            (N, M) percentages rounded to 2 decimals, clamped like compare_deep.
+        """
+        return np.round(np.clip(refs @ kiosks.T, 0.0, 1.0) * 100, 2)
+
     def compare_ssim(
         self,
-        source_a: str | bytes | np.ndarray,
-        source_b: str | bytes | np.ndarray,
+        source_a: str | bytes | np.ndarray | ImageContext,
+        source_b: str | bytes | np.ndarray | ImageContext,
     ) -> float:
         """
         P2: Structural Similarity Index (SSIM).
@@ -83,52 +165,40 @@ class SimilarityCalculator:
         Compares luminance, contrast, and structure patterns.
         Designed to measure "do these look like the same thing to a human?"
         """
-        img_a = preprocess(source_a)
-        img_b = preprocess(source_b)
-
-        # Resize both to same dimensions
-        target = (256, 256)
-        img_a = cv2.resize(img_a, target)
-        img_b = cv2.resize(img_b, target)
-
-        gray_a = cv2.cvtColor(img_a, cv2.COLOR_BGR2GRAY)
-        gray_b = cv2.cvtColor(img_b, cv2.COLOR_BGR2GRAY)
-
-        score = self._compute_ssim(gray_a, gray_b)
-        return round(max(0.0, score) * 100, 2)
+        # Preprocessed, resized to 256x256, grayscaled and blurred once per image
+        return float(self.compare_ssim_matrix([ImageContext.wrap(source_a)], [ImageContext.wrap(source_b)])[0, 0])
 
-    def _compute_ssim(
-        self, img1: np.ndarray, img2: np.ndarray, k1: float = 0.01, k2: float = 0.03
-    ) -> float:
-        """
-        Compute SSIM between two grayscale images.
+    def compare_ssim_gray(self, gray_a: np.ndarray, gray_b: np.ndarray) -> float:
+        """SSIM between two precomputed 256x256 grayscale thumbnails (see ImageContext.ssim_gray)."""
+        return float(_ssim_matrix([_ssim_stats_gray(gray_a)], [_ssim_stats_gray(gray_b)])[0, 0])
 
-        Implementation follows Wang et al. (2004).
+    def compare_ssim_matrix(
+        self,
+        refs: list[str | bytes | np.ndarray | ImageContext],
+        kiosks: list[str | bytes | np.ndarray | ImageContext],
+    ) -> np.ndarray:
         """
-        c1 = (k1 * 255) ** 2
-        c2 = (k2 * 255) ** 2
-
-        img1 = img1.astype(np.float64)
-        img2 = img2.astype(np.float64)
+        SSIM of every reference against every kiosk image.
 
-        mu1 = cv2.GaussianBlur(img1, (11, 11), 1.5)
-        mu2 = cv2.GaussianBlur(img2, (11, 11), 1.5)
+        The per-image terms (mean, mean squared, variance) are computed once
+        per image (cached on ImageContexts), so each pair only needs the
+        cross-term blur: 2(N + M) + N*M blurs instead of 5*N*M.
 
-        mu1_sq = mu1 ** 2
-        mu2_sq = mu2 ** 2
-        mu1_mu2 = mu1 * mu2
+        Args:
+            refs, kiosks: Raw sources (path, bytes, BGR array) or ImageContexts.
 
-        sigma1_sq = cv2.GaussianBlur(img1 ** 2, (11, 11), 1.5) - mu1_sq
-        sigma2_sq = cv2.GaussianBlur(img2 ** 2, (11, 11), 1.5) - mu2_sq
-        sigma12 = cv2.GaussianBlur(img1 * img2, (11, 11), 1.5) - mu1_mu2
-
-        numerator = (2 * mu1_mu2 + c1) * (2 * sigma12 + c2)
-        denominator = (mu1_sq + mu2_sq + c1) * (sigma1_sq + sigma2_sq + c2)
+        Returns:
+            (N, M) percentages rounded to 2 decimals, clamped at 0 like compare_ssim.
+        """
+        return _ssim_matrix([_ssim_stats(src) for src in refs], [_ssim_stats(src) for src in kiosks])
 
-        with np.errstate(invalid="ignore", divide="ignore"):
-            ssim_map = numerator / denominator
-        ssim_map = np.where(np.isfinite(ssim_map), ssim_map, 0.0)
-        return float(ssim_map.mean())
+    def compare_ssim_thumbnail_matrix(
+        self,
+        ref_grays: list[np.ndarray],
+        kiosks: list[str | bytes | np.ndarray | ImageContext],
+    ) -> np.ndarray:
+        """compare_ssim_matrix with precomputed 256x256 gray reference thumbnails (bundle "ssim" channel)."""
+        return _ssim_matrix([_ssim_stats_gray(gray) for gray in ref_grays], [_ssim_stats(src) for src in kiosks])
 
     def _orb_descriptor_match(
         self, desc_a: np.ndarray | None, desc_b: np.ndarray | None
@@ -157,6 +227,32 @@ class SimilarityCalculator:
         min_desc = min(len(desc_a), len(desc_b))
         return good / min_desc if min_desc > 0 else 0.0
 
+    def build_orb_index(self, refs: list[dict]) -> ReferenceMatcherIndex:
+        """Every reference's ORB descriptors, matched one kiosk image at a time (see features.matcher_index)."""
+        return ReferenceMatcherIndex([r["orb_descriptors"] for r in refs], "orb", 0.75)
+
+    def orb_similarity_matrix(
+        self, refs: list[dict], kiosks: list[dict], orb_index: ReferenceMatcherIndex | None = None
+    ) -> np.ndarray:
+        """
+        (N, M) ORB good-match fractions, matching every reference against one kiosk image at a time.
+
+        Same ratio test (0.75) and normalization (good / min descriptor count)
+        as _orb_descriptor_match.
+        """
+        if orb_index is None:
+            orb_index = self.build_orb_index(refs)
+
+        orb_sim = np.zeros((len(refs), len(kiosks)))
+        for j, kiosk in enumerate(kiosks):
+            desc = kiosk["orb_descriptors"]
+            if desc is None or len(desc) < 2:
+                continue
+            for i, good in enumerate(orb_index.match(desc)):
+                if orb_index.counts[i] >= 2:
+                    orb_sim[i, j] = len(good) / min(orb_index.counts[i], len(desc))
+        return orb_sim
+
     def _cosine_similarity(self, a: np.ndarray, b: np.ndarray) -> float:
         """Cosine similarity clamped to [0, 1]."""
         norm_a = np.linalg.norm(a)
@@ -177,3 +273,81 @@ class SimilarityCalculator:
             return 0.0
         corr, _ = pearsonr(a, b)
         return (corr + 1) / 2
+
+
+def _cosine_matrix(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """Pairwise cosine similarity of rows, clamped to [0, 1]; zero vectors score 0."""
+    norm_a = np.linalg.norm(a, axis=1)
+    norm_b = np.linalg.norm(b, axis=1)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        sim = (a @ b.T) / np.outer(norm_a, norm_b)
+    sim = np.clip(sim, 0.0, 1.0)
+    sim[(norm_a == 0)[:, None] | (norm_b == 0)[None, :]] = 0.0
+    return sim
+
+
+def _correlation_matrix(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """Pairwise Pearson correlation of rows mapped to [0, 1]; constant rows score 0."""
+    a_c = a - a.mean(axis=1, keepdims=True)
+    b_c = b - b.mean(axis=1, keepdims=True)
+    norm_a = np.linalg.norm(a_c, axis=1)
+    norm_b = np.linalg.norm(b_c, axis=1)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        corr = np.clip((a_c @ b_c.T) / np.outer(norm_a, norm_b), -1.0, 1.0)
+    sim = (corr + 1) / 2
+    sim[(a.std(axis=1) == 0)[:, None] | (b.std(axis=1) == 0)[None, :]] = 0.0
+    return sim
+
+
+# SSIM (Wang et al. 2004): 11x11 Gaussian window, sigma 1.5, K1 = 0.01, K2 = 0.03
+_SSIM_C1 = (0.01 * 255) ** 2
+_SSIM_C2 = (0.03 * 255) ** 2
+
+
+def _ssim_blur(image: np.ndarray) -> np.ndarray:
+    return cv2.GaussianBlur(image, (11, 11), 1.5)
+
+
+def _compute_ssim_stats(gray: np.ndarray) -> tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """Per-image SSIM terms in float32: (image, mu, mu^2, sigma^2)."""
+    image = np.asarray(gray, dtype=np.float32)
+    mu = _ssim_blur(image)
+    mu_sq = mu * mu
+    sigma_sq = _ssim_blur(image * image) - mu_sq
+    return image, mu, mu_sq, sigma_sq
+
+
+def _ssim_stats(
+    source: str | bytes | np.ndarray | ImageContext,
+) -> tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """SSIM terms of an image's 256x256 thumbnail, memoized on its ImageContext."""
+    ctx = ImageContext.wrap(source)
+    return ctx.cached("ssim_stats", lambda: _compute_ssim_stats(ctx.ssim_gray()))
+
+
+def _ssim_stats_gray(gray: np.ndarray) -> tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """SSIM terms of a precomputed 256x256 grayscale thumbnail."""
+    return _compute_ssim_stats(gray)
+
+
+def _ssim_matrix(ref_stats: list[tuple], kiosk_stats: list[tuple]) -> np.ndarray:
+    """(N, M) SSIM percentages from per-image terms, clamped at 0 and rounded to 2 decimals."""
+    scores = np.zeros((len(ref_stats), len(kiosk_stats)), dtype=np.float64)
+    for i, a in enumerate(ref_stats):
+        for j, b in enumerate(kiosk_stats):
+            scores[i, j] = _ssim_from_stats(a, b)
+    return np.round(np.maximum(scores, 0.0) * 100, 2)
+
+
+def _ssim_from_stats(a: tuple, b: tuple) -> float:
+    """Mean SSIM of two images from their per-image terms; only the cross term is blurred here."""
+    img1, mu1, mu1_sq, sigma1_sq = a
+    img2, mu2, mu2_sq, sigma2_sq = b
+
+    mu1_mu2 = mu1 * mu2
+    sigma12 = _ssim_blur(img1 * img2) - mu1_mu2
+
+    numerator = (2 * mu1_mu2 + _SSIM_C1) * (2 * sigma12 + _SSIM_C2)
+    # Both factors are at least C1 / C2 (variances are non-negative up to rounding)
+    denominator = (mu1_sq + mu2_sq + _SSIM_C1) * (sigma1_sq + sigma2_sq + _SSIM_C2)
+    return float((numerator / denominator).mean(dtype=np.float64))
@@ -0,0 +1,256 @@
+"""
+Stage-DAG executor for the verification pipeline.
+
+The scoring channels (traditional, SIFT, SSIM, ResNet50, OCR) only depend
+on per-image preprocessing, not on each other, and OpenCV, torch and
+Tesseract all release the GIL. Each unit of work is declared as a Stage
+with the names of the stages whose outputs it needs; StageExecutor runs
+every stage whose inputs are ready on a bounded, process-wide thread pool.
+
+- Deterministic: results come back in declaration order regardless of
+  completion order, and a stage's inputs are passed in its declared order.
+- Per-stage timeouts: a stage that runs longer than its timeout is
+  reported as "timeout" and its dependents as "skipped". The worker thread
+  itself cannot be interrupted and finishes in the background.
+- Per-stage concurrency: stages sharing a ``kind`` (e.g. every "ocr" or
+  "segment" stage) can be capped process-wide, across concurrent
+  verifications, e.g. to keep Tesseract or GrabCut from taking every core.
+"""
+
+import logging
+import threading
+import time
+from collections.abc import Callable
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Any
+
+from ..config import settings
+
+logger = logging.getLogger(__name__)
+
+# Re-check interval while a ready stage is waiting for a concurrency slot held elsewhere
+_SLOT_POLL_SECONDS = 0.02
+
+
+class Stage:
+    """One unit of pipeline work and the stages whose outputs it consumes."""
+
+    def __init__(
+        self,
+        name: str,
+        fn: Callable[..., Any],
+        requires: tuple[str, ...] = (),
+        kind: str | None = None,
+        timeout: float | None = None,
+    ):
+        """
+        Args:
+            name: Unique name within one run, e.g. "segment[3]".
+            fn: Called with the outputs of ``requires``, positionally and in order.
+            kind: Stage family used for timeout/concurrency settings; defaults
+                to the name without an "[index]" suffix.
+            timeout: Seconds; defaults to settings.stage_timeouts[kind].
+        """
+        self.name = name
+        self.fn = fn
+        self.requires = tuple(requires)
+        self.kind = kind or name.split("[", 1)[0]
+        self.timeout = timeout if timeout is not None else settings.stage_timeouts.get(self.kind)
+
+
+class StageResult:
+    """Outcome of one stage: ok, failed, timeout, or skipped (a dependency did not succeed)."""
+
+    def __init__(
+        self,
+        name: str,
+        status: str,
+        value: Any = None,
+        error: str | None = None,
+        duration_ms: float = 0.0,
+        exception: BaseException | None = None,
+    ):
+        self.name = name
+        self.status = status
+        self.value = value
+        self.error = error
+        self.duration_ms = duration_ms
+        self.exception = exception
+
+    @property
+    def ok(self) -> bool:
+        return self.status == "ok"
+
+    def to_dict(self) -> dict:
+        return {
+            "status": self.status,
+            "duration_ms": round(self.duration_ms, 1),
+            **({"error": self.error} if self.error else {}),
+        }
+
+
+# Process-wide concurrency slots per stage kind (shared by concurrent verifications)
+_slots: dict[str, threading.Semaphore] = {}
+_slots_lock = threading.Lock()
+
+
+def _slot(kind: str) -> threading.Semaphore | None:
+    limit = settings.stage_concurrency.get(kind)
+    if not limit:
+        return None
+    with _slots_lock:
+        if kind not in _slots:
+            _slots[kind] = threading.Semaphore(limit)
+        return _slots[kind]
+
+
+class StageExecutor:
+    """Runs a list of Stages as a dependency graph on a bounded thread pool."""
+
+    def __init__(self, max_workers: int):
+        self.max_workers = max(1, max_workers)
+        self._pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="stage")
+
+    def run(self, stages: list[Stage]) -> dict[str, StageResult]:
+        """
+        Run stages, each as soon as all of its requirements have succeeded.
+
+        Returns:
+            StageResult per stage name, in declaration order.
+
+        Raises:
+            ValueError: On duplicate names, unknown requirements, or a cycle.
+        """
+        self._validate(stages)
+
+        results: dict[str, StageResult] = {}
+        pending = list(stages)
+        running: dict[Future, tuple[Stage, threading.Semaphore | None]] = {}
+        started: dict[str, float] = {}
+
+        while pending or running:
+            # Submit (or skip) every pending stage whose requirements are settled, in declaration order
+            blocked = False
+            for stage in list(pending):
+                if not all(req in results for req in stage.requires):
+                    continue
+                failed = [req for req in stage.requires if not results[req].ok]
+                if failed:
+                    results[stage.name] = StageResult(
+                        stage.name, "skipped", error=f"requires {failed[0]} ({results[failed[0]].status})"
+                    )
+                    pending.remove(stage)
+                    continue
+
+                slot = _slot(stage.kind)
+                if slot is not None and not slot.acquire(blocking=False):
+                    blocked = True
+                    continue
+
+                inputs = [results[req].value for req in stage.requires]
+                future = self._pool.submit(self._call, stage, inputs, started)
+                running[future] = (stage, slot)
+                pending.remove(stage)
+
+            if not running:
+                if blocked:
+                    time.sleep(_SLOT_POLL_SECONDS)
+                    continue
+                break
+
+            timeout = self._wait_timeout(running, started, blocked)
+            done, _ = wait(list(running), timeout=timeout, return_when=FIRST_COMPLETED)
+
+            for future in done:
+                stage, slot = running.pop(future)
+                if slot is not None:
+                    slot.release()
+                results[stage.name] = self._collect(stage, future, started)
+
+            # Expire stages that have run past their timeout
+            now = time.perf_counter()
+            for future, (stage, slot) in list(running.items()):
+                begin = started.get(stage.name)
+                if stage.timeout is not None and begin is not None and now - begin > stage.timeout:
+                    running.pop(future)
+                    if slot is not None:
+                        # Released when the abandoned call actually returns
+                        future.add_done_callback(lambda _f, s=slot: s.release())
+                    results[stage.name] = StageResult(
+                        stage.name,
+                        "timeout",
+                        error=f"exceeded {stage.timeout}s",
+                        duration_ms=(now - begin) * 1000,
+                    )
+                    logger.warning("Stage %s timed out after %.1fs", stage.name, stage.timeout)
+
+        return {stage.name: results[stage.name] for stage in stages}
+
+    def shutdown(self):
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+    @staticmethod
+    def _call(stage: Stage, inputs: list, started: dict[str, float]) -> tuple[Any, float]:
+        begin = time.perf_counter()
+        started[stage.name] = begin
+        value = stage.fn(*inputs)
+        return value, (time.perf_counter() - begin) * 1000
+
+    @staticmethod
+    def _collect(stage: Stage, future: Future, started: dict[str, float]) -> StageResult:
+        try:
+            value, duration_ms = future.result()
+        except Exception as e:
+            logger.debug("Stage %s failed: %s", stage.name, e)
+            duration_ms = (time.perf_counter() - started.get(stage.name, time.perf_counter())) * 1000
+            return StageResult(stage.name, "failed", error=str(e), duration_ms=duration_ms, exception=e)
+        return StageResult(stage.name, "ok", value=value, duration_ms=duration_ms)
+
+    @staticmethod
+    def _wait_timeout(running: dict, started: dict[str, float], blocked: bool) -> float | None:
+        """Time until the earliest running stage times out (or the slot poll interval)."""
+        now = time.perf_counter()
+        remaining = [
+            stage.timeout - (now - started.get(stage.name, now))
+            for stage, _ in running.values()
+            if stage.timeout is not None
+        ]
+        if blocked:
+            remaining.append(_SLOT_POLL_SECONDS)
+        return max(0.0, min(remaining)) if remaining else None
+
+    @staticmethod
+    def _validate(stages: list[Stage]):
+        names = [stage.name for stage in stages]
+        if len(set(names)) != len(names):
+            raise ValueError("Duplicate stage names")
+        known = set(names)
+        for stage in stages:
+            for req in stage.requires:
+                if req not in known:
+                    raise ValueError(f"Stage {stage.name} requires unknown stage {req}")
+
+        # Kahn's algorithm: every stage must become ready eventually
+        remaining = {stage.name: set(stage.requires) for stage in stages}
+        while remaining:
+            ready = [name for name, reqs in remaining.items() if not reqs]
+            if not ready:
+                raise ValueError(f"Stage dependency cycle among {sorted(remaining)}")
+            for name in ready:
+                del remaining[name]
+            for reqs in remaining.values():
+                reqs.difference_update(ready)
+
+
+_executor: StageExecutor | None = None
+_executor_lock = threading.Lock()
+
+
+def get_stage_executor() -> StageExecutor:
+    """Return the process-wide StageExecutor sized by settings.stage_workers."""
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = StageExecutor(settings.stage_workers)
+    return _executor
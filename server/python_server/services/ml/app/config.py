@@ -34,21 +34,44 @@ class Settings(BaseSettings):
 
     # Image processing
     max_image_size: int = 4096
+    white_balance_method: str = "lut"  # "lut" (subsampled gains, cv2.LUT) or "float" (full-frame float64)
+    white_balance_sample_step: int = 1  # gray-world means from every Nth pixel per axis ("lut" only)
+    decode_working_size: int = 1024  # JPEG DCT-scaled decode keeps the long side >= this (0 = full)
     target_size: tuple[int, int] = (640, 640)
 
     # Feature extraction
     orb_features_count: int = 200
     sift_ratio_threshold: float = 0.7
+    sift_rootsift: bool = False  # Hellinger-kernel descriptors (applies to references and kiosk captures)
+    sift_reference_max_keypoints: int = 1000  # keypoints kept per reference image in bundles
+    sift_max_side: int = 1024  # detection working resolution, long side in pixels (0 = item crop resolution)
+    sift_max_keypoints: int = 2000  # keypoint budget per image (0 = unlimited)
+    sift_keypoint_selection: str = "grid"  # "response" (strongest) or "grid" (strongest per 8x8 cell)
+    sift_ransac_method: str = "ransac"  # "ransac" or "usac_magsac"/"_accurate"/"_fast"/"_default"/"_prosac"
+    sift_ransac_threshold: float = 5.0  # reprojection threshold in working-resolution pixels
     lbp_points: int = 8
     lbp_radius: int = 1
+    lbp_max_side: int = 320  # multi-scale LBP working resolution, long side in pixels (0 = crop resolution)
     color_hist_bins: int = 32
 
     # Deep learning
     enable_deep_learning: bool = True
     resnet_feature_dim: int = 2048
+    deep_max_batch_size: int = 8  # images per ResNet50 forward pass
+    deep_batch_window_ms: float = 0.0  # cross-request micro-batching window (0 = off; needs worker_processes = 0)
+    deep_backend: str = "torch"  # "torch", "onnx", or "onnx_int8"
+    deep_onnx_dir: str = "/tmp/engirent_models"  # exported / quantized ONNX models
+    deep_onnx_threads: int = 0  # onnxruntime intra-op threads (0 = runtime default)
+    deep_parity_check: bool = False  # report cosine agreement vs torch during warm-up
 
     # OCR
     enable_ocr: bool = True
+    ocr_pool_size: int = 2  # long-lived tesserocr handles per process (pytesseract fallback has no pool)
+    ocr_tessdata_path: str = ""  # tessdata directory for tesserocr ("" = library default)
+    ocr_text_regions: bool = True  # recognize only detected text regions instead of the full frame
+    ocr_max_regions: int = 12
+    ocr_text_score_threshold: float = 0.2  # % of a kiosk frame covered by text regions before OCR runs
+    ocr_reference_cache_size: int = 256  # reference images whose OCR text is remembered per process
 
     # Quality gate thresholds
     quality_min_blur_score: float = 50.0
@@ -62,10 +85,42 @@ class Settings(BaseSettings):
     # Score aggregation
     min_good_pairs: int = 2
     score_aggregation: str = "trimmed_mean"  # "max", "median", "trimmed_mean"
+    enable_cascade: bool = False  # cheapest channels first, stop once the decision is bounded
+
+    # Stage graph: scoring channels and per-image preprocessing run concurrently
+    stage_workers: int = 4  # threads in the per-process stage pool (0 = run channels sequentially)
+    stage_timeouts: dict[str, float] = {}  # seconds per stage kind, e.g. {"ocr": 20}
+    stage_concurrency: dict[str, int] = {}  # process-wide cap per stage kind, e.g. {"segment": 2}
 
     # Storage (for uploaded images)
     upload_dir: str = "/tmp/engirent_uploads"
 
+    # Reference feature store (/extract-features with item_id, /verify-item/{item_id})
+    feature_store_path: str = "/tmp/engirent_features/features.sqlite3"
+    feature_store_cache_size: int = 128  # decoded items kept in memory per process
+
+    # GrabCut segmentation: run on a low-resolution proxy and upsample the mask
+    grabcut_proxy_size: int = 320  # long side of the proxy in pixels (0 = full resolution)
+    grabcut_refine_band: int = 0  # re-label this many pixels around the boundary at full resolution (0 = off)
+    grabcut_refine_iterations: int = 2
+
+    # Registered empty-locker frames (POST /kiosk-background) for kiosk background subtraction
+    kiosk_background_dir: str = "/tmp/engirent_backgrounds"
+    kiosk_background_cache_size: int = 64  # decoded frames kept in memory per process
+    kiosk_background_diff_threshold: int = 30  # gray-level difference counted as foreground
+    kiosk_background_min_coverage: float = 0.01  # masks outside these bounds fall back to GrabCut
+    kiosk_background_max_coverage: float = 0.85
+
+    # Executor — CPU-bound verification runs off the asyncio event loop
+    worker_processes: int = 1  # 0 = run CPU jobs on an in-process thread pool instead
+    worker_threads: int = 2  # CPU pool size when worker_processes == 0
+    worker_max_queue: int = 8  # running + waiting CPU jobs before /verify answers 503
+    worker_preload_models: bool = True  # load ResNet50 / dlib in each worker at startup
+    io_threads: int = 4
+
+    # Startup warm-up: dummy ResNet50 / dlib / Tesseract pass before reporting ready
+    enable_warmup: bool = True
+
     model_config = {"env_prefix": "ML_"}
 
 
@@ -0,0 +1,293 @@
+"""
+Serialization of reference features (Item.mlFeatures).
+
+Two wire formats are supported:
+
+- Legacy JSON: every vector as a float list. 2048 float64 ResNet values per
+  image plus HOG/LBP/color vectors, re-parsed with json.loads on every
+  /verify. ORB descriptor matrices become nested int lists.
+- Binary bundle: a small versioned header followed by contiguous arrays
+  (float16 embeddings, float32 traditional vectors, uint8 ORB descriptor
+  blocks). Arrays are loaded with np.frombuffer, so decoding is zero-copy.
+
+Bundle layout (all integers little-endian):
+
+    magic    4 bytes   b"ERFB"
+    version  uint16
+    hlen     uint32    length of the JSON header
+    header   JSON      {"meta": {...}, "arrays": {name: {dtype, shape, offset}}}
+    padding  to a 16-byte boundary
+    data     arrays, each starting on a 16-byte boundary (offsets relative to data)
+
+decode_reference_features() accepts any of: a JSON string, a base64 bundle
+string, or raw bundle bytes, and always returns the dict layout that
+HybridVerifier.verify expects.
+
+BUNDLE_VERSION is the container layout; FEATURE_VERSION (stored in meta)
+is the feature schema:
+
+    1  traditional vectors, ORB descriptors, ResNet50 embeddings, OCR text
+    2  + pHash/dHash bits, SIFT keypoints/descriptors, 256x256 SSIM thumbnails,
+       enough to verify without the original images
+
+Version-2 channels are bundle-only; the legacy JSON format stays at version 1.
+
+meta also records "extraction": the values of the settings each channel
+depends on (decode size, GrabCut proxy, LBP resolution, RootSIFT, ...).
+HybridVerifier treats a channel as stale when they differ from the
+current settings; see comparison.hybrid.REFERENCE_SETTINGS.
+"""
+
+import base64
+import binascii
+import json
+import struct
+
+import numpy as np
+
+from .deep import l2_normalize
+
+BUNDLE_MAGIC = b"ERFB"
+BUNDLE_VERSION = 1
+FEATURE_VERSION = 2
+_PREFIX = struct.Struct("<4sHI")
+_ALIGN = 16
+
+TRADITIONAL_VECTORS = ("color", "color_spatial", "shape", "texture", "hog")
+BUNDLE_ONLY_CHANNELS = ("phash", "dhash", "sift", "sift_rootsift", "ssim", "feature_version")
+
+
+def _aligned(n: int) -> int:
+    return (n + _ALIGN - 1) // _ALIGN * _ALIGN
+
+
+def pack_arrays(arrays: dict[str, np.ndarray], meta: dict) -> bytes:
+    """Pack named arrays and a JSON-serializable meta dict into a bundle."""
+    index = {}
+    offset = 0
+    for name, arr in arrays.items():
+        index[name] = {"dtype": arr.dtype.str, "shape": list(arr.shape), "offset": offset}
+        offset = _aligned(offset + arr.nbytes)
+
+    header = json.dumps({"meta": meta, "arrays": index}, separators=(",", ":")).encode()
+    data_start = _aligned(_PREFIX.size + len(header))
+
+    out = bytearray(data_start + offset)
+    _PREFIX.pack_into(out, 0, BUNDLE_MAGIC, BUNDLE_VERSION, len(header))
+    out[_PREFIX.size : _PREFIX.size + len(header)] = header
+    for name, arr in arrays.items():
+        start = data_start + index[name]["offset"]
+        out[start : start + arr.nbytes] = np.ascontiguousarray(arr).tobytes()
+    return bytes(out)
+
+
+def unpack_arrays(data: bytes | bytearray | memoryview) -> tuple[dict, dict[str, np.ndarray]]:
+    """
+    Parse a bundle into (meta, arrays). Arrays are read-only views into data.
+
+    Raises:
+        ValueError: If data is not a bundle or has an unsupported version.
+    """
+    if len(data) < _PREFIX.size:
+        raise ValueError("Feature bundle is truncated")
+    magic, version, hlen = _PREFIX.unpack_from(data, 0)
+    if magic != BUNDLE_MAGIC:
+        raise ValueError("Not a feature bundle (bad magic)")
+    if version > BUNDLE_VERSION:
+        raise ValueError(f"Unsupported feature bundle version {version}")
+
+    header = json.loads(bytes(data[_PREFIX.size : _PREFIX.size + hlen]))
+    data_start = _aligned(_PREFIX.size + hlen)
+
+    arrays = {}
+    for name, spec in header["arrays"].items():
+        dtype = np.dtype(spec["dtype"])
+        shape = tuple(spec["shape"])
+        count = int(np.prod(shape)) if shape else 1
+        arrays[name] = np.frombuffer(
+            data, dtype=dtype, count=count, offset=data_start + spec["offset"]
+        ).reshape(shape)
+    return header["meta"], arrays
+
+
+def is_bundle(data: bytes | bytearray | memoryview) -> bool:
+    return len(data) >= 4 and bytes(data[:4]) == BUNDLE_MAGIC
+
+
+def encode_bundle(features: dict) -> bytes:
+    """Encode the dict returned by HybridVerifier.extract_reference_features as a bundle."""
+    traditional = features.get("traditional", [])
+    arrays: dict[str, np.ndarray] = {}
+
+    if traditional:
+        for name in TRADITIONAL_VECTORS:
+            arrays[f"traditional.{name}"] = np.stack(
+                [np.asarray(f[name], dtype=np.float32).ravel() for f in traditional]
+            )
+
+        # ORB matrices vary in length: one uint8 block plus per-image row counts
+        orb = [f.get("orb_descriptors") for f in traditional]
+        orb = [np.asarray(d, dtype=np.uint8).reshape(-1, 32) if d is not None else None for d in orb]
+        arrays["traditional.orb_counts"] = np.array(
+            [len(d) if d is not None else -1 for d in orb], dtype=np.int32
+        )
+        blocks = [d for d in orb if d is not None and len(d)]
+        arrays["traditional.orb_descriptors"] = (
+            np.concatenate(blocks) if blocks else np.zeros((0, 32), dtype=np.uint8)
+        )
+
+    deep = features.get("deep")
+    if deep is not None and len(deep):
+        arrays["deep"] = np.stack([np.asarray(v, dtype=np.float16) for v in deep])
+
+    # Hashes are already packed uint64 words (see phash.pack_hash_bits)
+    hash_bits = 0
+    for name in ("phash", "dhash"):
+        hashes = features.get(name) or []
+        if len(hashes):
+            arrays[name] = np.stack([np.asarray(h, dtype="<u8") for h in hashes])
+            hash_bits = arrays[name].shape[1] * 64
+
+    sift = features.get("sift") or []
+    rootsift = bool(features.get("sift_rootsift", False))
+    if sift:
+        # Plain SIFT descriptors are integral 0-255 values (lossless as uint8);
+        # RootSIFT values are in [0, 1] and stored as float16
+        des_dtype = np.float16 if rootsift else np.uint8
+        descriptors = [d["descriptors"] for d in sift]
+        arrays["sift.counts"] = np.array(
+            [len(d) if d is not None else 0 for d in descriptors], dtype=np.int32
+        )
+        arrays["sift.points"] = np.concatenate(
+            [np.asarray(d["points"], dtype=np.float32).reshape(-1, 2) for d in sift]
+        )
+        blocks = [np.asarray(d, dtype=des_dtype) for d in descriptors if d is not None and len(d)]
+        arrays["sift.descriptors"] = (
+            np.concatenate(blocks) if blocks else np.zeros((0, 128), dtype=des_dtype)
+        )
+
+    ssim = features.get("ssim") or []
+    if len(ssim):
+        arrays["ssim"] = np.stack([np.asarray(g, dtype=np.uint8) for g in ssim])
+
+    meta = {
+        "image_count": features.get("image_count", len(traditional)),
+        "ocr_texts": features.get("ocr_texts", []),
+        "feature_version": features.get("feature_version", 1),
+        "sift_rootsift": rootsift,
+        "hash_bits": hash_bits,
+        "extraction": features.get("extraction", {}),
+    }
+    return pack_arrays(arrays, meta)
+
+
+def decode_bundle(data: bytes | bytearray | memoryview) -> dict:
+    """Decode a bundle into the reference_features dict layout (zero-copy views)."""
+    meta, arrays = unpack_arrays(data)
+
+    traditional = []
+    counts = arrays.get("traditional.orb_counts")
+    if counts is not None:
+        orb_block = arrays["traditional.orb_descriptors"]
+        start = 0
+        for i, count in enumerate(counts):
+            feat = {name: arrays[f"traditional.{name}"][i] for name in TRADITIONAL_VECTORS}
+            if count < 0:
+                feat["orb_descriptors"] = None
+            else:
+                feat["orb_descriptors"] = orb_block[start : start + count]
+                start += int(count)
+            traditional.append(feat)
+
+    # Unit-length float32 rows, converted once here rather than on every verify
+    deep = l2_normalize(arrays["deep"]) if "deep" in arrays else []
+
+    features = {
+        "traditional": traditional,
+        "deep": deep,
+        "ocr_texts": meta.get("ocr_texts", []),
+        "image_count": meta.get("image_count", len(traditional)),
+        "feature_version": meta.get("feature_version", 1),
+        "sift_rootsift": meta.get("sift_rootsift", False),
+        "extraction": meta.get("extraction", {}),
+    }
+
+    for name in ("phash", "dhash"):
+        if name in arrays:
+            features[name] = arrays[name]
+
+    if "sift.counts" in arrays:
+        points, descriptors = arrays["sift.points"], arrays["sift.descriptors"]
+        sift = []
+        start = 0
+        for count in arrays["sift.counts"]:
+            end = start + int(count)
+            sift.append({
+                "points": points[start:end],
+                "descriptors": descriptors[start:end] if count else None,
+            })
+            start = end
+        features["sift"] = sift
+
+    if "ssim" in arrays:
+        features["ssim"] = list(arrays["ssim"])
+
+    return features
+
+
+def to_json_safe(features: dict) -> dict:
+    """
+    Convert numpy arrays in a features dict to plain lists for the legacy JSON format.
+
+    Version-2 channels (SIFT descriptor matrices, SSIM thumbnails, hashes)
+    are dropped: they are only carried by binary bundles.
+    """
+    return {
+        **{k: v for k, v in features.items() if k not in BUNDLE_ONLY_CHANNELS},
+        "traditional": [
+            {k: (v.tolist() if isinstance(v, np.ndarray) else v) for k, v in f.items()}
+            for f in features.get("traditional", [])
+        ],
+        "deep": [np.asarray(v).tolist() for v in features.get("deep", [])],
+    }
+
+
+def normalize_features(features: dict) -> dict:
+    """Turn legacy JSON lists back into the numpy arrays the comparison layer expects."""
+    traditional = []
+    for f in features.get("traditional", []):
+        feat = {
+            k: np.asarray(v, dtype=np.float64) if k in TRADITIONAL_VECTORS else v
+            for k, v in f.items()
+        }
+        orb = f.get("orb_descriptors")
+        feat["orb_descriptors"] = np.asarray(orb, dtype=np.uint8).reshape(-1, 32) if orb else None
+        traditional.append(feat)
+    deep = features.get("deep") or []
+    return {**features, "traditional": traditional, "deep": l2_normalize(deep) if deep else []}
+
+
+def decode_reference_features(payload: str | bytes) -> dict:
+    """
+    Decode reference features from any supported encoding.
+
+    Args:
+        payload: Legacy JSON text, a base64-encoded bundle, or raw bundle bytes.
+
+    Raises:
+        ValueError: If the payload is none of the above.
+    """
+    if isinstance(payload, (bytes, bytearray, memoryview)):
+        if is_bundle(payload):
+            return decode_bundle(payload)
+        payload = bytes(payload).decode()
+
+    text = payload.strip()
+    if text.startswith("{"):
+        return normalize_features(json.loads(text))
+
+    try:
+        raw = base64.b64decode(text, validate=True)
+    except (binascii.Error, ValueError) as e:
+        raise ValueError("reference_features is neither JSON nor a base64 feature bundle") from e
+    return decode_bundle(raw)
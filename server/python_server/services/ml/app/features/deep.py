@@ -7,6 +7,9 @@ vector that captures high-level visual semantics.
 
 These features understand complex patterns, object parts, and
 visual concepts far beyond what traditional CV can capture.
+
+Inference runs on the backend selected by ML_DEEP_BACKEND (eager torch,
+ONNX Runtime, or int8-quantized ONNX) — see deep_backends.py.
 """
 
 import logging
@@ -14,39 +17,51 @@ import logging
 import numpy as np
 
 from ..config import settings
+from ..utils.context import ImageContext
+from .deep_backends import get_backend, to_input_batch
+from .embedding_service import batching_enabled, get_embedding_service
 
 logger = logging.getLogger(__name__)
 
 # Lazy imports - PyTorch is heavy, only load when needed
 _model = None
-_transform = None
 
 
 def _load_model():
-    """Lazily load ResNet50 and preprocessing transform."""
-    global _model, _transform
+    """Lazily load ResNet50 with the classification head removed."""
+    global _model
 
     if _model is not None:
-        return _model, _transform
+        return _model
 
     import torch
     import torchvision.models as models
-    import torchvision.transforms as transforms
 
     # Load pre-trained ResNet50, remove classification head
     resnet = models.resnet50(weights=models.ResNet50_Weights.IMAGENET1K_V2)
     _model = torch.nn.Sequential(*list(resnet.children())[:-1])
     _model.eval()
 
-    _transform = transforms.Compose([
-        transforms.Resize(256),
-        transforms.CenterCrop(224),
-        transforms.ToTensor(),
-        transforms.Normalize(mean=[0.485, 0.456, 0.406], std=[0.229, 0.224, 0.225]),
-    ])
-
+    # Resize(256) + CenterCrop(224) is done once per image by ImageContext.deep_input(),
+    # ImageNet normalization by deep_backends.to_input_batch()
     logger.info("ResNet50 model loaded successfully")
-    return _model, _transform
+    return _model
+
+
+def l2_normalize(embeddings: list | np.ndarray) -> np.ndarray:
+    """
+    Stack embeddings into a contiguous (N, D) float32 matrix of unit-length rows.
+
+    Cosine similarity then reduces to a dot product, so a whole reference x
+    kiosk score matrix is one matmul. All-zero rows (deep learning disabled)
+    stay zero. Idempotent.
+    """
+    if len(embeddings) == 0:
+        return np.zeros((0, settings.resnet_feature_dim), dtype=np.float32)
+    matrix = np.array(embeddings, dtype=np.float32).reshape(len(embeddings), -1)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    np.divide(matrix, norms, out=matrix, where=norms > 0)
+    return matrix
 
 
 class DeepFeatureExtractor:
@@ -55,47 +70,61 @@ class DeepFeatureExtractor:
     def __init__(self):
         self.enabled = settings.enable_deep_learning
         self.feature_dim = settings.resnet_feature_dim
+        self.max_batch_size = max(1, settings.deep_max_batch_size)
 
-    def extract(self, source: str | bytes | np.ndarray) -> np.ndarray:
+    def extract(self, source: str | bytes | np.ndarray | ImageContext) -> np.ndarray:
         """
         Extract a 2048-d feature vector from an image.
 
         Args:
-            source: File path, raw bytes, or numpy array (BGR).
+            source: File path, raw bytes, numpy array (BGR), or ImageContext.
 
         Returns:
             numpy array of shape (2048,).
         """
-        if not self.enabled:
-            return np.zeros(self.feature_dim)
+        return self.extract_batch([source])[0]
 
-        import torch
-        from PIL import Image
+    def extract_batch(self, sources: list[str | bytes | np.ndarray | ImageContext]) -> list[np.ndarray]:
+        """
+        Extract features from multiple images with batched forward passes.
+
+        All transformed images are stacked into one (N, 3, 224, 224) tensor and
+        run through ResNet50 in chunks of at most deep_max_batch_size, instead
+        of one batch-size-1 forward pass per image. When deep_batch_window_ms
+        is set and jobs run on the in-process thread pool (worker_processes
+        = 0), inputs go through the process-wide EmbeddingBatcher so that
+        concurrent verifications share forward passes.
 
-        model, transform = _load_model()
+        Returns:
+            One numpy array of shape (2048,) per source, in input order.
+        """
+        if not self.enabled:
+            return [np.zeros(self.feature_dim) for _ in sources]
+        if not sources:
+            return []
 
-        # Convert source to PIL Image
-        if isinstance(source, str):
-            img = Image.open(source).convert("RGB")
-        elif isinstance(source, bytes):
-            import io
+        for source in sources:
+            if not isinstance(source, (str, bytes, np.ndarray, ImageContext)):
+                raise ValueError(f"Unsupported source type: {type(source)}")
 
-            img = Image.open(io.BytesIO(source)).convert("RGB")
-        elif isinstance(source, np.ndarray):
-            import cv2
+        # 224x224 RGB crops, decoded and resized once per image per request
+        inputs = [ImageContext.wrap(src).deep_input() for src in sources]
 
-            rgb = cv2.cvtColor(source, cv2.COLOR_BGR2RGB)
-            img = Image.fromarray(rgb)
-        else:
-            raise ValueError(f"Unsupported source type: {type(source)}")
+        if batching_enabled():
+            return get_embedding_service(self._forward).embed(inputs)
+        return self._forward(inputs)
 
-        tensor = transform(img).unsqueeze(0)
+    def extract_matrix(self, sources: list[str | bytes | np.ndarray | ImageContext]) -> np.ndarray:
+        """extract_batch as an L2-normalized (N, 2048) float32 matrix (see l2_normalize)."""
+        return l2_normalize(self.extract_batch(sources))
 
-        with torch.no_grad():
-            features = model(tensor)
+    def _forward(self, inputs: list[np.ndarray]) -> list[np.ndarray]:
+        """Run 224x224 RGB inputs through the configured backend in chunks of max_batch_size."""
+        backend = get_backend()
 
-        return features.squeeze().numpy()  # (2048,)
+        features: list[np.ndarray] = []
+        for start in range(0, len(inputs), self.max_batch_size):
+            batch = to_input_batch(inputs[start : start + self.max_batch_size])
+            features.extend(backend.embed(batch))  # (B, 2048) rows
 
-    def extract_batch(self, sources: list[str | bytes | np.ndarray]) -> list[np.ndarray]:
-        """Extract features from multiple images."""
-        return [self.extract(src) for src in sources]
+        return features
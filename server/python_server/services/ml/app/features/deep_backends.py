@@ -0,0 +1,176 @@
+"""
+Inference backends for the ResNet50 feature extractor.
+
+Eager PyTorch ResNet50 is the slowest single stage of verification on our
+CPU-only instances. The backend is selected with ML_DEEP_BACKEND:
+
+- "torch":     the original eager PyTorch model.
+- "onnx":      the same network exported to ONNX and run by onnxruntime.
+- "onnx_int8": the ONNX export with dynamically quantized int8 weights.
+
+ONNX files are exported from the torch model on first use and cached under
+deep_onnx_dir; once they exist, the ONNX backends never import torch, which
+is where most of the resident-memory saving comes from. If onnxruntime is
+not installed the extractor falls back to torch with a warning.
+
+All backends share the same numpy preprocessing (ImageNet normalization of
+the 224x224 RGB crops) and return (B, 2048) float32 arrays.
+"""
+
+import logging
+import os
+import threading
+
+import numpy as np
+
+from ..config import settings
+
+logger = logging.getLogger(__name__)
+
+IMAGENET_MEAN = np.array([0.485, 0.456, 0.406], dtype=np.float32)
+IMAGENET_STD = np.array([0.229, 0.224, 0.225], dtype=np.float32)
+
+BACKENDS = ("torch", "onnx", "onnx_int8")
+
+
+def to_input_batch(images: list[np.ndarray]) -> np.ndarray:
+    """Stack 224x224 RGB uint8 crops into a normalized (B, 3, 224, 224) float32 batch."""
+    batch = np.stack(images).astype(np.float32) / 255.0
+    batch = (batch - IMAGENET_MEAN) / IMAGENET_STD
+    return np.ascontiguousarray(batch.transpose(0, 3, 1, 2))
+
+
+class TorchBackend:
+    """Eager PyTorch ResNet50."""
+
+    name = "torch"
+
+    def __init__(self):
+        from .deep import _load_model
+
+        self.model = _load_model()
+
+    def embed(self, batch: np.ndarray) -> np.ndarray:
+        import torch
+
+        with torch.inference_mode():
+            output = self.model(torch.from_numpy(batch))
+        return output.flatten(1).numpy().copy()
+
+
+class OnnxBackend:
+    """ResNet50 exported to ONNX and run with onnxruntime (optionally int8-quantized)."""
+
+    def __init__(self, quantized: bool = False):
+        import onnxruntime as ort
+
+        self.name = "onnx_int8" if quantized else "onnx"
+        path = _ensure_onnx_model(quantized)
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if settings.deep_onnx_threads > 0:
+            options.intra_op_num_threads = settings.deep_onnx_threads
+        self.session = ort.InferenceSession(path, options, providers=["CPUExecutionProvider"])
+        self.input_name = self.session.get_inputs()[0].name
+        logger.info("ONNX backend %s loaded from %s", self.name, path)
+
+    def embed(self, batch: np.ndarray) -> np.ndarray:
+        (output,) = self.session.run(None, {self.input_name: batch})
+        return output.reshape(len(batch), -1)
+
+
+def _ensure_onnx_model(quantized: bool) -> str:
+    """Return the path of the (quantized) ONNX model, exporting it from torch if missing."""
+    os.makedirs(settings.deep_onnx_dir, exist_ok=True)
+    fp32_path = os.path.join(settings.deep_onnx_dir, "resnet50_features.onnx")
+    int8_path = os.path.join(settings.deep_onnx_dir, "resnet50_features.int8.onnx")
+
+    if not os.path.exists(fp32_path):
+        import torch
+
+        from .deep import _load_model
+
+        model = _load_model()
+        dummy = torch.zeros(1, 3, 224, 224)
+        tmp_path = fp32_path + ".tmp"
+        torch.onnx.export(
+            model,
+            dummy,
+            tmp_path,
+            input_names=["input"],
+            output_names=["features"],
+            dynamic_axes={"input": {0: "batch"}, "features": {0: "batch"}},
+            opset_version=17,
+        )
+        os.replace(tmp_path, fp32_path)
+        logger.info("Exported ResNet50 to %s", fp32_path)
+
+    if not quantized:
+        return fp32_path
+
+    if not os.path.exists(int8_path):
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+
+        tmp_path = int8_path + ".tmp"
+        quantize_dynamic(fp32_path, tmp_path, weight_type=QuantType.QInt8)
+        os.replace(tmp_path, int8_path)
+        logger.info("Quantized ResNet50 to %s", int8_path)
+
+    return int8_path
+
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def _create_backend(name: str):
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown deep backend {name!r}; expected one of {BACKENDS}")
+    if name == "torch":
+        return TorchBackend()
+    try:
+        return OnnxBackend(quantized=name == "onnx_int8")
+    except ImportError as e:
+        logger.warning("onnxruntime not available (%s), falling back to torch backend", e)
+        return TorchBackend()
+
+
+def get_backend():
+    """Return the process-wide backend selected by settings.deep_backend."""
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                _backend = _create_backend(settings.deep_backend)
+    return _backend
+
+
+def check_parity(images: list[np.ndarray] | None = None) -> dict:
+    """
+    Compare the active backend's embeddings against the torch reference.
+
+    Args:
+        images: 224x224 RGB uint8 crops. Defaults to a few seeded random images.
+
+    Returns:
+        Dict with the backend name and min/mean cosine agreement per image.
+    """
+    if images is None:
+        rng = np.random.default_rng(0)
+        images = [rng.integers(0, 256, (224, 224, 3), dtype=np.uint8) for _ in range(4)]
+
+    backend = get_backend()
+    batch = to_input_batch(images)
+    candidate = backend.embed(batch)
+    reference = candidate if backend.name == "torch" else TorchBackend().embed(batch)
+
+    norms = np.linalg.norm(candidate, axis=1) * np.linalg.norm(reference, axis=1)
+    cosines = np.sum(candidate * reference, axis=1) / np.maximum(norms, 1e-12)
+
+    return {
+        "backend": backend.name,
+        "images": len(images),
+        "min_cosine": round(float(cosines.min()), 6),
+        "mean_cosine": round(float(cosines.mean()), 6),
+    }
@@ -0,0 +1,117 @@
+"""
+Cross-request dynamic micro-batcher for ResNet50 embeddings.
+
+When several kiosks verify at the same moment, each request would run its
+own ResNet50 forward passes and they would compete for the same cores.
+The EmbeddingBatcher sits in front of DeepFeatureExtractor: callers submit
+preprocessed 224x224 inputs and get a Future back; a single background
+thread collects submissions for up to ``deep_batch_window_ms`` (or until
+``deep_max_batch_size`` inputs are waiting) and runs them as one batch.
+
+Batching only changes how inputs are grouped into forward passes, never
+which vector a caller gets back, so single-request results are unchanged.
+The batcher is per process, so it can only merge verifications that run
+concurrently in one process: the in-process thread-pool executor
+(worker_processes = 0). A ProcessPoolExecutor worker runs one job at a
+time, so there the window would only add latency and batching stays off
+(see batching_enabled).
+"""
+
+import logging
+import queue
+import threading
+import time
+from collections.abc import Callable
+from concurrent.futures import Future
+
+import numpy as np
+
+from ..config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class EmbeddingBatcher:
+    """Collects embedding requests over a short window and runs them as one batch."""
+
+    def __init__(
+        self,
+        embed_fn: Callable[[list[np.ndarray]], list[np.ndarray]],
+        window_ms: float,
+        max_batch_size: int,
+    ):
+        self._embed_fn = embed_fn
+        self._window = window_ms / 1000.0
+        self._max_batch_size = max(1, max_batch_size)
+        self._queue: queue.Queue[tuple[np.ndarray, Future]] = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name="embedding-batcher", daemon=True)
+        self._thread.start()
+
+    def submit(self, item: np.ndarray) -> Future:
+        """Queue one preprocessed input; the Future resolves to its embedding."""
+        future: Future = Future()
+        self._queue.put((item, future))
+        return future
+
+    def embed(self, items: list[np.ndarray]) -> list[np.ndarray]:
+        """Submit several inputs and block until all their embeddings are ready."""
+        futures = [self.submit(item) for item in items]
+        return [f.result() for f in futures]
+
+    def _collect(self) -> list[tuple[np.ndarray, Future]]:
+        """Block for the first request, then gather more until the window closes or the batch is full."""
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self._window
+        while len(batch) < self._max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            items = [item for item, _ in batch]
+            try:
+                results = self._embed_fn(items)
+            except Exception as e:
+                logger.exception("Embedding batch of %d failed", len(items))
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+
+            for (_, future), result in zip(batch, results):
+                future.set_result(result)
+            logger.debug("Embedded batch of %d", len(items))
+
+
+def batching_enabled() -> bool:
+    """Whether embeddings go through the batcher: a window is set and jobs share this process."""
+    return settings.deep_batch_window_ms > 0 and settings.worker_processes == 0
+
+
+_service: EmbeddingBatcher | None = None
+_service_lock = threading.Lock()
+
+
+def get_embedding_service(embed_fn: Callable[[list[np.ndarray]], list[np.ndarray]]) -> EmbeddingBatcher:
+    """Return the process-wide batcher, starting it on first use."""
+    global _service
+    if _service is None:
+        with _service_lock:
+            if _service is None:
+                _service = EmbeddingBatcher(
+                    embed_fn,
+                    window_ms=settings.deep_batch_window_ms,
+                    max_batch_size=settings.deep_max_batch_size,
+                )
+                logger.info(
+                    "Embedding batcher started (window %.1f ms, max batch %d)",
+                    settings.deep_batch_window_ms,
+                    settings.deep_max_batch_size,
+                )
+    return _service
@@ -0,0 +1,107 @@
+"""
+Vectorized multi-scale uniform LBP.
+
+Replaces three scikit-image ``local_binary_pattern(method="uniform")``
+calls (R = 1, 2, 4 with P = 8R), which loop per pixel in Cython, with
+whole-array numpy operations:
+
+- Each sample point is bilinearly interpolated from four shifted views of
+  one zero-padded float64 image. Shifted views are plain slices and are
+  shared by every radius that samples the same integer offset.
+- The per-pixel weights are computed exactly as scikit-image computes them
+  (from absolute coordinates, in the same operation order), so codes and
+  histograms are identical to the reference implementation at the same
+  resolution (see benchmarks/lbp_parity.py).
+- Uniform codes come from bit counts and 0/1 transition counts over the
+  sign planes rather than a lookup table, since 2^32 entries for P = 32
+  would not fit.
+"""
+
+import numpy as np
+
+LBP_RADII = (1, 2, 4)
+
+
+def _sample_offsets(points: int, radius: int) -> tuple[np.ndarray, np.ndarray]:
+    """Row/column offsets of the sample points, rounded like scikit-image."""
+    angles = 2 * np.pi * np.arange(points, dtype=np.float64) / points
+    return np.round(-radius * np.sin(angles), 5), np.round(radius * np.cos(angles), 5)
+
+
+def _lerp(a: np.ndarray, b: np.ndarray, weight: np.ndarray, out: np.ndarray, scratch: np.ndarray) -> np.ndarray:
+    """(1 - weight) * a + weight * b into out, with the same rounding as the plain expression."""
+    np.multiply(1 - weight, a, out=out)
+    np.multiply(weight, b, out=scratch)
+    return np.add(out, scratch, out=out)
+
+
+def uniform_lbp_histograms(gray: np.ndarray, radii: tuple[int, ...] = LBP_RADII) -> list[np.ndarray]:
+    """
+    Normalized uniform-LBP histograms for each radius (P = 8 * radius).
+
+    Out-of-image samples read as 0, like scikit-image's constant mode.
+
+    Returns:
+        One float64 histogram of P + 2 bins per radius, summing to 1
+        (all zeros for an empty image).
+    """
+    image = np.asarray(gray, dtype=np.float64)
+    rows, cols = image.shape
+    if image.size == 0:
+        return [np.zeros(8 * radius + 2) for radius in radii]
+
+    pad = max(radii) + 1
+    padded = np.zeros((rows + 2 * pad, cols + 2 * pad), dtype=np.float64)
+    padded[pad : pad + rows, pad : pad + cols] = image
+
+    row_idx = np.arange(rows, dtype=np.float64)[:, None]
+    col_idx = np.arange(cols, dtype=np.float64)[None, :]
+    views: dict[tuple[int, int], np.ndarray] = {}
+
+    def shifted(dr: int, dc: int) -> np.ndarray:
+        """image[r + dr, c + dc] for every pixel (0 outside the image)."""
+        key = (dr, dc)
+        if key not in views:
+            views[key] = padded[pad + dr : pad + dr + rows, pad + dc : pad + dc + cols]
+        return views[key]
+
+    buffers = [np.empty((rows, cols), dtype=np.float64) for _ in range(4)]
+    bits = [np.empty((rows, cols), dtype=bool) for _ in range(2)]
+
+    hists = []
+    for radius in radii:
+        points = 8 * radius
+        rp, cp = _sample_offsets(points, radius)
+
+        ones = np.zeros((rows, cols), dtype=np.uint8)
+        changes = np.zeros((rows, cols), dtype=np.uint8)
+        previous = None
+        for i in range(points):
+            # Absolute sample coordinates, floor/ceil and fractional weights as in
+            # skimage's bilinear_interpolation; r + rp[i] only varies along rows
+            r = row_idx + rp[i]
+            c = col_idx + cp[i]
+            min_r, max_r = int(np.floor(rp[i])), int(np.ceil(rp[i]))
+            min_c, max_c = int(np.floor(cp[i])), int(np.ceil(cp[i]))
+            weight_r = r - np.floor(r)
+            weight_c = c - np.floor(c)
+
+            # A zero weight makes (1 - w) * a + w * b exactly a, so integer offsets skip that axis
+            if min_c == max_c:
+                top, bottom = shifted(min_r, min_c), shifted(max_r, min_c)
+            else:
+                top = _lerp(shifted(min_r, min_c), shifted(min_r, max_c), weight_c, buffers[0], buffers[1])
+                bottom = _lerp(shifted(max_r, min_c), shifted(max_r, max_c), weight_c, buffers[2], buffers[1])
+            texture = top if min_r == max_r else _lerp(top, bottom, weight_r, buffers[0], buffers[1])
+
+            bit = np.greater_equal(np.subtract(texture, image, out=buffers[3]), 0, out=bits[i % 2])
+            ones += bit
+            if previous is not None:
+                # Transitions between consecutive samples, without wrapping (as scikit-image counts them)
+                changes += bit != previous
+            previous = bit
+
+        codes = np.where(changes <= 2, ones, points + 1)
+        hist = np.bincount(codes.ravel(), minlength=points + 2).astype(np.float64)
+        hists.append(hist / hist.sum())
+    return hists
@@ -0,0 +1,146 @@
+"""
+Reference-side descriptors shared by all kiosk frames.
+
+Pairwise SIFT matching (SIFTFeatureExtractor.match_features) builds a
+FLANN KD-tree over the kiosk descriptors for every (reference, kiosk)
+pair: N x M index builds for N reference and M kiosk images. A
+ReferenceMatcherIndex holds an item's reference descriptors, converted
+and validated once, and matches them against one kiosk frame at a time:
+
+- SIFT: one FLANN KD-tree is trained on the kiosk frame's descriptors and
+  queried by every reference image, so a request builds M trees instead
+  of N x M.
+- ORB: brute-force Hamming matching has no index to train; each
+  reference block is matched against the kiosk descriptors directly.
+
+The matching direction and Lowe's ratio test are the same as in the
+pairwise paths (reference descriptors query the kiosk descriptors, k=2),
+so scores do not change: ORB results are identical to
+SimilarityCalculator._orb_descriptor_match, and SIFT differs only by the
+approximation FLANN's randomized KD-trees already have pair to pair.
+
+Matchers are created per kiosk frame and never shared, so an index can be
+used from several threads at once (see ReferenceIndexCache).
+"""
+
+import threading
+from collections import OrderedDict
+from collections.abc import Callable, Hashable
+
+import cv2
+import numpy as np
+
+from ..config import settings
+
+
+class ReferenceMatcherIndex:
+    """An item's reference descriptors, prepared once and matched against one kiosk frame at a time."""
+
+    def __init__(self, descriptors: list[np.ndarray | None], kind: str, ratio: float):
+        """
+        Args:
+            descriptors: Per reference image, an (n, d) descriptor matrix or None.
+            kind: "sift" (float32, FLANN KD-tree) or "orb" (binary, brute-force Hamming).
+            ratio: Lowe's ratio test threshold.
+        """
+        if kind not in ("sift", "orb"):
+            raise ValueError(f"Unknown descriptor kind {kind!r}")
+        self.kind = kind
+        self.ratio = ratio
+        self.counts = [len(d) if d is not None else 0 for d in descriptors]
+        self._dtype = np.float32 if kind == "sift" else np.uint8
+
+        # Images with fewer than 2 descriptors cannot pass a ratio test (as in pairwise matching)
+        self._blocks = [
+            np.asarray(d, dtype=self._dtype) if count >= 2 else None for d, count in zip(descriptors, self.counts)
+        ]
+
+    def __len__(self) -> int:
+        return len(self.counts)
+
+    def match(self, query: np.ndarray | None) -> list[list[cv2.DMatch]]:
+        """
+        Ratio-test matches of every reference image against one kiosk frame's descriptors.
+
+        Returns:
+            One list per reference image; queryIdx indexes that reference
+            image's descriptors, trainIdx indexes query.
+        """
+        good: list[list[cv2.DMatch]] = [[] for _ in self.counts]
+        if query is None or len(query) < 2 or not any(b is not None for b in self._blocks):
+            return good
+
+        query = np.asarray(query, dtype=self._dtype)
+        if self.kind == "sift":
+            matcher = cv2.FlannBasedMatcher(dict(algorithm=1, trees=5), dict(checks=50))
+            matcher.add([query])
+            matcher.train()
+
+            def knn(block: np.ndarray) -> list:
+                return matcher.knnMatch(block, k=2)
+
+        else:
+            matcher = cv2.BFMatcher(cv2.NORM_HAMMING, crossCheck=False)
+
+            def knn(block: np.ndarray) -> list:
+                return matcher.knnMatch(block, query, k=2)
+
+        for label, block in enumerate(self._blocks):
+            if block is None:
+                continue
+            for pair in knn(block):
+                if len(pair) == 2 and pair[0].distance < self.ratio * pair[1].distance:
+                    good[label].append(pair[0])
+        return good
+
+
+class ReferenceIndexCache:
+    """
+    Process-wide LRU of matcher indexes for stored items.
+
+    Keyed by an explicit reference key, e.g. the FeatureStore row
+    (item_id, feature_version, updated_at), so re-extracting an item
+    yields a new key and the old indexes age out. Reference features that
+    arrive with a request have no stable identity and are not cached here.
+    """
+
+    def __init__(self, max_items: int):
+        self._max_items = max(0, max_items)
+        self._lock = threading.Lock()
+        # reference key -> {channel name: index}
+        self._entries: OrderedDict[Hashable, dict[str, ReferenceMatcherIndex]] = OrderedDict()
+
+    def get(
+        self, key: Hashable, name: str, build: Callable[[], ReferenceMatcherIndex]
+    ) -> ReferenceMatcherIndex:
+        """The index for one channel of the reference under key, built with build() on first use."""
+        with self._lock:
+            indexes = self._entries.get(key)
+            if indexes is not None:
+                self._entries.move_to_end(key)
+                if name in indexes:
+                    return indexes[name]
+
+        index = build()
+
+        with self._lock:
+            indexes = self._entries.setdefault(key, {})
+            index = indexes.setdefault(name, index)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self._max_items:
+                self._entries.popitem(last=False)
+        return index
+
+
+_cache: ReferenceIndexCache | None = None
+_cache_lock = threading.Lock()
+
+
+def get_reference_index_cache() -> ReferenceIndexCache:
+    """Return this process's ReferenceIndexCache, sized like the feature store's LRU."""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = ReferenceIndexCache(settings.feature_store_cache_size)
+    return _cache
@@ -8,15 +8,39 @@ the expensive feature pipeline.
 
 pHash (perceptual hash): Uses DCT to capture dominant frequencies.
 dHash (difference hash): Uses horizontal gradient patterns.
+
+Hashes are bit-packed into uint64 words (a 16x16 hash is 4 words) and
+memoized on the ImageContext, so each image is hashed once per request.
+Hamming distance is XOR + popcount, vectorized over a whole
+reference x kiosk grid by hamming_matrix().
 """
 
 import cv2
 import numpy as np
 
-from ..utils.image import load_image
+from ..utils.context import ImageContext
+
+# Bits set per byte value — popcount fallback for NumPy < 2.0 (no np.bitwise_count)
+_POPCOUNT8 = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+
+def pack_hash_bits(bits: np.ndarray) -> np.ndarray:
+    """Pack a flat 0/1 bit array into little-endian uint64 words (zero-padded to a multiple of 64)."""
+    packed = np.packbits(np.asarray(bits, dtype=np.uint8))
+    padded = np.zeros(-(-len(packed) // 8) * 8, dtype=np.uint8)
+    padded[: len(packed)] = packed
+    return padded.view("<u8")
 
 
-def compute_phash(source: str | bytes | np.ndarray, hash_size: int = 16) -> np.ndarray:
+def _popcount(words: np.ndarray) -> np.ndarray:
+    """Set bits per uint64 element."""
+    if hasattr(np, "bitwise_count"):
+        return np.bitwise_count(words)
+    as_bytes = _POPCOUNT8[np.ascontiguousarray(words).view(np.uint8)]
+    return as_bytes.reshape(*words.shape, 8).sum(axis=-1)
+
+
+def compute_phash(source: str | bytes | np.ndarray | ImageContext, hash_size: int = 16) -> np.ndarray:
     """
     Compute perceptual hash using DCT (Discrete Cosine Transform).
 
@@ -25,27 +49,28 @@ def compute_phash(source: str | bytes | np.ndarray, hash_size: int = 16) -> np.n
         hash_size: Size of the hash (hash_size x hash_size bits).
 
     Returns:
-        Binary hash as numpy array of 0s and 1s.
+        Packed hash as a uint64 array of ceil(hash_size**2 / 64) words.
     """
-    img = load_image(source)
-    gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+    ctx = ImageContext.wrap(source)
+
+    def build() -> np.ndarray:
+        # Resize to slightly larger than hash_size for DCT
+        resized = ctx.gray_thumbnail(hash_size * 2, hash_size * 2).astype(np.float32)
 
-    # Resize to slightly larger than hash_size for DCT
-    resized = cv2.resize(gray, (hash_size * 2, hash_size * 2), interpolation=cv2.INTER_AREA)
-    resized = resized.astype(np.float32)
+        # Apply DCT
+        dct = cv2.dct(resized)
 
-    # Apply DCT
-    dct = cv2.dct(resized)
+        # Keep top-left low-frequency block
+        dct_low = dct[:hash_size, :hash_size]
 
-    # Keep top-left low-frequency block
-    dct_low = dct[:hash_size, :hash_size]
+        # Threshold by median
+        median = np.median(dct_low)
+        return pack_hash_bits((dct_low > median).flatten())
 
-    # Threshold by median
-    median = np.median(dct_low)
-    return (dct_low > median).astype(np.uint8).flatten()
+    return ctx.cached(("phash", hash_size), build)
 
 
-def compute_dhash(source: str | bytes | np.ndarray, hash_size: int = 16) -> np.ndarray:
+def compute_dhash(source: str | bytes | np.ndarray | ImageContext, hash_size: int = 16) -> np.ndarray:
     """
     Compute difference hash using horizontal gradients.
 
@@ -54,25 +79,53 @@ def compute_dhash(source: str | bytes | np.ndarray, hash_size: int = 16) -> np.n
         hash_size: Width of hash (produces hash_size * hash_size bits).
 
     Returns:
-        Binary hash as numpy array of 0s and 1s.
+        Packed hash as a uint64 array of ceil(hash_size**2 / 64) words.
     """
-    img = load_image(source)
-    gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+    ctx = ImageContext.wrap(source)
 
-    resized = cv2.resize(gray, (hash_size + 1, hash_size), interpolation=cv2.INTER_AREA)
+    def build() -> np.ndarray:
+        resized = ctx.gray_thumbnail(hash_size + 1, hash_size)
 
-    # Compare adjacent pixels (left vs right)
-    return (resized[:, 1:] > resized[:, :-1]).astype(np.uint8).flatten()
+        # Compare adjacent pixels (left vs right)
+        return pack_hash_bits((resized[:, 1:] > resized[:, :-1]).flatten())
+
+    return ctx.cached(("dhash", hash_size), build)
 
 
 def hamming_distance(hash1: np.ndarray, hash2: np.ndarray) -> int:
-    """Count differing bits between two hashes."""
-    return int(np.sum(hash1 != hash2))
+    """Count differing bits between two packed hashes."""
+    return int(_popcount(np.bitwise_xor(hash1, hash2)).sum())
+
+
+def hamming_matrix(hashes_a: np.ndarray, hashes_b: np.ndarray) -> np.ndarray:
+    """
+    Pairwise Hamming distances between two sets of packed hashes.
+
+    Args:
+        hashes_a: (N, W) uint64 words.
+        hashes_b: (M, W) uint64 words.
+
+    Returns:
+        (N, M) int array of differing bit counts.
+    """
+    xor = np.bitwise_xor(hashes_a[:, None, :], hashes_b[None, :, :])
+    return _popcount(xor).sum(axis=-1, dtype=np.int64)
+
+
+def similarity_matrix(hashes_a: np.ndarray, hashes_b: np.ndarray, n_bits: int | None = None) -> np.ndarray:
+    """
+    Pairwise hash similarity percentages (0-100).
+
+    Args:
+        n_bits: Bits per hash; defaults to 64 per word (exact for 16x16 hashes).
+    """
+    n_bits = n_bits or hashes_a.shape[-1] * 64
+    return (1 - hamming_matrix(hashes_a, hashes_b) / n_bits) * 100
 
 
 def phash_similarity(
-    source1: str | bytes | np.ndarray,
-    source2: str | bytes | np.ndarray,
+    source1: str | bytes | np.ndarray | ImageContext,
+    source2: str | bytes | np.ndarray | ImageContext,
     hash_size: int = 16,
 ) -> float:
     """
@@ -83,16 +136,23 @@ def phash_similarity(
     """
     h1 = compute_phash(source1, hash_size)
     h2 = compute_phash(source2, hash_size)
+    return hash_similarity(h1, h2, n_bits=hash_size * hash_size)
+
 
-    total_bits = len(h1)
-    dist = hamming_distance(h1, h2)
+def hash_similarity(hash1: np.ndarray, hash2: np.ndarray, n_bits: int | None = None) -> float:
+    """
+    Compare two precomputed packed hashes (e.g. from a reference feature bundle).
 
-    return (1 - dist / total_bits) * 100
+    Returns:
+        Similarity percentage (0-100). Higher = more similar.
+    """
+    n_bits = n_bits or len(hash1) * 64
+    return (1 - hamming_distance(hash1, hash2) / n_bits) * 100
 
 
 def is_obvious_mismatch(
-    source1: str | bytes | np.ndarray,
-    source2: str | bytes | np.ndarray,
+    source1: str | bytes | np.ndarray | ImageContext,
+    source2: str | bytes | np.ndarray | ImageContext,
     threshold: float = 40.0,
 ) -> bool:
     """
@@ -100,6 +160,8 @@ def is_obvious_mismatch(
 
     Used as a fast pre-filter before running the expensive pipeline.
     Only rejects images that are CLEARLY different (low threshold).
+    Hashes are memoized per image, so this costs one XOR + popcount
+    after phash_similarity has run on the same pair.
 
     Args:
         threshold: Below this similarity = obvious mismatch.
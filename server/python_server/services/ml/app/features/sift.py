@@ -9,14 +9,22 @@ Changes from v1:
 SIFT detects unique visual "landmarks" robust to scale, rotation,
 and moderate lighting changes. RANSAC ensures matched keypoints
 are geometrically consistent (not random false positives).
+
+Cost control: detection runs at most sift_max_side pixels on the long
+side, and at most sift_max_keypoints keypoints are kept per image, either
+the strongest ("response") or the strongest per grid cell ("grid", keeps
+them spread over the item). Geometric verification can use OpenCV's USAC
+estimators (e.g. MAGSAC++) instead of classic RANSAC.
 """
 
+import time
+
 import cv2
 import numpy as np
 
 from ..config import settings
-from ..utils.background import get_item_crop, remove_background_grabcut
-from ..utils.image import preprocess
+from ..utils.context import ImageContext
+from .matcher_index import ReferenceMatcherIndex
 
 
 class SIFTFeatureExtractor:
@@ -25,6 +33,12 @@ class SIFTFeatureExtractor:
     def __init__(self):
         self.sift = cv2.SIFT_create()
         self.ratio_threshold = settings.sift_ratio_threshold
+        self.rootsift = settings.sift_rootsift
+        self.max_side = settings.sift_max_side
+        self.max_keypoints = settings.sift_max_keypoints
+        self.keypoint_selection = settings.sift_keypoint_selection
+        self.ransac_method = _ransac_method(settings.sift_ransac_method)
+        self.ransac_threshold = settings.sift_ransac_threshold
 
         # FLANN matcher for fast approximate nearest neighbor search
         index_params = dict(algorithm=1, trees=5)  # FLANN_INDEX_KDTREE
@@ -32,34 +46,95 @@ class SIFTFeatureExtractor:
         self.flann = cv2.FlannBasedMatcher(index_params, search_params)
 
     def _preprocess_for_sift(
-        self, source: str | bytes | np.ndarray, normalize_light: bool, remove_bg: bool
+        self, source: str | bytes | np.ndarray | ImageContext, normalize_light: bool, remove_bg: bool
     ) -> np.ndarray:
         """Load, normalize, optionally remove background, convert to grayscale."""
-        img = preprocess(source, normalize=normalize_light)
-
-        if remove_bg:
-            img, fg_mask = remove_background_grabcut(img)
-            crop = get_item_crop(img, fg_mask)
-            if crop.shape[0] > 10 and crop.shape[1] > 10:
-                img = crop
-
-        return cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+        return ImageContext.wrap(source).item_gray(normalize_light, remove_bg)
 
     def detect_keypoints(
         self,
-        source: str | bytes | np.ndarray,
+        source: str | bytes | np.ndarray | ImageContext,
         normalize_light: bool = True,
         remove_bg: bool = True,
     ) -> tuple[list[cv2.KeyPoint], np.ndarray | None]:
-        """Detect SIFT keypoints and compute descriptors."""
-        gray = self._preprocess_for_sift(source, normalize_light, remove_bg)
-        keypoints, descriptors = self.sift.detectAndCompute(gray, None)
-        return keypoints, descriptors
+        """
+        Detect SIFT keypoints and compute descriptors.
+
+        The result is memoized on the image's ImageContext, so each image is
+        preprocessed, segmented and run through SIFT once per request no
+        matter how many pairs it takes part in. Keypoint coordinates are in
+        the sift_max_side working resolution.
+        """
+        ctx = ImageContext.wrap(source)
+
+        def build() -> tuple[list[cv2.KeyPoint], np.ndarray | None]:
+            gray = self._preprocess_for_sift(ctx, normalize_light, remove_bg)
+            h, w = gray.shape[:2]
+            if self.max_side and max(h, w) > self.max_side:
+                scale = self.max_side / max(h, w)
+                gray = cv2.resize(
+                    gray, (max(1, round(w * scale)), max(1, round(h * scale))), interpolation=cv2.INTER_AREA
+                )
+
+            # Describe only the keypoints that survive the budget
+            keypoints = self.sift.detect(gray, None)
+            if self.max_keypoints and len(keypoints) > self.max_keypoints:
+                keep = select_keypoints(keypoints, self.max_keypoints, self.keypoint_selection, gray.shape[:2])
+                keypoints = [keypoints[i] for i in keep]
+            if not keypoints:
+                return [], None
+            keypoints, descriptors = self.sift.compute(gray, keypoints)
+            if descriptors is not None and self.rootsift:
+                descriptors = self._to_rootsift(descriptors)
+            return keypoints, descriptors
+
+        return ctx.cached(("sift", normalize_light, remove_bg), build)
+
+    @staticmethod
+    def _to_rootsift(descriptors: np.ndarray) -> np.ndarray:
+        """RootSIFT (Arandjelovic & Zisserman 2012): L1-normalize, then element-wise sqrt."""
+        l1 = np.maximum(descriptors.sum(axis=1, keepdims=True), 1e-7)
+        return np.sqrt(descriptors / l1).astype(np.float32)
+
+    def reference_detection(
+        self,
+        source: str | bytes | np.ndarray | ImageContext,
+        max_keypoints: int | None = None,
+    ) -> dict:
+        """
+        Keypoint coordinates and descriptors for storage in a reference bundle.
+
+        Keeps max_keypoints keypoints, selected like the detection budget
+        (sift_keypoint_selection).
+
+        Returns:
+            Dict with "points" (N, 2) float32 and "descriptors" (N, 128) or None.
+        """
+        keypoints, descriptors = self.detect_keypoints(source)
+        if descriptors is not None and max_keypoints and len(keypoints) > max_keypoints:
+            points = _points(keypoints)
+            extent = (int(points[:, 1].max()) + 1, int(points[:, 0].max()) + 1)
+            keep = select_keypoints(keypoints, max_keypoints, self.keypoint_selection, extent)
+            keypoints = [keypoints[i] for i in keep]
+            descriptors = descriptors[keep]
+        return {"points": _points(keypoints), "descriptors": descriptors}
+
+    def _detect_points(
+        self, source: str | bytes | np.ndarray | ImageContext, normalize_light: bool, remove_bg: bool
+    ) -> tuple[np.ndarray, np.ndarray | None]:
+        """Cached detection as ((N, 2) float32 points, descriptors)."""
+        ctx = ImageContext.wrap(source)
+
+        def build() -> tuple[np.ndarray, np.ndarray | None]:
+            keypoints, descriptors = self.detect_keypoints(ctx, normalize_light, remove_bg)
+            return _points(keypoints), descriptors
+
+        return ctx.cached(("sift_points", normalize_light, remove_bg), build)
 
     def match(
         self,
-        source1: str | bytes | np.ndarray,
-        source2: str | bytes | np.ndarray,
+        source1: str | bytes | np.ndarray | ImageContext,
+        source2: str | bytes | np.ndarray | ImageContext,
         normalize_light: bool = True,
         remove_bg: bool = True,
     ) -> dict:
@@ -77,17 +152,30 @@ class SIFTFeatureExtractor:
         """
         kp1, des1 = self.detect_keypoints(source1, normalize_light, remove_bg)
         kp2, des2 = self.detect_keypoints(source2, normalize_light, remove_bg)
+        return self._match_detections(_points(kp1), des1, _points(kp2), des2)
 
+    def _match_detections(
+        self,
+        pts1: np.ndarray,
+        des1: np.ndarray | None,
+        pts2: np.ndarray,
+        des2: np.ndarray | None,
+    ) -> dict:
+        """FLANN + Lowe's ratio test + RANSAC on two precomputed detections (points + descriptors)."""
         if des1 is None or des2 is None or len(des1) < 2 or len(des2) < 2:
             return {
                 "match_ratio": 0.0,
                 "inlier_ratio": 0.0,
                 "good_matches": 0,
                 "inlier_count": 0,
-                "total_keypoints_img1": len(kp1) if kp1 else 0,
-                "total_keypoints_img2": len(kp2) if kp2 else 0,
+                "total_keypoints_img1": len(pts1),
+                "total_keypoints_img2": len(pts2),
             }
 
+        # Bundled descriptors may be stored as uint8/float16; FLANN's KD-tree needs float32
+        des1 = np.asarray(des1, dtype=np.float32)
+        des2 = np.asarray(des2, dtype=np.float32)
+
         # knnMatch with k=2 for Lowe's ratio test
         matches = self.flann.knnMatch(des1, des2, k=2)
 
@@ -99,53 +187,109 @@ class SIFTFeatureExtractor:
                 if m.distance < self.ratio_threshold * n.distance:
                     good_matches.append(m)
 
-        min_kp = min(len(kp1), len(kp2))
-        match_ratio = len(good_matches) / min_kp if min_kp > 0 else 0.0
+        return self._verify_matches(
+            pts1, pts2, [m.queryIdx for m in good_matches], [m.trainIdx for m in good_matches]
+        )
+
+    def _verify_matches(self, pts1: np.ndarray, pts2: np.ndarray, idx1: list[int], idx2: list[int]) -> dict:
+        """Match ratio and RANSAC inliers of ratio-test matches pts1[idx1[k]] <-> pts2[idx2[k]]."""
+        good_count = len(idx1)
+        min_kp = min(len(pts1), len(pts2))
+        match_ratio = good_count / min_kp if min_kp > 0 else 0.0
 
         # P1: RANSAC homography — verify geometric consistency
         inlier_count = 0
         inlier_ratio = 0.0
 
-        if len(good_matches) >= 4:
-            src_pts = np.float32([kp1[m.queryIdx].pt for m in good_matches]).reshape(-1, 1, 2)
-            dst_pts = np.float32([kp2[m.trainIdx].pt for m in good_matches]).reshape(-1, 1, 2)
+        if good_count >= 4:
+            src_pts = pts1[idx1].reshape(-1, 1, 2)
+            dst_pts = pts2[idx2].reshape(-1, 1, 2)
 
-            _, mask = cv2.findHomography(src_pts, dst_pts, cv2.RANSAC, 5.0)
+            _, mask = cv2.findHomography(src_pts, dst_pts, self.ransac_method, self.ransac_threshold)
 
             if mask is not None:
                 inlier_count = int(mask.sum())
-                inlier_ratio = inlier_count / len(good_matches)
+                inlier_ratio = inlier_count / good_count
 
         return {
             "match_ratio": match_ratio * 100,
             "inlier_ratio": inlier_ratio * 100,
-            "good_matches": len(good_matches),
+            "good_matches": good_count,
             "inlier_count": inlier_count,
-            "total_keypoints_img1": len(kp1),
-            "total_keypoints_img2": len(kp2),
+            "total_keypoints_img1": len(pts1),
+            "total_keypoints_img2": len(pts2),
         }
 
+    def build_reference_index(self, descriptors: list[np.ndarray | None]) -> ReferenceMatcherIndex:
+        """Every reference image's descriptors, matched one kiosk frame at a time (see features.matcher_index)."""
+        return ReferenceMatcherIndex(descriptors, "sift", self.ratio_threshold)
+
     def match_multi(
         self,
-        original_images: list[str | bytes | np.ndarray],
-        kiosk_images: list[str | bytes | np.ndarray],
+        original_images: list[str | bytes | np.ndarray | ImageContext],
+        kiosk_images: list[str | bytes | np.ndarray | ImageContext],
         normalize_light: bool = True,
         remove_bg: bool = True,
+        original_detections: list[dict] | None = None,
+        reference_index: ReferenceMatcherIndex | None = None,
     ) -> dict:
         """
         Match multiple original images against multiple kiosk images.
 
+        Keypoints are detected once per image (N + M detections). Reference
+        descriptors go into one FLANN index, trained once, and each kiosk
+        image is matched against all references in a single query; RANSAC
+        then runs per pair on the matches labelled with that reference.
+
+        Args:
+            original_detections: Precomputed reference detections (see
+                reference_detection); when given, original_images is not used.
+            reference_index: Prebuilt index over the same reference
+                descriptors (see build_reference_index), e.g. cached per item.
+
         Returns:
-            Best match ratio, best inlier ratio, and all pairwise results.
+            Best match ratio, best inlier ratio, all pairwise results, how
+            many detections were computed vs. reused from the cache, and a
+            cost report: keypoints per image and detection / matching time.
         """
-        all_match_ratios = []
-        all_inlier_ratios = []
+        start = time.perf_counter()
+        if original_detections is not None:
+            original_dets = [(d["points"], d["descriptors"]) for d in original_detections]
+        else:
+            original_dets = [
+                self._detect_points(src, normalize_light, remove_bg) for src in original_images
+            ]
+        kiosk_dets = [self._detect_points(src, normalize_light, remove_bg) for src in kiosk_images]
+
+        detections_computed = len(kiosk_dets) + (0 if original_detections is not None else len(original_dets))
+        detections_reused = max(0, 2 * len(original_dets) * len(kiosk_dets) - detections_computed)
 
-        for orig in original_images:
-            for kiosk in kiosk_images:
-                result = self.match(orig, kiosk, normalize_light, remove_bg)
-                all_match_ratios.append(result["match_ratio"])
-                all_inlier_ratios.append(result["inlier_ratio"])
+        detected = time.perf_counter()
+
+        if reference_index is None:
+            reference_index = self.build_reference_index([des for _, des in original_dets])
+
+        # (reference, kiosk) results, one kiosk-side FLANN index per kiosk image
+        pair_results: list[list[dict]] = [[] for _ in original_dets]
+        for pts2, des2 in kiosk_dets:
+            per_reference = reference_index.match(des2)
+            for i, (pts1, _) in enumerate(original_dets):
+                good = per_reference[i]
+                pair_results[i].append(
+                    self._verify_matches(pts1, pts2, [m.queryIdx for m in good], [m.trainIdx for m in good])
+                )
+
+        all_match_ratios = [r["match_ratio"] for row in pair_results for r in row]
+        all_inlier_ratios = [r["inlier_ratio"] for row in pair_results for r in row]
+
+        report = {
+            "detections_computed": detections_computed,
+            "detections_reused": detections_reused,
+            "keypoints_reference": [len(pts) for pts, _ in original_dets],
+            "keypoints_kiosk": [len(pts) for pts, _ in kiosk_dets],
+            "detect_ms": round((detected - start) * 1000, 1),
+            "match_ms": round((time.perf_counter() - detected) * 1000, 1),
+        }
 
         if not all_match_ratios:
             return {
@@ -154,6 +298,7 @@ class SIFTFeatureExtractor:
                 "best_inlier_ratio": 0.0,
                 "all_ratios": [],
                 "all_inlier_ratios": [],
+                **report,
             }
 
         return {
@@ -162,4 +307,67 @@ class SIFTFeatureExtractor:
             "best_inlier_ratio": float(max(all_inlier_ratios)),
             "all_ratios": all_match_ratios,
             "all_inlier_ratios": all_inlier_ratios,
+            **report,
         }
+
+
+def select_keypoints(
+    keypoints: list[cv2.KeyPoint] | tuple, budget: int, method: str, shape: tuple[int, int], grid: int = 8
+) -> np.ndarray:
+    """
+    Indices of the keypoints to keep under a budget.
+
+    Args:
+        method: "response" keeps the strongest; "grid" splits the (h, w)
+            image into grid x grid cells and takes the strongest of every
+            cell, then the second strongest of every cell, and so on, so
+            one textured region cannot take the whole budget.
+
+    Returns:
+        Up to budget indices into keypoints, strongest first within a round.
+    """
+    response = np.float32([kp.response for kp in keypoints])
+    if method == "response":
+        return np.argsort(-response, kind="stable")[:budget]
+    if method != "grid":
+        raise ValueError(f"Unknown keypoint selection {method!r} (expected 'response' or 'grid')")
+
+    h, w = shape
+    points = _points(keypoints)
+    col = np.clip((points[:, 0] * grid / max(w, 1)).astype(np.int64), 0, grid - 1)
+    row = np.clip((points[:, 1] * grid / max(h, 1)).astype(np.int64), 0, grid - 1)
+    cell = row * grid + col
+
+    # Rank of each keypoint within its cell by response (0 = strongest)
+    order = np.lexsort((-response, cell))
+    sorted_cells = cell[order]
+    first_of_cell = np.searchsorted(sorted_cells, sorted_cells, side="left")
+    rank = np.empty(len(keypoints), dtype=np.int64)
+    rank[order] = np.arange(len(keypoints)) - first_of_cell
+
+    return np.lexsort((-response, rank))[:budget]
+
+
+_RANSAC_METHODS = {
+    "ransac": "RANSAC",
+    "usac_default": "USAC_DEFAULT",
+    "usac_fast": "USAC_FAST",
+    "usac_accurate": "USAC_ACCURATE",
+    "usac_prosac": "USAC_PROSAC",
+    "usac_magsac": "USAC_MAGSAC",
+}
+
+
+def _ransac_method(name: str) -> int:
+    """cv2 robust-estimator flag for a sift_ransac_method setting (USAC needs OpenCV >= 4.5)."""
+    try:
+        return getattr(cv2, _RANSAC_METHODS[name])
+    except KeyError:
+        raise ValueError(f"Unknown sift_ransac_method {name!r}; expected one of {sorted(_RANSAC_METHODS)}") from None
+    except AttributeError:
+        raise ValueError(f"sift_ransac_method {name!r} needs OpenCV >= 4.5 (cv2.{_RANSAC_METHODS[name]})") from None
+
+
+def _points(keypoints: list[cv2.KeyPoint] | tuple) -> np.ndarray:
+    """Keypoint coordinates as an (N, 2) float32 array."""
+    return np.float32([kp.pt for kp in keypoints]).reshape(-1, 2)
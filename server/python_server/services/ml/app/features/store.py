@@ -0,0 +1,148 @@
+"""
+Server-side reference feature store.
+
+Verification requests used to carry the owner images and the whole
+Item.mlFeatures payload on every kiosk attempt. The store lets the ML
+service keep reference features itself: /extract-features with an
+item_id writes the encoded bundle here, and /verify-item/{item_id} only
+needs the kiosk captures.
+
+Rows live in a SQLite file (WAL mode, safe to share between the worker
+processes) keyed by (item_id, feature_version), so a feature-schema bump
+never serves stale features. Each process also keeps a bounded LRU of
+decoded bundles; a cached entry is reused only while its row's
+updated_at is unchanged, so re-extracting an item from any worker
+invalidates the others on their next lookup. HybridVerifier keeps the
+item's SIFT/ORB matcher indexes keyed by the row's (item_id,
+feature_version, updated_at) (see get_entry and
+matcher_index.ReferenceIndexCache), so they are rebuilt only when the
+row changes.
+"""
+
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from ..config import settings
+from .bundle import FEATURE_VERSION, decode_bundle
+
+logger = logging.getLogger(__name__)
+
+
+class ItemNotFoundError(LookupError):
+    """Raised when no features are stored for an item at the current feature version."""
+
+
+class FeatureStore:
+    """SQLite-backed bundle store with an in-memory LRU of decoded features."""
+
+    def __init__(self, path: str, cache_size: int):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA busy_timeout=5000")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS features (
+                item_id         TEXT    NOT NULL,
+                feature_version INTEGER NOT NULL,
+                bundle          BLOB    NOT NULL,
+                image_count     INTEGER NOT NULL,
+                updated_at      REAL    NOT NULL,
+                PRIMARY KEY (item_id, feature_version)
+            )
+            """
+        )
+        self._lock = threading.Lock()
+        self._cache_size = max(0, cache_size)
+        # (item_id, feature_version) -> (updated_at, decoded features)
+        self._cache: OrderedDict[tuple[str, int], tuple[float, dict]] = OrderedDict()
+
+    def put(self, item_id: str, bundle: bytes, image_count: int, feature_version: int = FEATURE_VERSION):
+        """Insert or replace the features stored for item_id."""
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO features VALUES (?, ?, ?, ?, ?)",
+                (item_id, feature_version, bundle, image_count, time.time()),
+            )
+            self._cache.pop((item_id, feature_version), None)
+        logger.info("Stored features for item %s (v%d, %d bytes)", item_id, feature_version, len(bundle))
+
+    def get(self, item_id: str, feature_version: int = FEATURE_VERSION) -> dict:
+        """
+        Return decoded reference features for item_id.
+
+        Raises:
+            ItemNotFoundError: If nothing is stored at this feature version.
+        """
+        return self.get_entry(item_id, feature_version)[1]
+
+    def get_entry(self, item_id: str, feature_version: int = FEATURE_VERSION) -> tuple[float, dict]:
+        """
+        Return (updated_at, decoded reference features) for item_id.
+
+        Raises:
+            ItemNotFoundError: If nothing is stored at this feature version.
+        """
+        key = (item_id, feature_version)
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT updated_at FROM features WHERE item_id = ? AND feature_version = ?", key
+            ).fetchone()
+            if row is None:
+                self._cache.pop(key, None)
+                raise ItemNotFoundError(f"No stored features for item {item_id} (version {feature_version})")
+
+            cached = self._cache.get(key)
+            if cached is not None and cached[0] == row[0]:
+                self._cache.move_to_end(key)
+                return cached
+
+            updated_at, bundle = self._conn.execute(
+                "SELECT updated_at, bundle FROM features WHERE item_id = ? AND feature_version = ?", key
+            ).fetchone()
+
+        features = decode_bundle(bundle)
+
+        with self._lock:
+            if self._cache_size:
+                self._cache[key] = (updated_at, features)
+                self._cache.move_to_end(key)
+                while len(self._cache) > self._cache_size:
+                    self._cache.popitem(last=False)
+        return updated_at, features
+
+    def delete(self, item_id: str) -> bool:
+        """Remove every stored version for item_id. Returns True if anything was deleted."""
+        with self._lock:
+            cursor = self._conn.execute("DELETE FROM features WHERE item_id = ?", (item_id,))
+            for key in [k for k in self._cache if k[0] == item_id]:
+                del self._cache[key]
+        return cursor.rowcount > 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            items = self._conn.execute(
+                "SELECT COUNT(*) FROM features WHERE feature_version = ?", (FEATURE_VERSION,)
+            ).fetchone()[0]
+            return {"items": items, "cached": len(self._cache), "cache_size": self._cache_size}
+
+
+_store: FeatureStore | None = None
+_store_lock = threading.Lock()
+
+
+def get_feature_store() -> FeatureStore:
+    """Return this process's FeatureStore, opening the database on first use."""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = FeatureStore(settings.feature_store_path, settings.feature_store_cache_size)
+    return _store
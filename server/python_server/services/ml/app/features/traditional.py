@@ -20,11 +20,10 @@ Extracts six types of features from item images:
 
 import cv2
 import numpy as np
-from skimage.feature import local_binary_pattern
 
 from ..config import settings
-from ..utils.background import get_item_crop, remove_background_grabcut
-from ..utils.image import preprocess
+from ..utils.context import ImageContext
+from .lbp import LBP_RADII, uniform_lbp_histograms
 
 
 class TraditionalFeatureExtractor:
@@ -35,10 +34,14 @@ class TraditionalFeatureExtractor:
         self.color_bins = settings.color_hist_bins
         self.lbp_points = settings.lbp_points
         self.lbp_radius = settings.lbp_radius
+        self.lbp_max_side = settings.lbp_max_side
+
+        # 128x128 window, 32px blocks with 16px stride, 16px cells, 9 bins
+        self.hog = cv2.HOGDescriptor((128, 128), (32, 32), (16, 16), (16, 16), 9)
 
     def extract(
         self,
-        source: str | bytes | np.ndarray,
+        source: str | bytes | np.ndarray | ImageContext,
         normalize_light: bool = True,
         remove_bg: bool = True,
     ) -> dict:
@@ -46,32 +49,25 @@ class TraditionalFeatureExtractor:
         Extract all traditional features from a single image.
 
         Args:
-            source: File path, raw bytes, or numpy array.
+            source: File path, raw bytes, numpy array, or ImageContext.
             normalize_light: Apply CLAHE lighting normalization.
             remove_bg: Remove background before feature extraction.
 
         Returns:
             Dict with all feature vectors + raw ORB descriptors.
         """
-        img = preprocess(source, normalize=normalize_light)
-
-        # P0: Remove background to isolate the item
-        fg_mask = None
-        if remove_bg:
-            img, fg_mask = remove_background_grabcut(img)
-            crop = get_item_crop(img, fg_mask)
-            if crop.shape[0] > 10 and crop.shape[1] > 10:
-                img = crop
+        ctx = ImageContext.wrap(source)
 
-        gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
-        hsv = cv2.cvtColor(img, cv2.COLOR_BGR2HSV)
+        # P0: Background removal (GrabCut + item crop) is memoized on the context
+        gray = ctx.item_gray(normalize_light, remove_bg)
+        hsv = ctx.item_hsv(normalize_light, remove_bg)
 
         return {
             "color": self._color_histogram_hsv(hsv),
             "color_spatial": self._spatial_color_pyramid(hsv),
             "shape": self._shape_descriptors(gray),
             "texture": self._texture_lbp_multiscale(gray),
-            "hog": self._hog_features(gray),
+            "hog": self._hog_features(ctx.hog_input(normalize_light, remove_bg)),
             "orb_descriptors": self._orb_raw_descriptors(gray),
         }
 
@@ -153,19 +149,19 @@ class TraditionalFeatureExtractor:
 
         Single-scale (R=1) only sees micro-texture. Multiple radii
         capture patterns at small, medium, and large scales.
+
+        Computed at most lbp_max_side pixels on the long side, so texture
+        scale doesn't depend on upload resolution (or cost seconds on a
+        12 MP owner photo).
         """
-        all_hists = []
-        for radius in [1, 2, 4]:
-            points = 8 * radius
-            lbp = local_binary_pattern(gray, P=points, R=radius, method="uniform")
-            n_bins = points + 2
-            hist, _ = np.histogram(lbp.ravel(), bins=n_bins, range=(0, n_bins))
-            total = hist.sum()
-            if total > 0:
-                hist = hist / total
-            all_hists.append(hist.astype(np.float64))
-
-        return np.concatenate(all_hists)  # 10 + 18 + 34 = 62-dimensional
+        h, w = gray.shape[:2]
+        if self.lbp_max_side and max(h, w) > self.lbp_max_side:
+            scale = self.lbp_max_side / max(h, w)
+            gray = cv2.resize(
+                gray, (max(1, round(w * scale)), max(1, round(h * scale))), interpolation=cv2.INTER_AREA
+            )
+
+        return np.concatenate(uniform_lbp_histograms(gray, LBP_RADII))  # 10 + 18 + 34 = 62-dimensional
 
     def _hog_features(self, gray: np.ndarray) -> np.ndarray:
         """
@@ -175,16 +171,8 @@ class TraditionalFeatureExtractor:
         and brand logos. Lighting-invariant because it uses gradients,
         not absolute pixel values.
         """
-        resized = cv2.resize(gray, (128, 128))
-
-        win_size = (128, 128)
-        block_size = (32, 32)
-        block_stride = (16, 16)
-        cell_size = (16, 16)
-        n_bins = 9
-
-        hog = cv2.HOGDescriptor(win_size, block_size, block_stride, cell_size, n_bins)
-        features = hog.compute(resized).flatten()
+        resized = gray if gray.shape[:2] == (128, 128) else cv2.resize(gray, (128, 128))
+        features = self.hog.compute(resized).flatten()
 
         norm = np.linalg.norm(features)
         if norm > 0:
@@ -205,7 +193,7 @@ class TraditionalFeatureExtractor:
 
     def extract_batch(
         self,
-        sources: list[str | bytes | np.ndarray],
+        sources: list[str | bytes | np.ndarray | ImageContext],
         normalize_light: bool = True,
         remove_bg: bool = True,
     ) -> list[dict]:
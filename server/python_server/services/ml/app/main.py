@@ -9,19 +9,36 @@ images with kiosk camera captures using a hybrid approach:
 - Phase 3: Deep learning features (ResNet50) + OCR serial number matching
 """
 
+import asyncio
 import logging
+from contextlib import asynccontextmanager
 
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
 from .config import settings
 from .routers import verification
+from .workers import executor
 
 logging.basicConfig(
     level=logging.DEBUG if settings.debug else logging.INFO,
     format="%(asctime)s %(levelname)s %(name)s: %(message)s",
 )
 
+
+@asynccontextmanager
+async def lifespan(_app: FastAPI):
+    # Worker pools for the CPU-bound pipeline; models preload in each worker
+    executor.start()
+    # Warm-up runs in the background so the port opens immediately; /health
+    # reports "warming_up" until every model has run one dummy inference.
+    warmup_task = asyncio.create_task(executor.warm_up()) if settings.enable_warmup else None
+    yield
+    if warmup_task is not None:
+        warmup_task.cancel()
+    executor.shutdown()
+
+
 app = FastAPI(
     title=settings.app_name,
     description=(
@@ -32,6 +49,7 @@ app = FastAPI(
     version="1.0.0",
     docs_url="/docs",
     redoc_url="/redoc",
+    lifespan=lifespan,
 )
 
 app.add_middleware(
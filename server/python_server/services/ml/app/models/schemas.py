@@ -17,6 +17,7 @@ class MethodScores(BaseModel):
 class OCRResult(BaseModel):
     match: bool = Field(description="Whether serial numbers matched")
     details: dict | None = Field(default=None, description="OCR match details")
+    skipped: bool = Field(default=False, description="OCR skipped: no kiosk image passed the text-presence pre-check")
 
 
 class QualityIssue(BaseModel):
@@ -40,6 +41,10 @@ class VerificationResponse(BaseModel):
     good_pair_count: int = Field(default=0, description="Number of image pairs above manual review threshold")
     all_traditional_scores: list[float] = Field(description="All pairwise traditional CV scores")
     sift_all_ratios: list[float] = Field(description="All pairwise SIFT match ratios")
+    skipped_channels: list[dict] = Field(
+        default_factory=list, description="Channels skipped by the early-exit cascade, with the reason"
+    )
+    diagnostics: dict = Field(default_factory=dict, description="Per-stage pipeline diagnostics (cache reuse, timings)")
 
 
 class StorableFeatures(BaseModel):
@@ -55,7 +60,23 @@ class FeatureExtractionResponse(BaseModel):
     traditional_features_count: int = Field(description="Number of traditional feature sets")
     deep_features_count: int = Field(description="Number of deep feature vectors")
     ocr_texts: list[str] = Field(description="OCR-extracted text from each image")
-    features: StorableFeatures = Field(description="Full feature data for storage in Item.mlFeatures")
+    features: StorableFeatures | None = Field(
+        default=None, description="Full feature data for storage in Item.mlFeatures (format=json)"
+    )
+    bundle: str | None = Field(
+        default=None, description="base64-encoded binary feature bundle (format=bundle)"
+    )
+    item_id: str | None = Field(
+        default=None, description="Item the features were saved under in the feature store"
+    )
+
+
+class KioskBackgroundResponse(BaseModel):
+    kiosk_id: str
+    locker_id: str
+    width: int = Field(description="Stored frame width in pixels")
+    height: int = Field(description="Stored frame height in pixels")
+    updated_at: float = Field(description="Unix time the frame was stored")
 
 
 class FaceVerificationResponse(BaseModel):
@@ -78,3 +99,5 @@ class HealthResponse(BaseModel):
     deep_learning_enabled: bool
     ocr_enabled: bool
     face_recognition_enabled: bool = Field(default=False)
+    executor: dict = Field(default_factory=dict, description="Worker pool mode, size and queue depth")
+    warmup: dict = Field(default_factory=dict, description="Model warm-up state and per-step timings")
@@ -3,10 +3,16 @@ API routes for item verification and face recognition.
 
 Endpoints:
     POST /verify           - Full hybrid verification (original vs kiosk images)
-    POST /extract-features - Pre-extract features for storage
+    POST /extract-features - Pre-extract features for storage (optionally into the feature store)
+    POST /verify-item/{id} - Verify kiosk captures against features in the feature store
+    POST /kiosk-background - Register / refresh an empty-locker frame for background subtraction
     POST /register-face    - Extract 128-float face encoding from a registration photo
     POST /verify-face      - Verify captured face against stored encoding or reference URL
     GET  /health           - Service health check
+
+CPU-bound work (HybridVerifier, dlib) runs on the executor's worker pool
+and file/network I/O on its I/O threads, so the event loop stays free to
+answer /health while a verification is running.
 """
 
 import base64
@@ -20,18 +26,22 @@ from urllib.request import urlretrieve
 import cv2
 import numpy as np
 from PIL import Image as _PILImage
-from fastapi import APIRouter, File, Form, HTTPException, UploadFile
+from fastapi import APIRouter, File, Form, HTTPException, Response, UploadFile
 
-from ..comparison.hybrid import HybridVerifier
 from ..config import settings
+from ..features.bundle import BUNDLE_VERSION
+from ..features.store import ItemNotFoundError
 from ..models.schemas import (
     FaceRegisterResponse,
     FaceVerificationResponse,
     FeatureExtractionResponse,
     HealthResponse,
+    KioskBackgroundResponse,
     StorableFeatures,
     VerificationResponse,
 )
+from ..utils.kiosk_backgrounds import get_background_store
+from ..workers import ExecutorBusyError, executor, extract_features_job, verify_item_job, verify_job
 
 # face_recognition is optional — gracefully degrade to Haar cascade if not installed
 try:
@@ -50,25 +60,42 @@ except ImportError:
 logger = logging.getLogger(__name__)
 router = APIRouter()
 
-verifier = HybridVerifier()
+
+def _write_temp(content: bytes, suffix: str) -> str:
+    """Write bytes to a new file in the upload directory and return its path."""
+    os.makedirs(settings.upload_dir, exist_ok=True)
+    tmp = tempfile.NamedTemporaryFile(
+        dir=settings.upload_dir, suffix=suffix, delete=False
+    )
+    tmp.write(content)
+    tmp.close()
+    return tmp.name
 
 
 async def _save_uploads(files: list[UploadFile]) -> list[str]:
     """Save uploaded files to temp directory and return file paths."""
-    os.makedirs(settings.upload_dir, exist_ok=True)
     paths = []
     for f in files:
         content = await f.read()
         suffix = os.path.splitext(f.filename or "image.jpg")[1] or ".jpg"
-        tmp = tempfile.NamedTemporaryFile(
-            dir=settings.upload_dir, suffix=suffix, delete=False
-        )
-        tmp.write(content)
-        tmp.close()
-        paths.append(tmp.name)
+        paths.append(await executor.run_io(_write_temp, content, suffix))
     return paths
 
 
+def _download_reference(url: str) -> str:
+    """Download a reference image into the upload directory and return its path."""
+    os.makedirs(settings.upload_dir, exist_ok=True)
+    suffix = os.path.splitext(url.split("?")[0])[-1] or ".jpg"
+    tmp_fd, path = tempfile.mkstemp(suffix=suffix, dir=settings.upload_dir)
+    os.close(tmp_fd)
+    urlretrieve(url, path)  # noqa: S310
+    return path
+
+
+def _busy(e: ExecutorBusyError) -> HTTPException:
+    return HTTPException(status_code=503, detail=f"Service busy: {e}")
+
+
 def _cleanup(paths: list[str]):
     """Remove temporary files."""
     for p in paths:
@@ -80,16 +107,31 @@ def _cleanup(paths: list[str]):
 
 @router.post("/verify", response_model=VerificationResponse)
 async def verify_item(
-    original_images: list[UploadFile] = File(
-        ..., description="Owner's uploaded reference images (3+)"
+    original_images: list[UploadFile] | None = File(
+        default=None,
+        description=(
+            "Owner's uploaded reference images (3+). Optional when a complete "
+            "version-2 feature bundle is supplied"
+        ),
     ),
     kiosk_images: list[UploadFile] = File(
         ..., description="Kiosk camera captures (3-5)"
     ),
     attempt_number: int = Form(default=1, ge=1, le=10),
+    kiosk_id: str | None = Form(default=None, description="Kiosk that captured kiosk_images"),
+    locker_id: str | None = Form(
+        default=None, description="Locker within the kiosk; its empty-locker frame enables background subtraction"
+    ),
     reference_features: str | None = Form(
         default=None,
-        description="JSON-encoded pre-extracted features from Item.mlFeatures (skips ResNet50 re-extraction)",
+        description=(
+            "Pre-extracted features from Item.mlFeatures (skips ResNet50 re-extraction): "
+            "legacy JSON or a base64-encoded binary feature bundle"
+        ),
+    ),
+    reference_bundle: UploadFile | None = File(
+        default=None,
+        description="Binary feature bundle (application/octet-stream) from /extract-features?format=binary",
     ),
 ):
     """
@@ -107,9 +149,16 @@ async def verify_item(
     - >= 85%: APPROVED (item verified)
     - 60-84%: PENDING (admin manual review)
     - < 60%: RETRY (up to 10 attempts) or REJECTED
+
+    With a bundle from /extract-features (format=bundle/binary) every channel
+    is precomputed and original_images can be omitted.
     """
-    if len(original_images) < 1:
-        raise HTTPException(status_code=400, detail="At least 1 original image required")
+    original_images = original_images or []
+    if not original_images and not (reference_features or reference_bundle):
+        raise HTTPException(
+            status_code=400,
+            detail="At least 1 original image (or a reference feature bundle) required",
+        )
     if len(kiosk_images) < 1:
         raise HTTPException(status_code=400, detail="At least 1 kiosk image required")
 
@@ -127,17 +176,22 @@ async def verify_item(
             attempt_number,
         )
 
-        parsed_features = json.loads(reference_features) if reference_features else None
+        # Decoded inside the worker: bundles are zero-copy views there, no re-pickling
+        reference_payload: str | bytes | None = reference_features
+        if reference_bundle is not None:
+            reference_payload = await reference_bundle.read()
 
-        result = verifier.verify(
-            original_sources=orig_paths,
-            kiosk_sources=kiosk_paths,
-            attempt_number=attempt_number,
-            reference_features=parsed_features,
+        result = await executor.run_cpu(
+            verify_job, orig_paths, kiosk_paths, attempt_number, reference_payload or None, kiosk_id, locker_id
         )
 
         return VerificationResponse(**result)
 
+    except ExecutorBusyError as e:
+        raise _busy(e) from e
+    except ValueError as e:
+        # Undecodable reference features, or an incomplete bundle without originals
+        raise HTTPException(status_code=400, detail=str(e)) from e
     except Exception as e:
         logger.exception("Verification failed")
         raise HTTPException(status_code=500, detail=f"Verification error: {e}") from e
@@ -145,11 +199,97 @@ async def verify_item(
         _cleanup(orig_paths + kiosk_paths)
 
 
+@router.post("/verify-item/{item_id}", response_model=VerificationResponse)
+async def verify_stored_item(
+    item_id: str,
+    kiosk_images: list[UploadFile] = File(
+        ..., description="Kiosk camera captures (3-5)"
+    ),
+    attempt_number: int = Form(default=1, ge=1, le=10),
+    kiosk_id: str | None = Form(default=None, description="Kiosk that captured kiosk_images"),
+    locker_id: str | None = Form(
+        default=None, description="Locker within the kiosk; its empty-locker frame enables background subtraction"
+    ),
+):
+    """
+    Hybrid verification against reference features in the feature store.
+
+    The item must have been registered with /extract-features and an
+    item_id; only the kiosk captures are uploaded, and repeat attempts
+    reuse the decoded features from the in-memory cache.
+    """
+    if len(kiosk_images) < 1:
+        raise HTTPException(status_code=400, detail="At least 1 kiosk image required")
+
+    kiosk_paths = []
+    try:
+        kiosk_paths = await _save_uploads(kiosk_images)
+        logger.info(
+            "Verifying item %s: %d kiosk images (attempt %d)", item_id, len(kiosk_paths), attempt_number
+        )
+
+        result = await executor.run_cpu(
+            verify_item_job, item_id, kiosk_paths, attempt_number, kiosk_id, locker_id
+        )
+        return VerificationResponse(**result)
+
+    except ItemNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e)) from e
+    except ExecutorBusyError as e:
+        raise _busy(e) from e
+    except ValueError as e:
+        # Stored features lack a channel, or were extracted under other settings (see _reference_channel)
+        raise HTTPException(status_code=400, detail=str(e)) from e
+    except Exception as e:
+        logger.exception("Verification failed")
+        raise HTTPException(status_code=500, detail=f"Verification error: {e}") from e
+    finally:
+        _cleanup(kiosk_paths)
+
+
+@router.post("/kiosk-background", response_model=KioskBackgroundResponse)
+async def register_kiosk_background(
+    kiosk_id: str = Form(..., description="Kiosk identifier"),
+    locker_id: str = Form(..., description="Locker identifier within the kiosk"),
+    image: UploadFile = File(..., description="Frame of the empty locker from the kiosk camera"),
+):
+    """
+    Register (or refresh) the empty-locker frame for one locker.
+
+    Kiosk captures sent to /verify or /verify-item with the same kiosk_id and
+    locker_id are segmented by subtracting this frame instead of running
+    GrabCut. Re-register periodically so the frame tracks lighting drift.
+    """
+    data = await image.read()
+    if not data:
+        raise HTTPException(status_code=400, detail="Empty image upload")
+    try:
+        stored = await executor.run_io(get_background_store().put, kiosk_id, locker_id, data)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e)) from e
+    except Exception as e:
+        logger.exception("Kiosk background registration failed")
+        raise HTTPException(status_code=500, detail=f"Background registration error: {e}") from e
+    return KioskBackgroundResponse(**stored)
+
+
 @router.post("/extract-features", response_model=FeatureExtractionResponse)
 async def extract_features(
     images: list[UploadFile] = File(
         ..., description="Images to extract features from"
     ),
+    format: str = Form(
+        default="json",
+        description=(
+            "json: legacy float lists in `features`; "
+            "bundle: base64 binary feature bundle in `bundle`; "
+            "binary: raw bundle as application/octet-stream"
+        ),
+    ),
+    item_id: str | None = Form(
+        default=None,
+        description="Also save the features in the service's feature store for /verify-item/{item_id}",
+    ),
 ):
     """
     Pre-extract and return features from uploaded images.
@@ -159,12 +299,25 @@ async def extract_features(
     """
     if len(images) < 1:
         raise HTTPException(status_code=400, detail="At least 1 image required")
+    if format not in ("json", "bundle", "binary"):
+        raise HTTPException(status_code=400, detail="format must be one of: json, bundle, binary")
 
     paths = []
     try:
         paths = await _save_uploads(images)
 
-        features = verifier.extract_reference_features(paths)
+        features = await executor.run_cpu(extract_features_job, paths, format, item_id or None)
+
+        if format == "binary":
+            return Response(
+                content=features["bundle"],
+                media_type="application/octet-stream",
+                headers={
+                    "X-Feature-Bundle-Version": str(BUNDLE_VERSION),
+                    "X-Image-Count": str(features["image_count"]),
+                    **({"X-Item-Id": item_id} if item_id else {}),
+                },
+            )
 
         return FeatureExtractionResponse(
             image_count=features["image_count"],
@@ -176,8 +329,12 @@ async def extract_features(
                 deep=features["deep"],
                 ocr_texts=features["ocr_texts"],
                 image_count=features["image_count"],
-            ),
+            ) if format == "json" else None,
+            bundle=base64.b64encode(features["bundle"]).decode() if format == "bundle" else None,
+            item_id=item_id or None,
         )
+    except ExecutorBusyError as e:
+        raise _busy(e) from e
     except Exception as e:
         logger.exception("Feature extraction failed")
         raise HTTPException(status_code=500, detail=f"Extraction error: {e}") from e
@@ -230,6 +387,66 @@ def _face_similarity(img_a: np.ndarray, img_b: np.ndarray) -> float:
     return max(0.0, score / 3.0)
 
 
+def _register_face_sync(img_bgr: np.ndarray) -> FaceRegisterResponse:
+    """Detect and encode the face in a registration photo (runs on a CPU worker)."""
+    if _FR_AVAILABLE:
+        img_rgb = cv2.cvtColor(img_bgr, cv2.COLOR_BGR2RGB)
+        face_locations = _fr.face_locations(img_rgb, model="hog")
+        if not face_locations:
+            return FaceRegisterResponse(
+                success=False,
+                encoding=None,
+                message="No face detected — ensure good lighting and face the camera directly",
+            )
+        if len(face_locations) > 1:
+            return FaceRegisterResponse(
+                success=False,
+                encoding=None,
+                message="Multiple faces detected — only one person should be in frame",
+            )
+        encodings = _fr.face_encodings(img_rgb, face_locations)
+        if not encodings:
+            return FaceRegisterResponse(
+                success=False,
+                encoding=None,
+                message="Could not compute face encoding — try a clearer photo",
+            )
+        encoding: list[float] = encodings[0].tolist()
+
+        # Crop face for preview
+        top, right, bottom, left = face_locations[0]
+        face_crop_rgb = img_rgb[top:bottom, left:right]
+        face_crop_bgr = cv2.cvtColor(face_crop_rgb, cv2.COLOR_RGB2BGR)
+        _, buf = cv2.imencode(".jpg", face_crop_bgr, [cv2.IMWRITE_JPEG_QUALITY, 85])
+        face_b64 = base64.b64encode(buf.tobytes()).decode()
+
+        return FaceRegisterResponse(
+            success=True,
+            encoding=encoding,
+            face_image_data=face_b64,
+            message="Face encoding extracted successfully",
+        )
+
+    # Haar cascade fallback — detection only, no encoding
+    faces = _detect_faces(img_bgr)
+    if not faces:
+        return FaceRegisterResponse(
+            success=False,
+            encoding=None,
+            message="No face detected (Haar cascade fallback — install face_recognition for encoding support)",
+        )
+    x, y, w, h = max(faces, key=lambda f: f[2] * f[3])
+    face_crop = img_bgr[y : y + h, x : x + w]
+    _, buf = cv2.imencode(".jpg", face_crop, [cv2.IMWRITE_JPEG_QUALITY, 85])
+    face_b64 = base64.b64encode(buf.tobytes()).decode()
+    return FaceRegisterResponse(
+        success=False,
+        encoding=None,
+        face_image_data=face_b64,
+        message="Face detected but encoding unavailable — face_recognition library not installed",
+    )
+
+
 @router.post("/register-face", response_model=FaceRegisterResponse)
 async def register_face(
     image: UploadFile = File(..., description="In-app selfie taken during registration"),
@@ -256,65 +473,12 @@ async def register_face(
             logger.warning("register_face: decode failed bytes=%d err=%r", len(img_bytes), str(_decode_err))
             raise HTTPException(status_code=400, detail=f"Cannot decode image: {_decode_err}") from _decode_err
 
-        if _FR_AVAILABLE:
-            img_rgb = cv2.cvtColor(img_bgr, cv2.COLOR_BGR2RGB)
-            face_locations = _fr.face_locations(img_rgb, model="hog")
-            if not face_locations:
-                return FaceRegisterResponse(
-                    success=False,
-                    encoding=None,
-                    message="No face detected — ensure good lighting and face the camera directly",
-                )
-            if len(face_locations) > 1:
-                return FaceRegisterResponse(
-                    success=False,
-                    encoding=None,
-                    message="Multiple faces detected — only one person should be in frame",
-                )
-            encodings = _fr.face_encodings(img_rgb, face_locations)
-            if not encodings:
-                return FaceRegisterResponse(
-                    success=False,
-                    encoding=None,
-                    message="Could not compute face encoding — try a clearer photo",
-                )
-            encoding: list[float] = encodings[0].tolist()
-
-            # Crop face for preview
-            top, right, bottom, left = face_locations[0]
-            face_crop_rgb = img_rgb[top:bottom, left:right]
-            face_crop_bgr = cv2.cvtColor(face_crop_rgb, cv2.COLOR_RGB2BGR)
-            _, buf = cv2.imencode(".jpg", face_crop_bgr, [cv2.IMWRITE_JPEG_QUALITY, 85])
-            face_b64 = base64.b64encode(buf.tobytes()).decode()
-
-            return FaceRegisterResponse(
-                success=True,
-                encoding=encoding,
-                face_image_data=face_b64,
-                message="Face encoding extracted successfully",
-            )
-
-        # Haar cascade fallback — detection only, no encoding
-        faces = _detect_faces(img_bgr)
-        if not faces:
-            return FaceRegisterResponse(
-                success=False,
-                encoding=None,
-                message="No face detected (Haar cascade fallback — install face_recognition for encoding support)",
-            )
-        x, y, w, h = max(faces, key=lambda f: f[2] * f[3])
-        face_crop = img_bgr[y : y + h, x : x + w]
-        _, buf = cv2.imencode(".jpg", face_crop, [cv2.IMWRITE_JPEG_QUALITY, 85])
-        face_b64 = base64.b64encode(buf.tobytes()).decode()
-        return FaceRegisterResponse(
-            success=False,
-            encoding=None,
-            face_image_data=face_b64,
-            message="Face detected but encoding unavailable — face_recognition library not installed",
-        )
+        return await executor.run_cpu(_register_face_sync, img_bgr)
 
     except HTTPException:
         raise
+    except ExecutorBusyError as e:
+        raise _busy(e) from e
     except Exception as e:
         logger.exception("Face registration failed")
         raise HTTPException(status_code=500, detail=f"Face registration error: {e}") from e
@@ -359,6 +523,73 @@ def _dlib_verify(cap_rgb: np.ndarray, stored_encoding: list[float] | None, ref_r
     return verified, True, round(confidence, 3), msg
 
 
+def _verify_face_sync(
+    cap_img: np.ndarray,
+    parsed_encoding: list[float] | None,
+    ref_path: str | None,
+    has_reference_url: bool,
+) -> FaceVerificationResponse:
+    """Compare a captured face against a stored encoding or downloaded reference (runs on a CPU worker)."""
+    if _FR_AVAILABLE:
+        cap_rgb = cv2.cvtColor(cap_img, cv2.COLOR_BGR2RGB)
+        ref_rgb: np.ndarray | None = None
+
+        if parsed_encoding is None and ref_path:
+            ref_bgr = cv2.imread(ref_path)
+            if ref_bgr is not None:
+                ref_rgb = cv2.cvtColor(ref_bgr, cv2.COLOR_BGR2RGB)
+
+        verified, detected, confidence, message = _dlib_verify(cap_rgb, parsed_encoding, ref_rgb)
+        return FaceVerificationResponse(verified=verified, detected=detected, confidence=confidence, message=message)
+
+    # --- Haar cascade fallback ---
+    faces = _detect_faces(cap_img)
+    if len(faces) == 0:
+        return FaceVerificationResponse(
+            verified=False,
+            detected=False,
+            confidence=0.0,
+            message="No face detected in captured image",
+        )
+
+    x, y, w, h = max(faces, key=lambda f: f[2] * f[3])
+    cap_face = cap_img[y : y + h, x : x + w]
+
+    if not has_reference_url:
+        return FaceVerificationResponse(
+            verified=False,
+            detected=True,
+            confidence=0.0,
+            message="No reference provided for comparison",
+        )
+
+    ref_img = cv2.imread(ref_path) if ref_path else None
+    if ref_img is None:
+        return FaceVerificationResponse(
+            verified=False,
+            detected=True,
+            confidence=0.0,
+            message="Could not load reference image",
+        )
+
+    ref_faces = _detect_faces(ref_img)
+    if not ref_faces:
+        ref_face = ref_img
+    else:
+        rx, ry, rw, rh = max(ref_faces, key=lambda f: f[2] * f[3])
+        ref_face = ref_img[ry : ry + rh, rx : rx + rw]
+
+    confidence = _face_similarity(cap_face, ref_face)
+    verified = confidence >= 0.60
+
+    return FaceVerificationResponse(
+        verified=verified,
+        detected=True,
+        confidence=round(confidence, 3),
+        message="Identity verified" if verified else "Face does not match reference",
+    )
+
+
 @router.post("/verify-face", response_model=FaceVerificationResponse)
 async def verify_face(
     captured_image: UploadFile = File(..., description="Captured face image from kiosk camera"),
@@ -393,76 +624,18 @@ async def verify_face(
             except (json.JSONDecodeError, ValueError):
                 parsed_encoding = None
 
-        if _FR_AVAILABLE:
-            cap_rgb = cv2.cvtColor(cap_img, cv2.COLOR_BGR2RGB)
-            ref_rgb: np.ndarray | None = None
-
-            if parsed_encoding is None and reference_image_url:
-                suffix = os.path.splitext(reference_image_url.split("?")[0])[-1] or ".jpg"
-                tmp_fd, ref_path = tempfile.mkstemp(suffix=suffix, dir=settings.upload_dir)
-                os.close(tmp_fd)
-                urlretrieve(reference_image_url, ref_path)  # noqa: S310
-                ref_bgr = cv2.imread(ref_path)
-                if ref_bgr is not None:
-                    ref_rgb = cv2.cvtColor(ref_bgr, cv2.COLOR_BGR2RGB)
-
-            verified, detected, confidence, message = _dlib_verify(cap_rgb, parsed_encoding, ref_rgb)
-            return FaceVerificationResponse(verified=verified, detected=detected, confidence=confidence, message=message)
-
-        # --- Haar cascade fallback ---
-        faces = _detect_faces(cap_img)
-        if len(faces) == 0:
-            return FaceVerificationResponse(
-                verified=False,
-                detected=False,
-                confidence=0.0,
-                message="No face detected in captured image",
-            )
-
-        x, y, w, h = max(faces, key=lambda f: f[2] * f[3])
-        cap_face = cap_img[y : y + h, x : x + w]
-
-        if not reference_image_url:
-            return FaceVerificationResponse(
-                verified=False,
-                detected=True,
-                confidence=0.0,
-                message="No reference provided for comparison",
-            )
+        # dlib only needs the reference photo when there is no stored encoding
+        if reference_image_url and (parsed_encoding is None or not _FR_AVAILABLE):
+            ref_path = await executor.run_io(_download_reference, reference_image_url)
 
-        suffix = os.path.splitext(reference_image_url.split("?")[0])[-1] or ".jpg"
-        tmp_fd, ref_path = tempfile.mkstemp(suffix=suffix, dir=settings.upload_dir)
-        os.close(tmp_fd)
-        urlretrieve(reference_image_url, ref_path)  # noqa: S310
-
-        ref_img = cv2.imread(ref_path)
-        if ref_img is None:
-            return FaceVerificationResponse(
-                verified=False,
-                detected=True,
-                confidence=0.0,
-                message="Could not load reference image",
-            )
-
-        ref_faces = _detect_faces(ref_img)
-        if not ref_faces:
-            ref_face = ref_img
-        else:
-            rx, ry, rw, rh = max(ref_faces, key=lambda f: f[2] * f[3])
-            ref_face = ref_img[ry : ry + rh, rx : rx + rw]
-
-        confidence = _face_similarity(cap_face, ref_face)
-        verified = confidence >= 0.60
-
-        return FaceVerificationResponse(
-            verified=verified,
-            detected=True,
-            confidence=round(confidence, 3),
-            message="Identity verified" if verified else "Face does not match reference",
+        return await executor.run_cpu(
+            _verify_face_sync, cap_img, parsed_encoding, ref_path, bool(reference_image_url)
         )
 
     except HTTPException:
         raise
+    except ExecutorBusyError as e:
+        raise _busy(e) from e
     except Exception as e:
         logger.exception("Face verification failed")
         raise HTTPException(status_code=500, detail=f"Face verification error: {e}") from e
@@ -478,9 +651,11 @@ async def verify_face(
 async def health_check():
     """Service health and capability check."""
     return HealthResponse(
-        status="healthy",
+        status="warming_up" if executor.warming_up else "healthy",
         service=settings.app_name,
         deep_learning_enabled=settings.enable_deep_learning,
         ocr_enabled=settings.enable_ocr,
         face_recognition_enabled=_FR_AVAILABLE,
+        executor=executor.stats(),
+        warmup=executor.warmup,
     )
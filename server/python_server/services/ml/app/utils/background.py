@@ -12,22 +12,42 @@ Two strategies:
 1. GrabCut (general): Works on any image, semi-automatic.
 2. Kiosk subtraction: Uses the known empty-locker background
    (white interior) for precise foreground extraction.
+
+Kiosk captures whose locker has a registered empty frame (see
+kiosk_backgrounds) use subtraction; if the resulting mask looks
+degenerate (camera moved, door open, lighting changed) the caller falls
+back to GrabCut.
 """
 
 import cv2
 import numpy as np
 
 
-def remove_background_grabcut(image: np.ndarray, iterations: int = 5) -> tuple[np.ndarray, np.ndarray]:
+def remove_background_grabcut(
+    image: np.ndarray,
+    iterations: int = 5,
+    proxy_size: int = 0,
+    refine_band: int = 0,
+    refine_iterations: int = 2,
+) -> tuple[np.ndarray, np.ndarray]:
     """
     Isolate foreground item using GrabCut algorithm.
 
     Uses center-bias heuristic: assumes the item is roughly centered
     in the frame (true for both owner photos and kiosk captures).
 
+    GrabCut cost grows with pixel count, so a 12 MP owner photo takes
+    seconds. With proxy_size, GrabCut runs on a copy whose long side is
+    proxy_size and the mask is upsampled; with refine_band as well, only a
+    band of that many pixels around the upsampled boundary is re-labelled
+    at full resolution.
+
     Args:
         image: BGR image.
         iterations: GrabCut iterations (more = slower but better).
+        proxy_size: Long side of the low-resolution proxy (0 = full resolution).
+        refine_band: Half-width in pixels of the full-resolution boundary band (0 = no refinement).
+        refine_iterations: GrabCut iterations for the boundary refinement.
 
     Returns:
         Tuple of (foreground_image, binary_mask).
@@ -35,6 +55,31 @@ def remove_background_grabcut(image: np.ndarray, iterations: int = 5) -> tuple[n
     """
     h, w = image.shape[:2]
 
+    if proxy_size and max(h, w) > proxy_size:
+        scale = proxy_size / max(h, w)
+        proxy = cv2.resize(image, (max(1, round(w * scale)), max(1, round(h * scale))), interpolation=cv2.INTER_AREA)
+        proxy_mask = _grabcut_mask(proxy, iterations)
+        # Bilinear upsampling + 0.5 threshold gives a smoother edge than nearest-neighbour
+        fg_mask = cv2.resize(proxy_mask, (w, h), interpolation=cv2.INTER_LINEAR)
+        _, fg_mask = cv2.threshold(fg_mask, 127, 255, cv2.THRESH_BINARY)
+        if refine_band > 0:
+            fg_mask = _refine_boundary(image, fg_mask, refine_band, refine_iterations)
+    else:
+        fg_mask = _grabcut_mask(image, iterations)
+
+    # Clean up mask with morphological operations
+    kernel = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (7, 7))
+    fg_mask = cv2.morphologyEx(fg_mask, cv2.MORPH_CLOSE, kernel)
+    fg_mask = cv2.morphologyEx(fg_mask, cv2.MORPH_OPEN, kernel)
+
+    foreground = cv2.bitwise_and(image, image, mask=fg_mask)
+    return foreground, fg_mask
+
+
+def _grabcut_mask(image: np.ndarray, iterations: int) -> np.ndarray:
+    """GrabCut from the center-70% rectangle; returns a 0/255 foreground mask."""
+    h, w = image.shape[:2]
+
     # Initial rectangle: center 70% of the image
     margin_x = int(w * 0.15)
     margin_y = int(h * 0.15)
@@ -47,21 +92,52 @@ def remove_background_grabcut(image: np.ndarray, iterations: int = 5) -> tuple[n
     cv2.grabCut(image, mask, rect, bg_model, fg_model, iterations, cv2.GC_INIT_WITH_RECT)
 
     # 0=bg, 1=fg, 2=probable_bg, 3=probable_fg
-    fg_mask = np.where((mask == cv2.GC_FGD) | (mask == cv2.GC_PR_FGD), 255, 0).astype(np.uint8)
+    return np.where((mask == cv2.GC_FGD) | (mask == cv2.GC_PR_FGD), 255, 0).astype(np.uint8)
 
-    # Clean up mask with morphological operations
-    kernel = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (7, 7))
-    fg_mask = cv2.morphologyEx(fg_mask, cv2.MORPH_CLOSE, kernel)
-    fg_mask = cv2.morphologyEx(fg_mask, cv2.MORPH_OPEN, kernel)
 
-    foreground = cv2.bitwise_and(image, image, mask=fg_mask)
-    return foreground, fg_mask
+def _refine_boundary(image: np.ndarray, fg_mask: np.ndarray, band: int, iterations: int) -> np.ndarray:
+    """
+    Re-run GrabCut at full resolution on a band around an upsampled mask's boundary.
+
+    Pixels deeper than band inside/outside the mask are fixed as definite
+    foreground/background; the band keeps its upsampled label as "probable".
+    GrabCut runs on the band's bounding box only.
+    """
+    kernel = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (2 * band + 1, 2 * band + 1))
+    inner = cv2.erode(fg_mask, kernel)
+    outer = cv2.dilate(fg_mask, kernel)
+    # Without both definite labels GrabCut cannot fit its colour models
+    if not cv2.countNonZero(inner) or cv2.countNonZero(outer) == outer.size:
+        return fg_mask
+
+    labels = np.full(fg_mask.shape, cv2.GC_BGD, np.uint8)
+    labels[outer > 0] = cv2.GC_PR_BGD
+    labels[fg_mask > 0] = cv2.GC_PR_FGD
+    labels[inner > 0] = cv2.GC_FGD
+
+    # Crop to the band plus a margin of definite pixels for the colour models
+    x, y, bw, bh = cv2.boundingRect(cv2.subtract(outer, inner))
+    h, w = fg_mask.shape
+    x1, y1 = max(0, x - band), max(0, y - band)
+    x2, y2 = min(w, x + bw + band), min(h, y + bh + band)
+
+    roi = np.ascontiguousarray(labels[y1:y2, x1:x2])
+    bg_model = np.zeros((1, 65), np.float64)
+    fg_model = np.zeros((1, 65), np.float64)
+    cv2.grabCut(
+        np.ascontiguousarray(image[y1:y2, x1:x2]), roi, None, bg_model, fg_model, iterations, cv2.GC_INIT_WITH_MASK
+    )
+
+    refined = fg_mask.copy()
+    refined[y1:y2, x1:x2] = np.where((roi == cv2.GC_FGD) | (roi == cv2.GC_PR_FGD), 255, 0).astype(np.uint8)
+    return refined
 
 
 def remove_background_kiosk(
     image: np.ndarray,
     empty_locker_image: np.ndarray | None = None,
     white_threshold: int = 200,
+    diff_threshold: int = 30,
 ) -> tuple[np.ndarray, np.ndarray]:
     """
     Background removal optimized for kiosk locker cameras.
@@ -75,16 +151,19 @@ def remove_background_kiosk(
         image: BGR kiosk capture.
         empty_locker_image: Optional reference of the empty locker.
         white_threshold: Brightness threshold for white background removal.
+        diff_threshold: Gray-level difference from the empty locker that counts as foreground.
 
     Returns:
         Tuple of (foreground_image, binary_mask).
     """
     if empty_locker_image is not None:
-        return _subtract_background(image, empty_locker_image)
+        return _subtract_background(image, empty_locker_image, diff_threshold)
     return _threshold_white_background(image, white_threshold)
 
 
-def _subtract_background(image: np.ndarray, background: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+def _subtract_background(
+    image: np.ndarray, background: np.ndarray, diff_threshold: int = 30
+) -> tuple[np.ndarray, np.ndarray]:
     """Subtract known empty-locker background from kiosk capture."""
     # Ensure same size
     if image.shape != background.shape:
@@ -95,7 +174,7 @@ def _subtract_background(image: np.ndarray, background: np.ndarray) -> tuple[np.
     gray_diff = cv2.cvtColor(diff, cv2.COLOR_BGR2GRAY)
 
     # Threshold the difference
-    _, fg_mask = cv2.threshold(gray_diff, 30, 255, cv2.THRESH_BINARY)
+    _, fg_mask = cv2.threshold(gray_diff, diff_threshold, 255, cv2.THRESH_BINARY)
 
     # Clean up
     kernel = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (9, 9))
@@ -123,6 +202,18 @@ def _threshold_white_background(image: np.ndarray, threshold: int) -> tuple[np.n
     return foreground, fg_mask
 
 
+def is_degenerate_mask(mask: np.ndarray, min_coverage: float, max_coverage: float) -> bool:
+    """
+    True if a foreground mask covers too little or too much of the frame to be an item.
+
+    An almost empty mask means the item matches the background (or nothing
+    is in the locker); an almost full one means the reference frame no
+    longer matches the scene.
+    """
+    coverage = cv2.countNonZero(mask) / mask.size
+    return coverage < min_coverage or coverage > max_coverage
+
+
 def get_item_crop(image: np.ndarray, mask: np.ndarray, padding: int = 10) -> np.ndarray:
     """
     Crop the image tightly around the detected foreground item.
@@ -0,0 +1,248 @@
+"""
+Per-request image context.
+
+Every stage of the verification pipeline (quality gate, pHash, traditional
+CV, SIFT, SSIM, ResNet50, OCR) used to receive a file path and re-read,
+re-decode and re-preprocess the image on its own. An ImageContext wraps one
+image for the lifetime of a request and lazily memoizes each derived view
+the first time a stage asks for it:
+
+- decoded BGR array and raw grayscale, at the decode working resolution
+  (JPEGs are DCT-scaled while decoding), plus a full-resolution decode
+  for the stages that need fine detail (OCR)
+- white-balanced + CLAHE-normalized image
+- foreground/mask and the cropped item (BGR, gray, HSV): GrabCut, or
+  empty-locker subtraction when the context carries a kiosk background
+- fixed-size derivatives: 32px pHash, 128px HOG, 224px ResNet, 256px SSIM
+
+All stages accept either a raw source (path, bytes, array) or a context,
+so callers that verify a single pair keep working unchanged.
+
+Contexts are thread-safe: stages running concurrently (see
+comparison.stages) compute each view once, under a per-key lock.
+"""
+
+import threading
+from collections.abc import Callable
+from typing import Any
+
+import cv2
+import numpy as np
+from PIL import Image as _PILImage
+
+from ..config import settings
+from .background import get_item_crop, is_degenerate_mask, remove_background_grabcut, remove_background_kiosk
+from .image import clamp_image_size, decode_image, load_image, preprocess_image
+
+PHASH_SIZE = 32
+HOG_SIZE = 128
+DEEP_RESIZE = 256
+DEEP_CROP = 224
+SSIM_SIZE = 256
+
+
+class ImageContext:
+    """Lazily memoized views of a single image, shared by all stages of a request."""
+
+    def __init__(self, source: str | bytes | np.ndarray, background: np.ndarray | None = None):
+        """
+        Args:
+            source: File path, raw bytes, or BGR array.
+            background: Registered empty-locker frame for kiosk captures; enables
+                background subtraction instead of GrabCut.
+        """
+        self.source = source
+        self.background = background
+        # "grabcut", "background_subtraction" or "grabcut_fallback" once segmented
+        self.segmentation_method: str | None = None
+        # JPEG DCT scaling applied to bgr (1 = full resolution)
+        self.decode_factor = 1
+        self._cache: dict[Any, Any] = {}
+        self._locks: dict[Any, threading.Lock] = {}
+        self._locks_guard = threading.Lock()
+
+    @classmethod
+    def wrap(cls, source: "str | bytes | np.ndarray | ImageContext") -> "ImageContext":
+        """Return source unchanged if it is already a context, else wrap it."""
+        if isinstance(source, cls):
+            return source
+        return cls(source)
+
+    def cached(self, key: Any, factory: Callable[[], Any]) -> Any:
+        """Return the value memoized under key, computing it with factory() on first use."""
+        try:
+            return self._cache[key]
+        except KeyError:
+            pass
+        # Views derive from one another in one direction only, so per-key locks cannot deadlock
+        with self._locks_guard:
+            lock = self._locks.setdefault(key, threading.Lock())
+        with lock:
+            if key not in self._cache:
+                self._cache[key] = factory()
+        return self._cache[key]
+
+    # ── Decoded image ────────────────────────────────────────────────────────
+
+    @property
+    def bgr(self) -> np.ndarray:
+        """Decoded BGR image at the decode working resolution (clamped to max_image_size)."""
+
+        def build() -> np.ndarray:
+            img, self.decode_factor = decode_image(self.source, settings.decode_working_size)
+            return clamp_image_size(img)
+
+        return self.cached("bgr", build)
+
+    @property
+    def gray(self) -> np.ndarray:
+        """Grayscale of the decoded image, without any preprocessing."""
+        return self.cached("gray", lambda: cv2.cvtColor(self.bgr, cv2.COLOR_BGR2GRAY))
+
+    @property
+    def full_bgr(self) -> np.ndarray:
+        """Full-resolution decode (clamped to max_image_size); the same array as bgr unless it was reduced."""
+
+        def build() -> np.ndarray:
+            img = self.bgr
+            if self.decode_factor == 1:
+                return img
+            return load_image(self.source)
+
+        return self.cached("full_bgr", build)
+
+    @property
+    def full_gray(self) -> np.ndarray:
+        """Grayscale of the full-resolution decode."""
+
+        def build() -> np.ndarray:
+            if self.full_bgr is self.bgr:
+                return self.gray
+            return cv2.cvtColor(self.full_bgr, cv2.COLOR_BGR2GRAY)
+
+        return self.cached("full_gray", build)
+
+    def gray_thumbnail(self, width: int, height: int) -> np.ndarray:
+        """Raw grayscale area-resized to (width, height) — used by the perceptual hashes."""
+        return self.cached(
+            ("gray_thumbnail", width, height),
+            lambda: cv2.resize(self.gray, (width, height), interpolation=cv2.INTER_AREA),
+        )
+
+    # ── Preprocessing ────────────────────────────────────────────────────────
+
+    def preprocessed(self, normalize: bool = True, apply_white_balance: bool = True) -> np.ndarray:
+        """White-balanced and CLAHE-normalized image (same as utils.image.preprocess)."""
+        return self.cached(
+            ("preprocessed", normalize, apply_white_balance),
+            lambda: preprocess_image(self.bgr, normalize, apply_white_balance),
+        )
+
+    def segmentation(self, normalize: bool = True) -> tuple[np.ndarray, np.ndarray]:
+        """
+        (foreground, mask) of the preprocessed image.
+
+        With a background frame, the mask comes from absdiff against the raw
+        capture (both frames share camera and lighting, so this happens before
+        white balance/CLAHE); GrabCut runs only if that mask is degenerate.
+        """
+
+        def build() -> tuple[np.ndarray, np.ndarray]:
+            image = self.preprocessed(normalize)
+            if self.background is not None:
+                _, fg_mask = remove_background_kiosk(
+                    self.bgr, self.background, diff_threshold=settings.kiosk_background_diff_threshold
+                )
+                if not is_degenerate_mask(
+                    fg_mask, settings.kiosk_background_min_coverage, settings.kiosk_background_max_coverage
+                ):
+                    self.segmentation_method = "background_subtraction"
+                    return cv2.bitwise_and(image, image, mask=fg_mask), fg_mask
+                self.segmentation_method = "grabcut_fallback"
+            else:
+                self.segmentation_method = "grabcut"
+            return remove_background_grabcut(
+                image,
+                proxy_size=settings.grabcut_proxy_size,
+                refine_band=settings.grabcut_refine_band,
+                refine_iterations=settings.grabcut_refine_iterations,
+            )
+
+        return self.cached(("segmentation", normalize), build)
+
+    def item(self, normalize: bool = True, remove_bg: bool = True) -> np.ndarray:
+        """Preprocessed BGR item image — background removed and cropped when remove_bg."""
+
+        def build() -> np.ndarray:
+            if not remove_bg:
+                return self.preprocessed(normalize)
+            foreground, fg_mask = self.segmentation(normalize)
+            crop = get_item_crop(foreground, fg_mask)
+            if crop.shape[0] > 10 and crop.shape[1] > 10:
+                return crop
+            return foreground
+
+        return self.cached(("item", normalize, remove_bg), build)
+
+    def item_gray(self, normalize: bool = True, remove_bg: bool = True) -> np.ndarray:
+        """Grayscale of the item image."""
+        return self.cached(
+            ("item_gray", normalize, remove_bg),
+            lambda: cv2.cvtColor(self.item(normalize, remove_bg), cv2.COLOR_BGR2GRAY),
+        )
+
+    def item_hsv(self, normalize: bool = True, remove_bg: bool = True) -> np.ndarray:
+        """HSV of the item image."""
+        return self.cached(
+            ("item_hsv", normalize, remove_bg),
+            lambda: cv2.cvtColor(self.item(normalize, remove_bg), cv2.COLOR_BGR2HSV),
+        )
+
+    # ── Fixed-size derivatives ───────────────────────────────────────────────
+
+    def hog_input(self, normalize: bool = True, remove_bg: bool = True) -> np.ndarray:
+        """Item grayscale resized to the 128x128 HOG window."""
+        return self.cached(
+            ("hog_input", normalize, remove_bg),
+            lambda: cv2.resize(self.item_gray(normalize, remove_bg), (HOG_SIZE, HOG_SIZE)),
+        )
+
+    def deep_input(self) -> np.ndarray:
+        """
+        224x224 RGB center crop for ResNet50.
+
+        Reproduces torchvision's Resize(256) + CenterCrop(224) on a PIL
+        image: shorter side scaled to 256 with PIL's antialiased bilinear
+        filter (longer side truncated, as torchvision computes it), then the
+        central window with torchvision's rounding.
+
+        The source is the reduced decode whenever its shorter side is still
+        >= 256, so large JPEGs are never decoded at full resolution just for
+        ResNet50. Unreduced images match torchvision exactly; DCT-reduced
+        ones typically differ by at most one level per pixel (see
+        benchmarks/deep_input_parity.py).
+        """
+
+        def build() -> np.ndarray:
+            img = self.bgr if min(self.bgr.shape[:2]) >= DEEP_RESIZE else self.full_bgr
+            pil = _PILImage.fromarray(cv2.cvtColor(img, cv2.COLOR_BGR2RGB))
+            w, h = pil.size
+            new_long = int(DEEP_RESIZE * max(w, h) / min(w, h))
+            size = (DEEP_RESIZE, new_long) if w <= h else (new_long, DEEP_RESIZE)
+            if size != (w, h):
+                pil = pil.resize(size, _PILImage.BILINEAR)
+            top = int(round((size[1] - DEEP_CROP) / 2.0))
+            left = int(round((size[0] - DEEP_CROP) / 2.0))
+            return np.ascontiguousarray(np.asarray(pil)[top : top + DEEP_CROP, left : left + DEEP_CROP])
+
+        return self.cached("deep_input", build)
+
+    def ssim_gray(self) -> np.ndarray:
+        """Preprocessed image resized to 256x256 and converted to grayscale."""
+
+        def build() -> np.ndarray:
+            resized = cv2.resize(self.preprocessed(), (SSIM_SIZE, SSIM_SIZE))
+            return cv2.cvtColor(resized, cv2.COLOR_BGR2GRAY)
+
+        return self.cached("ssim_gray", build)
+
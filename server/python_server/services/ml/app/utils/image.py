@@ -1,6 +1,7 @@
 """Image preprocessing utilities."""
 
 import io
+import threading
 
 import cv2
 import numpy as np
@@ -9,28 +10,78 @@ from PIL import Image as _PILImage
 from ..config import settings
 
 
-def load_image(source: str | bytes | np.ndarray) -> np.ndarray:
-    """Load image from file path, bytes, or numpy array."""
+# libjpeg DCT scaling factors -> cv2.imread flags
+_REDUCED_COLOR = {2: cv2.IMREAD_REDUCED_COLOR_2, 4: cv2.IMREAD_REDUCED_COLOR_4, 8: cv2.IMREAD_REDUCED_COLOR_8}
+
+
+def _jpeg_reduction(pil: _PILImage.Image, working_size: int) -> int:
+    """Largest DCT scaling factor (1, 2, 4 or 8) that keeps a JPEG's long side >= working_size."""
+    if not working_size or pil.format != "JPEG":
+        return 1
+    long_side = max(pil.size)
+    for factor in (8, 4, 2):
+        if long_side // factor >= working_size:
+            return factor
+    return 1
+
+
+def decode_image(source: str | bytes | np.ndarray, working_size: int = 0) -> tuple[np.ndarray, int]:
+    """
+    Decode an image, letting libjpeg scale JPEGs down while decoding.
+
+    With a working_size, a JPEG is decoded at 1/2, 1/4 or 1/8 scale (the
+    smallest that keeps its long side >= working_size), which costs a
+    fraction of the full decode in time and memory. Other formats, and
+    arrays, are returned at full size.
+
+    Returns:
+        (BGR image, reduction factor applied while decoding).
+    """
     if isinstance(source, np.ndarray):
-        return source
+        return source, 1
+    factor = 1
     if isinstance(source, bytes):
         # Use Pillow to avoid the cv2.imdecode / numpy ABI incompatibility
         # that causes "buf is not a numpy array" in the Render Docker environment.
-        pil = _PILImage.open(io.BytesIO(source)).convert("RGB")
-        img = cv2.cvtColor(np.array(pil), cv2.COLOR_RGB2BGR)
+        pil = _PILImage.open(io.BytesIO(source))
+        factor = _jpeg_reduction(pil, working_size)
+        if factor > 1:
+            pil.draft("RGB", (pil.size[0] // factor, pil.size[1] // factor))
+        img = cv2.cvtColor(np.array(pil.convert("RGB")), cv2.COLOR_RGB2BGR)
     else:
-        img = cv2.imread(source)
+        if working_size:
+            # Header only; the pixels are decoded by OpenCV (which applies EXIF orientation)
+            try:
+                with _PILImage.open(source) as pil:
+                    factor = _jpeg_reduction(pil, working_size)
+            except OSError:
+                factor = 1
+        img = cv2.imread(source, _REDUCED_COLOR[factor] if factor > 1 else cv2.IMREAD_COLOR)
 
     if img is None:
         raise ValueError(f"Could not load image from: {source!r}")
+    return img, factor
 
-    # Clamp oversized images before any processing to prevent OOM on large phone photos.
+
+def load_image(source: str | bytes | np.ndarray, working_size: int = 0) -> np.ndarray:
+    """
+    Load image from file path, bytes, or numpy array.
+
+    Args:
+        working_size: Decode JPEGs at a reduced scale whose long side is
+            still >= working_size (0 = full resolution); see decode_image.
+    """
+    img, _ = decode_image(source, working_size)
+    return clamp_image_size(img)
+
+
+def clamp_image_size(img: np.ndarray) -> np.ndarray:
+    """Clamp oversized images before any processing to prevent OOM on large phone photos."""
     h, w = img.shape[:2]
     max_dim = settings.max_image_size
     if h > max_dim or w > max_dim:
         scale = max_dim / max(h, w)
         img = cv2.resize(img, (int(w * scale), int(h * scale)), interpolation=cv2.INTER_AREA)
-
     return img
 
 
@@ -42,13 +93,20 @@ def normalize_lighting(image: np.ndarray) -> np.ndarray:
     and kiosk LED lighting (locker camera photos).
     """
     lab = cv2.cvtColor(image, cv2.COLOR_BGR2LAB)
-    l_channel, a_channel, b_channel = cv2.split(lab)
+    l_channel = cv2.extractChannel(lab, 0)
+    cv2.insertChannel(_clahe().apply(l_channel), lab, 0)
+    return cv2.cvtColor(lab, cv2.COLOR_LAB2BGR)
+
 
-    clahe = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(8, 8))
-    l_channel = clahe.apply(l_channel)
+_thread_local = threading.local()
 
-    normalized = cv2.merge([l_channel, a_channel, b_channel])
-    return cv2.cvtColor(normalized, cv2.COLOR_LAB2BGR)
+
+def _clahe() -> cv2.CLAHE:
+    """This thread's CLAHE instance (CLAHE objects hold scratch buffers, so they are not shared)."""
+    clahe = getattr(_thread_local, "clahe", None)
+    if clahe is None:
+        clahe = _thread_local.clahe = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(8, 8))
+    return clahe
 
 
 def white_balance(image: np.ndarray) -> np.ndarray:
@@ -74,6 +132,43 @@ def white_balance(image: np.ndarray) -> np.ndarray:
     return np.clip(result, 0, 255).astype(np.uint8)
 
 
+def white_balance_lut(image: np.ndarray, sample_step: int = 1) -> np.ndarray:
+    """
+    Gray-world white balance through a per-channel lookup table.
+
+    Same correction as white_balance, but the channel means come from every
+    sample_step-th pixel in each direction and the gains are applied with
+    one cv2.LUT pass, so no full-frame float buffer is allocated. Output
+    matches white_balance up to the sampling error of the means.
+    """
+    step = max(1, sample_step)
+    means = cv2.mean(np.ascontiguousarray(image[::step, ::step]))[:3]
+    avg_all = sum(means) / 3
+
+    levels = np.arange(256, dtype=np.float64)
+    lut = np.empty((1, 256, 3), dtype=np.uint8)
+    for channel, avg in enumerate(means):
+        gain = avg_all / avg if avg > 0 else 1.0
+        lut[0, :, channel] = np.clip(levels * gain, 0, 255).astype(np.uint8)
+    return cv2.LUT(image, lut)
+
+
+def preprocess_image(image: np.ndarray, normalize: bool = True, apply_white_balance: bool = True) -> np.ndarray:
+    """White balance (settings.white_balance_method) and CLAHE lighting normalization of a BGR image."""
+    if apply_white_balance:
+        if settings.white_balance_method == "lut":
+            image = white_balance_lut(image, settings.white_balance_sample_step)
+        elif settings.white_balance_method == "float":
+            image = white_balance(image)
+        else:
+            raise ValueError(
+                f"Unknown white_balance_method {settings.white_balance_method!r} (expected 'lut' or 'float')"
+            )
+    if normalize:
+        image = normalize_lighting(image)
+    return image
+
+
 def resize_image(image: np.ndarray, target_size: tuple[int, int] = (640, 640)) -> np.ndarray:
     """Resize image while maintaining aspect ratio with padding."""
     h, w = image.shape[:2]
@@ -100,13 +195,7 @@ def preprocess(
     target_size: tuple[int, int] | None = None,
 ) -> np.ndarray:
     """Full preprocessing pipeline: load, white balance, normalize lighting, resize."""
-    img = load_image(source)
-
-    if apply_white_balance:
-        img = white_balance(img)
-
-    if normalize:
-        img = normalize_lighting(img)
+    img = preprocess_image(load_image(source), normalize, apply_white_balance)
 
     if target_size:
         img = resize_image(img, target_size)
@@ -0,0 +1,120 @@
+"""
+Registered empty-locker reference frames.
+
+Each kiosk locker camera sees the same white interior under the same LED
+lighting, so a frame of the empty locker makes background removal a cheap
+absdiff + threshold (see background.remove_background_kiosk) instead of
+GrabCut. Kiosks register a frame per (kiosk_id, locker_id) with
+POST /kiosk-background and re-register it periodically as lighting drifts.
+
+Frames are stored as lossless PNGs under kiosk_background_dir, so every
+worker process sees the same set; each process keeps a bounded LRU of
+decoded frames, revalidated against the file's mtime.
+"""
+
+import logging
+import os
+import re
+import threading
+from collections import OrderedDict
+
+import cv2
+import numpy as np
+
+from ..config import settings
+from .image import load_image
+
+logger = logging.getLogger(__name__)
+
+_ID_PATTERN = re.compile(r"^[A-Za-z0-9_.-]{1,64}$")
+
+
+class KioskBackgroundStore:
+    """Disk-backed empty-locker frames with an in-memory LRU of decoded images."""
+
+    def __init__(self, directory: str, cache_size: int):
+        self.directory = directory
+        self._cache_size = max(0, cache_size)
+        self._lock = threading.Lock()
+        # (kiosk_id, locker_id) -> (mtime, BGR image)
+        self._cache: OrderedDict[tuple[str, str], tuple[float, np.ndarray]] = OrderedDict()
+
+    def _path(self, kiosk_id: str, locker_id: str) -> str:
+        for value in (kiosk_id, locker_id):
+            if not _ID_PATTERN.match(value):
+                raise ValueError(f"Invalid kiosk/locker id {value!r} (allowed: letters, digits, '_', '-', '.')")
+        if kiosk_id.startswith(".") or locker_id.startswith("."):
+            raise ValueError("Kiosk/locker ids must not start with '.'")
+        return os.path.join(self.directory, kiosk_id, f"{locker_id}.png")
+
+    def put(self, kiosk_id: str, locker_id: str, data: bytes) -> dict:
+        """
+        Decode and store (or replace) the empty-locker frame for a locker.
+
+        Raises:
+            ValueError: On invalid ids or undecodable image data.
+        """
+        path = self._path(kiosk_id, locker_id)
+        # Same decode working resolution as the kiosk captures it is subtracted from
+        image = load_image(data, settings.decode_working_size)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        tmp_path = path + ".tmp.png"
+        if not cv2.imwrite(tmp_path, image):
+            raise ValueError(f"Could not write background frame to {path}")
+        os.replace(tmp_path, path)
+
+        with self._lock:
+            self._cache.pop((kiosk_id, locker_id), None)
+        logger.info(
+            "Registered empty-locker frame for %s/%s (%dx%d)", kiosk_id, locker_id, image.shape[1], image.shape[0]
+        )
+        return {
+            "kiosk_id": kiosk_id,
+            "locker_id": locker_id,
+            "width": int(image.shape[1]),
+            "height": int(image.shape[0]),
+            "updated_at": os.path.getmtime(path),
+        }
+
+    def get(self, kiosk_id: str, locker_id: str) -> np.ndarray | None:
+        """Return the registered frame (BGR), or None if the locker has none."""
+        path = self._path(kiosk_id, locker_id)
+        try:
+            mtime = os.path.getmtime(path)
+        except OSError:
+            return None
+
+        key = (kiosk_id, locker_id)
+        with self._lock:
+            cached = self._cache.get(key)
+            if cached is not None and cached[0] == mtime:
+                self._cache.move_to_end(key)
+                return cached[1]
+
+        image = cv2.imread(path)
+        if image is None:
+            logger.warning("Unreadable empty-locker frame %s", path)
+            return None
+
+        with self._lock:
+            if self._cache_size:
+                self._cache[key] = (mtime, image)
+                self._cache.move_to_end(key)
+                while len(self._cache) > self._cache_size:
+                    self._cache.popitem(last=False)
+        return image
+
+
+_store: KioskBackgroundStore | None = None
+_store_lock = threading.Lock()
+
+
+def get_background_store() -> KioskBackgroundStore:
+    """Return this process's KioskBackgroundStore."""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = KioskBackgroundStore(settings.kiosk_background_dir, settings.kiosk_background_cache_size)
+    return _store
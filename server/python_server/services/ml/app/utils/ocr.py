@@ -1,48 +1,377 @@
 """
 OCR utility for serial number / text extraction (Phase 3).
 
-Uses pytesseract to detect text on items (serial numbers, brand names,
-model numbers) for additional verification confidence.
+Detects text on items (serial numbers, brand names, model numbers) for
+additional verification confidence.
+
+- Recognition backends: tesserocr (libtesseract in-process) when
+  installed, else pytesseract, which starts a tesseract process per call.
+  tesserocr handles are expensive to create (each loads the language
+  model), so each process keeps a small pool of long-lived handles.
+- Text regions: a cheap morphological-gradient detector finds text-like
+  line regions first and only those are recognized (all crops in one
+  tesseract call on the pytesseract path), instead of the whole frame.
+- Text presence: text_score() reuses those regions as a cheap per-image
+  text likelihood, so callers can skip OCR on textless items.
+- Reference images (owner photos) are OCR'd once per process: results
+  are remembered by image content across requests.
 """
 
+import hashlib
 import logging
+import queue
 import re
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
 
 import cv2
 import numpy as np
 
-from .image import load_image
+from ..config import settings
+from .context import ImageContext
 
 logger = logging.getLogger(__name__)
 
+try:
+    import tesserocr
+except ImportError:
+    tesserocr = None
+
+try:
+    import pytesseract
+except ImportError:
+    pytesseract = None
+
+# Text regions are searched on a copy whose long side is at most this
+_REGION_MAX_SIDE = 1024
+# Above this fraction of the frame, recognizing the full frame is cheaper than region by region
+_FULL_FRAME_COVERAGE = 0.5
+_REGION_PADDING = 4
+
+
+class TesseractPool:
+    """Bounded pool of long-lived tesserocr API handles, shared by the threads of a process."""
+
+    def __init__(self, size: int, tessdata_path: str = "", lang: str = "eng"):
+        self.size = max(1, size)
+        self.tessdata_path = tessdata_path
+        self.lang = lang
+        self._idle: queue.LifoQueue = queue.LifoQueue()
+        self._created = 0
+        self._lock = threading.Lock()
+
+    def _create(self):
+        kwargs = {"lang": self.lang, "psm": tesserocr.PSM.SINGLE_BLOCK}
+        if self.tessdata_path:
+            kwargs["path"] = self.tessdata_path
+        return tesserocr.PyTessBaseAPI(**kwargs)
+
+    @contextmanager
+    def acquire(self):
+        """Borrow a handle, creating one if fewer than size exist, else waiting for one."""
+        try:
+            api = self._idle.get_nowait()
+        except queue.Empty:
+            with self._lock:
+                create = self._created < self.size
+                if create:
+                    self._created += 1
+            if create:
+                try:
+                    api = self._create()
+                except Exception:
+                    with self._lock:
+                        self._created -= 1
+                    raise
+            else:
+                api = self._idle.get()
+        try:
+            yield api
+        finally:
+            api.Clear()
+            self._idle.put(api)
+
+
+_pool: TesseractPool | None = None
+_pool_lock = threading.Lock()
+
+
+def get_tesseract_pool() -> TesseractPool | None:
+    """Return this process's TesseractPool, or None when tesserocr is not installed."""
+    global _pool
+    if tesserocr is None:
+        return None
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = TesseractPool(settings.ocr_pool_size, settings.ocr_tessdata_path)
+    return _pool
+
+
+def ocr_backend() -> str | None:
+    """Name of the recognition backend in use ("tesserocr", "pytesseract"), or None."""
+    if tesserocr is not None:
+        return "tesserocr"
+    if pytesseract is not None:
+        return "pytesseract"
+    return None
+
+
+def detect_text_regions(
+    source: str | bytes | np.ndarray | ImageContext, max_regions: int | None = None
+) -> list[tuple[int, int, int, int]]:
+    """
+    Find text-like line regions with a morphological gradient.
+
+    Each character's outline is a small connected component of the
+    thresholded gradient. Components with character-like size and fill are
+    kept (item outlines and large texture blobs are not), then closed
+    horizontally so the characters of a line form one wide component;
+    lines that are not wider than high or too sparse are dropped.
+    Memoized on the image's ImageContext.
+
+    Returns:
+        Up to max_regions (x, y, w, h) boxes in ctx.gray pixels (the decode
+        working resolution), largest first.
+    """
+    ctx = ImageContext.wrap(source)
+    max_regions = settings.ocr_max_regions if max_regions is None else max_regions
+
+    def build() -> list[tuple[int, int, int, int]]:
+        gray = ctx.gray
+        h, w = gray.shape
+        scale = min(1.0, _REGION_MAX_SIDE / max(h, w))
+        small = cv2.resize(gray, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA) if scale < 1 else gray
+        sh, sw = small.shape
+
+        grad = cv2.morphologyEx(small, cv2.MORPH_GRADIENT, cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (3, 3)))
+        _, bw = cv2.threshold(grad, 0, 255, cv2.THRESH_BINARY | cv2.THRESH_OTSU)
+
+        # Character candidates: 6px to 10% of the frame tall, not much wider than tall, not hairlines
+        _, labels, stats, _ = cv2.connectedComponentsWithStats(bw, connectivity=8)
+        cw, ch, area = stats[:, cv2.CC_STAT_WIDTH], stats[:, cv2.CC_STAT_HEIGHT], stats[:, cv2.CC_STAT_AREA]
+        is_char = (ch >= 6) & (ch <= 0.1 * sh) & (cw <= 2.5 * ch) & (area >= 0.15 * cw * ch)
+        is_char[0] = False  # label 0 is the background
+        bw = np.where(is_char[labels], 255, 0).astype(np.uint8)
+
+        lines = cv2.morphologyEx(bw, cv2.MORPH_CLOSE, cv2.getStructuringElement(cv2.MORPH_RECT, (9, 1)))
+
+        contours, _ = cv2.findContours(lines, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+        boxes = []
+        for contour in contours:
+            x, y, bw_, bh = cv2.boundingRect(contour)
+            if bh < 8 or bw_ < 12 or bh > 0.25 * sh or bw_ < 1.2 * bh:
+                continue
+            if cv2.countNonZero(bw[y : y + bh, x : x + bw_]) < 0.25 * bw_ * bh:
+                continue
+            boxes.append((x, y, bw_, bh))
+
+        # Keep the words of a line together so "S/N: 12345" is recognized as one line
+        boxes = _merge_line_boxes(boxes)
+        boxes.sort(key=lambda b: b[2] * b[3], reverse=True)
+        regions = []
+        for x, y, bw_, bh in boxes[:max_regions]:
+            x1 = max(0, int((x - _REGION_PADDING) / scale))
+            y1 = max(0, int((y - _REGION_PADDING) / scale))
+            x2 = min(w, int((x + bw_ + _REGION_PADDING) / scale) + 1)
+            y2 = min(h, int((y + bh + _REGION_PADDING) / scale) + 1)
+            regions.append((x1, y1, x2 - x1, y2 - y1))
+        return regions
+
+    return ctx.cached(("text_regions", max_regions), build)
+
+
+def text_score(source: str | bytes | np.ndarray | ImageContext) -> float:
+    """
+    Text likelihood of an image: percent of the frame covered by detected text-line regions.
+
+    Costs one morphological gradient on a bounded copy, and the regions are
+    memoized, so OCR that runs afterwards does not detect them again.
+    """
+    ctx = ImageContext.wrap(source)
+    h, w = ctx.gray.shape
+    covered = sum(rw * rh for _, _, rw, rh in detect_text_regions(ctx))
+    return 100.0 * covered / (h * w)
+
+
+def _merge_line_boxes(boxes: list[tuple[int, int, int, int]]) -> list[tuple[int, int, int, int]]:
+    """Merge boxes that share a text line (mostly overlapping rows, gap under two line heights)."""
+    merged: list[list[int]] = []
+    for x, y, w, h in sorted(boxes):
+        for box in merged:
+            bx, by, bw, bh = box
+            overlap = min(y + h, by + bh) - max(y, by)
+            gap = x - (bx + bw)
+            if overlap >= 0.5 * min(h, bh) and gap <= 2 * max(h, bh):
+                x2, y2 = max(bx + bw, x + w), max(by + bh, y + h)
+                box[0], box[1] = min(bx, x), min(by, y)
+                box[2], box[3] = x2 - box[0], y2 - box[1]
+                break
+        else:
+            merged.append([x, y, w, h])
+    return [tuple(b) for b in merged]
+
+
+def _ocr_binary(ctx: ImageContext) -> np.ndarray:
+    """Full-resolution OCR input: blurred, adaptive-thresholded grayscale."""
+
+    def build() -> np.ndarray:
+        gray = cv2.GaussianBlur(ctx.full_gray, (3, 3), 0)
+        return cv2.adaptiveThreshold(gray, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, cv2.THRESH_BINARY, 11, 2)
+
+    return ctx.cached("ocr_binary", build)
+
+
+def _scale_regions(
+    regions: list[tuple[int, int, int, int]], from_shape: tuple[int, int], to_shape: tuple[int, int]
+) -> list[tuple[int, int, int, int]]:
+    """Map (x, y, w, h) boxes from one resolution of an image to another, rounding outwards."""
+    if from_shape == to_shape:
+        return regions
+    sy, sx = to_shape[0] / from_shape[0], to_shape[1] / from_shape[1]
+    scaled = []
+    for x, y, w, h in regions:
+        x1, y1 = int(x * sx), int(y * sy)
+        x2 = min(to_shape[1], int(np.ceil((x + w) * sx)))
+        y2 = min(to_shape[0], int(np.ceil((y + h) * sy)))
+        scaled.append((x1, y1, x2 - x1, y2 - y1))
+    return scaled
+
 
-def extract_text(source: str | bytes | np.ndarray) -> str:
+def _recognize_tesserocr(binary: np.ndarray, regions: list[tuple[int, int, int, int]] | None) -> str:
+    """Recognize the full frame (regions=None) or each region with a pooled handle."""
+    h, w = binary.shape
+    binary = np.ascontiguousarray(binary)
+    with get_tesseract_pool().acquire() as api:
+        api.SetImageBytes(binary.tobytes(), w, h, 1, w)
+        if regions is None:
+            return api.GetUTF8Text()
+        texts = []
+        for x, y, rw, rh in regions:
+            api.SetRectangle(x, y, rw, rh)
+            texts.append(api.GetUTF8Text().strip())
+        return "\n".join(t for t in texts if t)
+
+
+def _recognize_pytesseract(binary: np.ndarray, regions: list[tuple[int, int, int, int]] | None) -> str:
+    """Recognize the full frame or all regions stacked into one image (one tesseract process)."""
+    if regions is not None:
+        crops = [binary[y : y + rh, x : x + rw] for x, y, rw, rh in regions]
+        width = max(c.shape[1] for c in crops) + 2 * _REGION_PADDING
+        rows = []
+        for crop in crops:
+            rows.append(
+                cv2.copyMakeBorder(
+                    crop,
+                    _REGION_PADDING,
+                    _REGION_PADDING,
+                    _REGION_PADDING,
+                    width - crop.shape[1] - _REGION_PADDING,
+                    cv2.BORDER_CONSTANT,
+                    value=255,
+                )
+            )
+        binary = np.vstack(rows)
+    return pytesseract.image_to_string(binary, config="--psm 6")
+
+
+def extract_text(source: str | bytes | np.ndarray | ImageContext, full_frame: bool = False) -> str:
     """
     Extract text from an image using Tesseract OCR.
 
+    With ocr_text_regions, only detected text regions are recognized and
+    an image without any is returned as "" without running Tesseract.
+
+    Args:
+        full_frame: Recognize the whole frame even if no text regions are
+            detected (e.g. when a missed serial number would be costly).
+
     Returns:
         Extracted text string (may be empty if no text found).
     """
+    backend = ocr_backend()
+    if backend is None:
+        logger.warning("Neither tesserocr nor pytesseract is installed, skipping OCR")
+        return ""
     try:
-        import pytesseract
-    except ImportError:
-        logger.warning("pytesseract not installed, skipping OCR")
+        return _cached_text(ImageContext.wrap(source), backend, full_frame)
+    except Exception as e:
+        logger.warning("OCR extraction failed: %s", e)
         return ""
 
-    try:
-        img = load_image(source)
-        gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
 
-        # Enhance for OCR: threshold + denoise
-        gray = cv2.GaussianBlur(gray, (3, 3), 0)
-        gray = cv2.adaptiveThreshold(gray, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, cv2.THRESH_BINARY, 11, 2)
+def _cached_text(ctx: ImageContext, backend: str, full_frame: bool) -> str:
+    """OCR text memoized on the context; failures raise and are not memoized."""
+    full_frame = full_frame or not settings.ocr_text_regions
+    key = "ocr_text_full" if full_frame else "ocr_text"
+    return ctx.cached(key, lambda: _extract_text(ctx, backend, full_frame))
+
+
+def _extract_text(ctx: ImageContext, backend: str, full_frame: bool) -> str:
+    regions = None
+    if not full_frame:
+        regions = detect_text_regions(ctx)
+        if not regions:
+            return ""
+        h, w = ctx.gray.shape
+        if sum(rw * rh for _, _, rw, rh in regions) > _FULL_FRAME_COVERAGE * h * w:
+            regions = None
+
+    binary = _ocr_binary(ctx)
+    if regions is not None:
+        regions = _scale_regions(regions, ctx.gray.shape, binary.shape)
+    if backend == "tesserocr":
+        text = _recognize_tesserocr(binary, regions)
+    else:
+        text = _recognize_pytesseract(binary, regions)
+    return text.strip()
+
+
+# Content digest of a reference image -> its OCR text, shared by all requests in the process
+_reference_texts: OrderedDict[str, str] = OrderedDict()
+_reference_texts_lock = threading.Lock()
+
 
-        text = pytesseract.image_to_string(gray, config="--psm 6")
-        return text.strip()
+def extract_reference_text(source: str | bytes | np.ndarray | ImageContext) -> str:
+    """
+    extract_text for reference (owner) images, remembered across requests.
+
+    Owner photos are uploaded again with every /verify that carries
+    original images; keyed by a digest of the decoded pixels, each one is
+    recognized once per process (up to ocr_reference_cache_size images).
+    A failed recognition returns "" without being remembered, so the next
+    request tries again.
+    """
+    ctx = ImageContext.wrap(source)
+    gray = ctx.gray
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(np.asarray(gray.shape, dtype=np.int64).tobytes())
+    digest.update(np.ascontiguousarray(gray))
+    key = digest.hexdigest()
+
+    with _reference_texts_lock:
+        if key in _reference_texts:
+            _reference_texts.move_to_end(key)
+            return _reference_texts[key]
+
+    backend = ocr_backend()
+    if backend is None:
+        logger.warning("Neither tesserocr nor pytesseract is installed, skipping OCR")
+        return ""
+    try:
+        text = _cached_text(ctx, backend, False)
     except Exception as e:
         logger.warning("OCR extraction failed: %s", e)
         return ""
 
+    if settings.ocr_reference_cache_size > 0:
+        with _reference_texts_lock:
+            _reference_texts[key] = text
+            while len(_reference_texts) > settings.ocr_reference_cache_size:
+                _reference_texts.popitem(last=False)
+    return text
+
 
 def find_serial_numbers(text: str) -> list[str]:
     """
@@ -9,7 +9,7 @@ garbage features — better to reject early and ask for a retake.
 import cv2
 import numpy as np
 
-from .image import load_image
+from .context import ImageContext
 
 
 class QualityCheckResult:
@@ -33,7 +33,7 @@ class QualityCheckResult:
 
 
 def check_quality(
-    source: str | bytes | np.ndarray,
+    source: str | bytes | np.ndarray | ImageContext,
     fg_mask: np.ndarray | None = None,
     min_blur_score: float = 50.0,
     min_brightness: float = 40.0,
@@ -44,7 +44,7 @@ def check_quality(
     Run all quality checks on an image.
 
     Args:
-        source: Image file path, bytes, or numpy array.
+        source: Image file path, bytes, numpy array, or ImageContext.
         fg_mask: Optional foreground mask (for coverage check).
         min_blur_score: Minimum Laplacian variance (below = blurry).
         min_brightness: Minimum mean brightness (below = too dark).
@@ -54,12 +54,16 @@ def check_quality(
     Returns:
         QualityCheckResult with pass/fail and details.
     """
-    img = load_image(source)
+    ctx = ImageContext.wrap(source)
     result = QualityCheckResult()
 
     # --- Blur detection (Laplacian variance) ---
-    gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
-    result.blur_score = cv2.Laplacian(gray, cv2.CV_64F).var()
+    # Measured at full resolution: the variance grows when an image is downscaled,
+    # by a content-dependent factor (1.9-3.8x at half scale on test captures), so
+    # no fixed min_blur_score works on the reduced decode (ctx.gray). This is the
+    # one full-resolution decode of a kiosk frame; OCR text detection reuses it.
+    result.blur_score = cv2.Laplacian(ctx.full_gray, cv2.CV_64F).var()
+    gray = ctx.gray
 
     if result.blur_score < min_blur_score:
         result.passed = False
@@ -0,0 +1,92 @@
+"""
+Model preloading and warm-up.
+
+ResNet50, dlib and Tesseract all pay a one-off cost the first time they are
+used: weight loading, first-inference graph/allocator setup, dlib model
+deserialization, and the tesseract binary's first start. Without warm-up
+that cost lands on the first kiosk verification after every deploy.
+
+These functions run inside each CPU worker (see app.workers): load_models()
+from the pool initializer, warm_up_models() from the initializer too in
+worker processes, or once as a startup job triggered by the FastAPI
+lifespan hook in thread mode.
+"""
+
+import logging
+import time
+
+import cv2
+import numpy as np
+
+from .config import settings
+
+logger = logging.getLogger(__name__)
+
+
+def load_models():
+    """Load the ResNet50 backend and dlib's face models so the first job doesn't pay for them."""
+    if settings.enable_deep_learning:
+        from .features.deep_backends import get_backend
+
+        get_backend()
+
+    try:
+        import face_recognition  # noqa: F401 — loads dlib's detector and encoder on import
+    except ImportError:
+        pass
+
+
+def warm_up_models(verifier) -> dict:
+    """
+    Exercise every model once with dummy input.
+
+    Args:
+        verifier: The worker's HybridVerifier (its DeepFeatureExtractor is used).
+
+    Returns:
+        Dict of step name -> duration in ms (or an "error: ..." string), plus
+        the backend parity report when deep_parity_check is on.
+    """
+    steps: dict[str, float | str | dict] = {}
+
+    def timed(name: str, fn):
+        start = time.perf_counter()
+        try:
+            fn()
+            steps[name] = round((time.perf_counter() - start) * 1000, 1)
+        except Exception as e:
+            logger.warning("Warm-up step %s failed: %s", name, e)
+            steps[name] = f"error: {e}"
+
+    if settings.enable_deep_learning:
+        dummy = np.full((256, 256, 3), 127, dtype=np.uint8)
+        timed("resnet50", lambda: verifier.deep.extract(dummy))
+
+        if settings.deep_parity_check:
+            from .features.deep_backends import check_parity
+
+            try:
+                steps["resnet50_parity"] = check_parity()
+            except Exception as e:
+                logger.warning("Deep backend parity check failed: %s", e)
+                steps["resnet50_parity"] = f"error: {e}"
+
+    try:
+        import face_recognition as _fr
+    except ImportError:
+        _fr = None
+
+    if _fr is not None:
+        face = np.full((120, 120, 3), 127, dtype=np.uint8)
+        timed("dlib_hog_detector", lambda: _fr.face_locations(face, model="hog"))
+        timed("dlib_encoder", lambda: _fr.face_encodings(face, known_face_locations=[(10, 110, 110, 10)]))
+
+    if settings.enable_ocr:
+        from .utils.ocr import extract_text
+
+        # Real glyphs, so the text-region detector passes and a Tesseract handle is created
+        text_img = np.full((48, 160, 3), 255, dtype=np.uint8)
+        cv2.putText(text_img, "SN 1234", (8, 34), cv2.FONT_HERSHEY_SIMPLEX, 0.9, (0, 0, 0), 2)
+        timed("tesseract", lambda: extract_text(text_img))
+
+    return steps
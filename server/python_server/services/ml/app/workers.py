@@ -0,0 +1,321 @@
+"""
+Executor layer for the CPU-bound verification pipeline.
+
+The FastAPI endpoints are ``async def``, but HybridVerifier, dlib and
+pytesseract are fully synchronous. Calling them directly blocks the event
+loop, so a single 10-second verification also stalls ``/health``.
+
+This module owns two pools:
+
+- CPU pool: a process pool (or a thread pool when ``worker_processes`` is 0)
+  that runs HybridVerifier / dlib jobs. Each worker builds its own
+  HybridVerifier and preloads the models in its initializer. Worker
+  processes also run the dummy pass through every model there (see
+  app.warmup), before they take their first job; in thread mode the
+  models are shared, so warm_up() runs it once.
+- I/O pool: a small thread pool for writing uploads and downloading
+  reference images.
+
+The CPU pool is bounded by ``worker_max_queue`` (running + waiting jobs);
+beyond that, ``run_cpu`` raises ExecutorBusyError so the router can answer
+503 instead of piling up work it cannot finish in time. If a worker process
+dies (OOM kill, native crash), the process pool is broken for good;
+``run_cpu`` replaces it and answers 503 for the jobs that were lost.
+"""
+
+import asyncio
+import logging
+import multiprocessing
+import os
+import threading
+import time
+from collections.abc import Callable
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from functools import partial
+from typing import Any
+
+from .config import settings
+from .features.bundle import FEATURE_VERSION, decode_reference_features, encode_bundle, to_json_safe
+from .features.store import get_feature_store
+from .utils.context import ImageContext
+from .utils.kiosk_backgrounds import get_background_store
+from .warmup import load_models, warm_up_models
+
+logger = logging.getLogger(__name__)
+
+# One verifier per worker thread — OpenCV matchers are not safe to share across threads.
+_local = threading.local()
+
+# This process's warm-up report (see warmup_job)
+_warmup_report: dict | None = None
+
+
+class ExecutorBusyError(RuntimeError):
+    """Raised when the CPU job queue is full."""
+
+
+def get_verifier():
+    """Return this worker's HybridVerifier, creating it on first use."""
+    verifier = getattr(_local, "verifier", None)
+    if verifier is None:
+        from .comparison.hybrid import HybridVerifier
+
+        verifier = HybridVerifier()
+        _local.verifier = verifier
+    return verifier
+
+
+def _init_worker(warm_up: bool = False):
+    """
+    CPU pool initializer: build the verifier and preload models once per worker.
+
+    With warm_up (process pools), the dummy model pass also runs here, so a
+    worker is warm before it takes any job.
+    """
+    # Spawned processes don't import app.main, so give them the same log format (no-op in threads)
+    logging.basicConfig(
+        level=logging.DEBUG if settings.debug else logging.INFO,
+        format="%(asctime)s %(levelname)s %(name)s: %(message)s",
+    )
+    get_verifier()
+    if settings.worker_preload_models:
+        try:
+            load_models()
+        except Exception:
+            logger.exception("Model preload failed in worker; models will load on first use")
+    if warm_up:
+        warmup_job()
+
+
+# ── Jobs (module-level so they can be pickled into worker processes) ─────────
+
+
+def _ping() -> int:
+    return os.getpid()
+
+
+def warmup_job() -> dict:
+    """This process's warm-up report, running the dummy model pass first if it has not run yet."""
+    global _warmup_report
+    if _warmup_report is None:
+        _warmup_report = {"pid": os.getpid(), "steps": warm_up_models(get_verifier())}
+    return _warmup_report
+
+
+def _kiosk_sources(kiosk_paths: list[str], kiosk_id: str | None, locker_id: str | None) -> list:
+    """Attach the locker's registered empty frame to each kiosk capture, if there is one."""
+    if not (kiosk_id and locker_id):
+        return kiosk_paths
+    background = get_background_store().get(kiosk_id, locker_id)
+    if background is None:
+        logger.info("No empty-locker frame for %s/%s; kiosk captures use GrabCut", kiosk_id, locker_id)
+        return kiosk_paths
+    return [ImageContext(path, background=background) for path in kiosk_paths]
+
+
+def verify_job(
+    original_paths: list[str],
+    kiosk_paths: list[str],
+    attempt_number: int,
+    reference_payload: str | bytes | None,
+    kiosk_id: str | None = None,
+    locker_id: str | None = None,
+) -> dict:
+    """Run HybridVerifier.verify in a worker; reference_payload is JSON or a feature bundle."""
+    reference_features = decode_reference_features(reference_payload) if reference_payload else None
+    return get_verifier().verify(
+        original_sources=original_paths,
+        kiosk_sources=_kiosk_sources(kiosk_paths, kiosk_id, locker_id),
+        attempt_number=attempt_number,
+        reference_features=reference_features,
+    )
+
+
+def verify_item_job(
+    item_id: str,
+    kiosk_paths: list[str],
+    attempt_number: int,
+    kiosk_id: str | None = None,
+    locker_id: str | None = None,
+) -> dict:
+    """Run HybridVerifier.verify against the features stored for item_id (no original images)."""
+    updated_at, reference_features = get_feature_store().get_entry(item_id)
+    return get_verifier().verify(
+        original_sources=[],
+        kiosk_sources=_kiosk_sources(kiosk_paths, kiosk_id, locker_id),
+        attempt_number=attempt_number,
+        reference_features=reference_features,
+        reference_key=(item_id, FEATURE_VERSION, updated_at),
+    )
+
+
+def extract_features_job(paths: list[str], output_format: str = "json", item_id: str | None = None) -> dict:
+    """
+    Run HybridVerifier.extract_reference_features in a worker.
+
+    Returns JSON-safe features for "json", or the features plus the encoded
+    binary bundle under "bundle" for "bundle"/"binary". With an item_id the
+    bundle is also written to the feature store.
+    """
+    features = get_verifier().extract_reference_features(paths)
+    bundle = encode_bundle(features) if output_format != "json" or item_id else None
+    if item_id:
+        get_feature_store().put(item_id, bundle, features["image_count"])
+    if output_format == "json":
+        return to_json_safe(features)
+    return {**features, "bundle": bundle}
+
+
+# ── Executor ─────────────────────────────────────────────────────────────────
+
+
+class VerificationExecutor:
+    """Process/thread pools that keep CPU-bound work off the asyncio event loop."""
+
+    def __init__(self):
+        self._cpu: Executor | None = None
+        self._io: ThreadPoolExecutor | None = None
+        self._pending = 0
+        self.warmup: dict = {"state": "disabled" if not settings.enable_warmup else "pending"}
+
+    @property
+    def warming_up(self) -> bool:
+        return self.warmup["state"] in ("pending", "running")
+
+    @property
+    def mode(self) -> str:
+        return "process" if settings.worker_processes > 0 else "thread"
+
+    def start(self):
+        """Create the pools (idempotent)."""
+        if self._cpu is not None:
+            return
+
+        if settings.worker_processes > 0:
+            self._cpu = self._process_pool()
+            workers = settings.worker_processes
+        else:
+            self._cpu = ThreadPoolExecutor(
+                max_workers=settings.worker_threads,
+                thread_name_prefix="ml-cpu",
+                initializer=_init_worker,
+            )
+            workers = settings.worker_threads
+
+        self._io = ThreadPoolExecutor(max_workers=settings.io_threads, thread_name_prefix="ml-io")
+        logger.info(
+            "Executor started: %s pool with %d workers, max queue %d, %d I/O threads",
+            self.mode,
+            workers,
+            settings.worker_max_queue,
+            settings.io_threads,
+        )
+
+    @staticmethod
+    def _process_pool() -> ProcessPoolExecutor:
+        # spawn: torch and OpenCV are not fork-safe once their thread pools exist
+        pool = ProcessPoolExecutor(
+            max_workers=settings.worker_processes,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(settings.enable_warmup,),
+        )
+        # Processes are spawned on demand; submit one no-op per worker so they
+        # start (and preload and warm up models) now rather than on the first request.
+        for _ in range(settings.worker_processes):
+            pool.submit(_ping)
+        return pool
+
+    def _replace_broken_pool(self, broken: Executor):
+        """Swap a broken process pool for a new one (once, however many jobs saw it break)."""
+        if self._cpu is not broken:
+            return
+        logger.error("A CPU worker process died; starting a new process pool")
+        broken.shutdown(wait=False, cancel_futures=True)
+        self._cpu = self._process_pool()
+
+    def shutdown(self):
+        """Stop both pools, waiting for running jobs to finish."""
+        if self._cpu is not None:
+            self._cpu.shutdown(wait=True, cancel_futures=True)
+            self._cpu = None
+        if self._io is not None:
+            self._io.shutdown(wait=True)
+            self._io = None
+
+    def stats(self) -> dict:
+        return {
+            "mode": self.mode,
+            "workers": settings.worker_processes if settings.worker_processes > 0 else settings.worker_threads,
+            "pending_jobs": self._pending,
+            "max_queue": settings.worker_max_queue,
+        }
+
+    async def warm_up(self):
+        """
+        Wait for the CPU pool to be warm; progress is reported through self.warmup.
+
+        Worker processes warm themselves in the pool initializer, before they
+        take a job, so no job ever lands on a cold worker. This waits for one
+        warmup_job per worker and reports the workers that answered; the pool
+        does not route jobs to specific workers, so the list can be shorter
+        than the pool. In thread mode the single job runs the dummy pass.
+        """
+        self.start()
+        self.warmup = {"state": "running"}
+        started = time.perf_counter()
+        workers = settings.worker_processes if settings.worker_processes > 0 else 1
+        loop = asyncio.get_running_loop()
+        try:
+            results = await asyncio.gather(
+                *(loop.run_in_executor(self._cpu, warmup_job) for _ in range(workers))
+            )
+        except Exception as e:
+            logger.exception("Warm-up failed")
+            self.warmup = {"state": "failed", "error": str(e)}
+            return
+
+        self.warmup = {
+            "state": "done",
+            "duration_ms": round((time.perf_counter() - started) * 1000, 1),
+            "workers": list({r["pid"]: r for r in results}.values()),
+        }
+        logger.info("Warm-up finished in %.1f ms", self.warmup["duration_ms"])
+
+    async def run_cpu(self, fn: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+        """
+        Run a CPU-bound job on the CPU pool and await its result.
+
+        Raises:
+            ExecutorBusyError: If worker_max_queue jobs are already running or
+                waiting, or if a worker process died while the job was queued
+                or running (the pool is replaced; the job is not retried, as it
+                may be what killed the worker).
+        """
+        self.start()
+        if self._pending >= settings.worker_max_queue:
+            raise ExecutorBusyError(
+                f"Verification queue is full ({self._pending}/{settings.worker_max_queue} jobs)"
+            )
+
+        # Counter is only touched from the event loop thread, so no lock is needed.
+        self._pending += 1
+        pool = self._cpu
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(pool, partial(fn, *args, **kwargs))
+        except BrokenProcessPool as e:
+            self._replace_broken_pool(pool)
+            raise ExecutorBusyError("A worker process died; the pool was restarted, retry the request") from e
+        finally:
+            self._pending -= 1
+
+    async def run_io(self, fn: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+        """Run a blocking I/O call on the I/O thread pool and await its result."""
+        self.start()
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._io, partial(fn, *args, **kwargs))
+
+
+executor = VerificationExecutor()
@@ -0,0 +1,57 @@
+"""
+Check ImageContext.deep_input against the torchvision transform it replaces.
+
+For each image, builds the 224x224 ResNet50 input the original way
+(PIL decode, transforms.Resize(256) + transforms.CenterCrop(224)) and
+through ImageContext.deep_input, from bytes and from the file path, and
+reports the largest per-pixel difference. Exits non-zero on any mismatch.
+
+Decoding is the only remaining source of drift: file paths are decoded by
+OpenCV, which applies EXIF orientation (PIL does not), images larger
+than max_image_size are clamped before the transform, and JPEGs reduced
+by decode_working_size are resized from the DCT-scaled decode (typically
+a difference of at most 1).
+
+Usage (from services/ml; needs torchvision):
+
+    python -m benchmarks.deep_input_parity photo1.jpg photo2.jpg
+"""
+
+import argparse
+import io
+import sys
+
+import numpy as np
+import torchvision.transforms as transforms
+from PIL import Image
+
+from app.utils.context import ImageContext
+
+_TRANSFORM = transforms.Compose([transforms.Resize(256), transforms.CenterCrop(224)])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("images", nargs="+", help="Image files to check")
+    args = parser.parse_args()
+
+    mismatches = 0
+    for path in args.images:
+        with open(path, "rb") as f:
+            data = f.read()
+        expected = np.asarray(_TRANSFORM(Image.open(io.BytesIO(data)).convert("RGB")))
+        for label, source in (("bytes", data), ("path", path)):
+            actual = ImageContext(source).deep_input()
+            if actual.shape != expected.shape:
+                print(f"{path} [{label}]: shape {actual.shape} != {expected.shape}")
+                mismatches += 1
+                continue
+            diff = int(np.abs(actual.astype(np.int16) - expected.astype(np.int16)).max())
+            mismatches += diff > 0
+            print(f"{path} [{label}]: max diff {diff}")
+
+    sys.exit(1 if mismatches else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""
+Benchmark multi-resolution GrabCut against full-resolution GrabCut.
+
+For each image, segments the preprocessed image (white balance + CLAHE, as
+ImageContext.segmentation does) at full resolution and with every
+--proxy-sizes / --refine-bands combination, and reports the time and the
+mask IoU against the full-resolution mask.
+
+Usage (from services/ml):
+
+    python -m benchmarks.grabcut_multires photo1.jpg photo2.jpg
+    python -m benchmarks.grabcut_multires photos/*.jpg --proxy-sizes 240 320 480 --refine-bands 0 4 8
+"""
+
+import argparse
+import statistics
+import time
+
+import numpy as np
+
+from app.utils.background import remove_background_grabcut
+from app.utils.image import load_image, preprocess
+
+
+def mask_iou(a: np.ndarray, b: np.ndarray) -> float:
+    """Intersection over union of two binary masks (1.0 when both are empty)."""
+    a, b = a > 0, b > 0
+    union = np.logical_or(a, b).sum()
+    return float(np.logical_and(a, b).sum() / union) if union else 1.0
+
+
+def _timed(image: np.ndarray, repeat: int, **kwargs) -> tuple[np.ndarray, float]:
+    """Best-of-repeat wall time in ms, and the mask of the last run."""
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        _, mask = remove_background_grabcut(image, **kwargs)
+        times.append((time.perf_counter() - start) * 1000)
+    return mask, min(times)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("images", nargs="+", help="Image files to segment")
+    parser.add_argument("--proxy-sizes", type=int, nargs="+", default=[320])
+    parser.add_argument("--refine-bands", type=int, nargs="+", default=[0, 6])
+    parser.add_argument("--repeat", type=int, default=1, help="Runs per configuration (best time is reported)")
+    args = parser.parse_args()
+
+    configs = [(p, b) for p in args.proxy_sizes for b in args.refine_bands]
+    summary: dict[tuple[int, int], list[tuple[float, float, float]]] = {c: [] for c in configs}
+
+    for path in args.images:
+        image = preprocess(load_image(path))
+        h, w = image.shape[:2]
+        reference, full_ms = _timed(image, args.repeat)
+        print(f"{path} ({w}x{h}): full resolution {full_ms:.0f} ms")
+
+        for proxy_size, band in configs:
+            mask, ms = _timed(image, args.repeat, proxy_size=proxy_size, refine_band=band)
+            iou = mask_iou(mask, reference)
+            summary[(proxy_size, band)].append((ms, full_ms, iou))
+            print(f"  proxy={proxy_size:<5} band={band:<3} {ms:8.0f} ms  x{full_ms / ms:5.1f}  IoU={iou:.3f}")
+
+    print("\nmean over images:")
+    for (proxy_size, band), rows in summary.items():
+        speedup = statistics.mean(full / ms for ms, full, _ in rows)
+        iou = statistics.mean(i for _, _, i in rows)
+        worst = min(i for _, _, i in rows)
+        print(f"  proxy={proxy_size:<5} band={band:<3} speedup x{speedup:5.1f}  IoU mean={iou:.3f} min={worst:.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+"""
+Benchmark reduced-size JPEG decoding against a full decode.
+
+For each image, decodes from bytes (the upload path) and from the file path
+at full resolution and at every --working-sizes value, and reports the time,
+the decoded size and the decoded buffer's memory.
+
+Usage (from services/ml):
+
+    python -m benchmarks.jpeg_decode photo1.jpg photo2.jpg
+    python -m benchmarks.jpeg_decode photos/*.jpg --working-sizes 512 1024 2048
+"""
+
+import argparse
+import time
+
+from app.utils.image import decode_image
+
+
+def _timed(source, working_size: int, repeat: int):
+    """Best-of-repeat wall time in ms, and the (image, factor) of the last run."""
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        decoded = decode_image(source, working_size)
+        times.append((time.perf_counter() - start) * 1000)
+    return decoded, min(times)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("images", nargs="+", help="JPEG files to decode")
+    parser.add_argument("--working-sizes", type=int, nargs="+", default=[1024])
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per configuration (best time is reported)")
+    args = parser.parse_args()
+
+    for path in args.images:
+        with open(path, "rb") as f:
+            data = f.read()
+        for label, source in (("bytes", data), ("path", path)):
+            (full, _), full_ms = _timed(source, 0, args.repeat)
+            h, w = full.shape[:2]
+            print(f"{path} [{label}] full {w}x{h}: {full_ms:.0f} ms, {full.nbytes / 2**20:.1f} MiB")
+            for working_size in args.working_sizes:
+                (img, factor), ms = _timed(source, working_size, args.repeat)
+                h, w = img.shape[:2]
+                print(
+                    f"  working_size={working_size:<5} 1/{factor} {w}x{h}: {ms:6.0f} ms  x{full_ms / ms:4.1f}  "
+                    f"{img.nbytes / 2**20:5.1f} MiB  x{full.nbytes / img.nbytes:4.1f}"
+                )
+
+
+if __name__ == "__main__":
+    main()
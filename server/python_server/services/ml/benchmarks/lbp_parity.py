@@ -0,0 +1,83 @@
+"""
+Check the vectorized multi-scale LBP against scikit-image.
+
+For each image, computes the uniform-LBP histograms (R = 1, 2, 4) of the
+item crop that TraditionalFeatureExtractor uses, with
+features.lbp.uniform_lbp_histograms and with skimage's
+local_binary_pattern, and reports the largest histogram difference (0 for
+parity) and both timings. Also reports the L1 distance between the
+full-crop histograms and the ones computed at lbp_max_side.
+
+Exits non-zero if any histogram differs by more than --tolerance.
+
+Usage (from services/ml):
+
+    python -m benchmarks.lbp_parity photo1.jpg photo2.jpg
+"""
+
+import argparse
+import sys
+import time
+
+import cv2
+import numpy as np
+from skimage.feature import local_binary_pattern
+
+from app.config import settings
+from app.features.lbp import LBP_RADII, uniform_lbp_histograms
+from app.utils.context import ImageContext
+
+
+def skimage_histograms(gray: np.ndarray) -> list[np.ndarray]:
+    """The previous TraditionalFeatureExtractor implementation."""
+    hists = []
+    for radius in LBP_RADII:
+        points = 8 * radius
+        lbp = local_binary_pattern(gray, P=points, R=radius, method="uniform")
+        n_bins = points + 2
+        hist, _ = np.histogram(lbp.ravel(), bins=n_bins, range=(0, n_bins))
+        total = hist.sum()
+        if total > 0:
+            hist = hist / total
+        hists.append(hist.astype(np.float64))
+    return hists
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("images", nargs="+", help="Image files")
+    parser.add_argument("--tolerance", type=float, default=1e-12)
+    args = parser.parse_args()
+
+    failed = False
+    for path in args.images:
+        gray = ImageContext(path).item_gray()
+        h, w = gray.shape
+
+        start = time.perf_counter()
+        expected = skimage_histograms(gray)
+        skimage_ms = (time.perf_counter() - start) * 1000
+
+        start = time.perf_counter()
+        actual = uniform_lbp_histograms(gray)
+        fast_ms = (time.perf_counter() - start) * 1000
+
+        diff = max(float(np.abs(e - a).max()) for e, a in zip(expected, actual))
+        failed |= diff > args.tolerance
+
+        line = f"{path} ({w}x{h}): max diff {diff:.2e}  skimage {skimage_ms:.0f} ms  vectorized {fast_ms:.0f} ms"
+        if settings.lbp_max_side and max(h, w) > settings.lbp_max_side:
+            scale = settings.lbp_max_side / max(h, w)
+            small = cv2.resize(gray, (max(1, round(w * scale)), max(1, round(h * scale))), interpolation=cv2.INTER_AREA)
+            start = time.perf_counter()
+            bounded = uniform_lbp_histograms(small)
+            bounded_ms = (time.perf_counter() - start) * 1000
+            l1 = sum(float(np.abs(e - b).sum()) for e, b in zip(expected, bounded))
+            line += f"  at {settings.lbp_max_side}px {bounded_ms:.0f} ms (L1 vs full crop {l1:.3f})"
+        print(line)
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
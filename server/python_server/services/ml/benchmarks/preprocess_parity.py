@@ -0,0 +1,57 @@
+"""
+Compare the LUT white-balance fast path against the float64 implementation.
+
+For each image, runs white balance + CLAHE (utils.image.preprocess_image)
+with white_balance_method "float" and "lut" at every --sample-steps value,
+and reports the time and the per-pixel difference of the results.
+
+Usage (from services/ml):
+
+    python -m benchmarks.preprocess_parity photo1.jpg photo2.jpg
+    python -m benchmarks.preprocess_parity photos/*.jpg --sample-steps 1 4 8
+"""
+
+import argparse
+import time
+
+import numpy as np
+
+from app.config import settings
+from app.utils.image import load_image, preprocess_image
+
+
+def _timed(image: np.ndarray, method: str, sample_step: int, repeat: int) -> tuple[np.ndarray, float]:
+    """Best-of-repeat wall time in ms, and the output of the last run."""
+    settings.white_balance_method = method
+    settings.white_balance_sample_step = sample_step
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        out = preprocess_image(image)
+        times.append((time.perf_counter() - start) * 1000)
+    return out, min(times)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("images", nargs="+", help="Image files to preprocess")
+    parser.add_argument("--sample-steps", type=int, nargs="+", default=[1, 4])
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per configuration (best time is reported)")
+    args = parser.parse_args()
+
+    for path in args.images:
+        image = load_image(path)
+        h, w = image.shape[:2]
+        reference, float_ms = _timed(image, "float", 1, args.repeat)
+        print(f"{path} ({w}x{h}): float {float_ms:.0f} ms")
+        for step in args.sample_steps:
+            out, ms = _timed(image, "lut", step, args.repeat)
+            diff = np.abs(out.astype(np.int16) - reference.astype(np.int16))
+            print(
+                f"  lut step={step:<3} {ms:6.0f} ms  x{float_ms / ms:4.1f}  "
+                f"max diff={int(diff.max())} mean diff={diff.mean():.3f} identical={np.mean(diff == 0):.1%}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,30 @@
+"""features.lbp.uniform_lbp_histograms against scikit-image's uniform LBP."""
+
+import numpy as np
+import pytest
+
+from app.features.lbp import LBP_RADII, uniform_lbp_histograms
+
+feature = pytest.importorskip("skimage.feature")
+
+
+def _skimage_histograms(gray: np.ndarray) -> list[np.ndarray]:
+    hists = []
+    for radius in LBP_RADII:
+        points = 8 * radius
+        lbp = feature.local_binary_pattern(gray, P=points, R=radius, method="uniform")
+        n_bins = points + 2
+        hist, _ = np.histogram(lbp.ravel(), bins=n_bins, range=(0, n_bins))
+        hists.append(hist / hist.sum())
+    return hists
+
+
+@pytest.mark.parametrize("shape", [(61, 83), (9, 9)])
+def test_uniform_lbp_histograms_match_skimage(shape):
+    rng = np.random.default_rng(0)
+    gray = rng.integers(0, 256, size=shape, dtype=np.uint8)
+    # Flat patches give the uniform codes too, not just noise
+    gray[: shape[0] // 2, : shape[1] // 2] = 128
+
+    for ours, reference in zip(uniform_lbp_histograms(gray), _skimage_histograms(gray), strict=True):
+        np.testing.assert_allclose(ours, reference, rtol=0, atol=1e-12)